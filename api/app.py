@@ -1,10 +1,11 @@
 import os
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify, send_file
 from config.config import Config
-from extensions import db, sock
+from extensions import db, sock, call_engine
 from flask_login import LoginManager
 from flask_cors import CORS
 from models.models import User
+from utils.static_cache import StaticFileCache
 
 def create_app():
     # Configure Flask to serve the React build in production
@@ -48,6 +49,7 @@ def create_app():
     CORS(app)
     db.init_app(app)
     sock.init_app(app)
+    call_engine.init_app(app)
     
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
@@ -78,18 +80,35 @@ def create_app():
     
     with app.app_context():
         db.create_all()
+    
+    # Join the cross-worker invalidation bus (re-joined lazily after a fork)
+    from services.invalidation_bus import ensure_listening
+    ensure_listening()
+        
+    # Cached stat() of the SPA build: no filesystem calls per request
+    static_files = StaticFileCache(app.static_folder)
+    
+    def send_static(entry):
+        # conditional=True answers If-None-Match / If-Modified-Since with 304
+        response = send_file(entry.path, etag=entry.etag, last_modified=entry.mtime, conditional=True)
+        response.headers['Cache-Control'] = entry.cache_control
+        return response
         
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve(path):
-        if path != "" and os.path.exists(app.static_folder + '/' + path):
-            return send_from_directory(app.static_folder, path)
+        entry = static_files.lookup(path)
+        if entry is not None:
+            return send_static(entry)
         
         # If path starts with /api, return 404 json instead of index.html
         if path.startswith('api/'):
             return jsonify({'error': 'Not found'}), 404
             
-        return send_from_directory(app.static_folder, 'index.html')
+        index = static_files.lookup('index.html')
+        if index is None:
+            return jsonify({'error': 'Not found'}), 404
+        return send_static(index)
 
     return app
 
@@ -20,6 +20,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # OAuth2 Scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
+# Same, but lets the endpoint fall back to another token source (e.g. ?token= for SSE)
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/token", auto_error=False)
 
 from werkzeug.security import check_password_hash
 from passlib.exc import UnknownHashError
@@ -49,6 +51,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await get_user_from_token(token, db)
+
+async def get_user_from_token(token: str, db: AsyncSession):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -34,6 +34,95 @@ class Config:
     # Gemini
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     
+    # Voice call engine (max concurrent Gemini Live sessions per worker)
+    VOICE_MAX_CONCURRENT_CALLS = int(os.environ.get('VOICE_MAX_CONCURRENT_CALLS', 60))
+    # Inbound audio frames buffered per call before the oldest is dropped (~20ms each)
+    VOICE_INBOUND_MAX_FRAMES = int(os.environ.get('VOICE_INBOUND_MAX_FRAMES', 25))
+    # Outbound audio to Vonage is paced in 20ms frames: jitter buffer filled before
+    # each talkspurt (grows after underruns up to the max), and the most audio held
+    # per call (Gemini speaks faster than real time) before the oldest is dropped
+    VOICE_OUTBOUND_JITTER_MIN_MS = int(os.environ.get('VOICE_OUTBOUND_JITTER_MIN_MS', 60))
+    VOICE_OUTBOUND_JITTER_MAX_MS = int(os.environ.get('VOICE_OUTBOUND_JITTER_MAX_MS', 200))
+    VOICE_OUTBOUND_BUFFER_MS = int(os.environ.get('VOICE_OUTBOUND_BUFFER_MS', 60000))
+    # Inbound silence suppression before Gemini: 'off', 'gate' (drop silence) or
+    # 'decimate' (keep 1 in VOICE_VAD_KEEP_EVERY silent frames). Off unless set
+    # here or per company (vad_mode / vad_threshold override these two)
+    VOICE_VAD_MODE = os.environ.get('VOICE_VAD_MODE', 'off')
+    VOICE_VAD_THRESHOLD = int(os.environ.get('VOICE_VAD_THRESHOLD', 300))
+    VOICE_VAD_HANGOVER_MS = int(os.environ.get('VOICE_VAD_HANGOVER_MS', 800))
+    VOICE_VAD_KEEP_EVERY = int(os.environ.get('VOICE_VAD_KEEP_EVERY', 5))
+
+    # Seconds a speculative call setup (started by /webhooks/answer) waits for
+    # Vonage to open the WebSocket before its Gemini session is closed
+    VOICE_SETUP_TIMEOUT = int(os.environ.get('VOICE_SETUP_TIMEOUT', 15))
+    # Speculative setups in flight per worker (the webhook is unauthenticated);
+    # past this, calls are set up inline when their WebSocket opens
+    VOICE_SETUP_MAX_PENDING = int(os.environ.get('VOICE_SETUP_MAX_PENDING', VOICE_MAX_CONCURRENT_CALLS))
+
+    # Company lookups by phone (LRU of immutable snapshots, invalidated on edit)
+    COMPANY_CACHE_SIZE = int(os.environ.get('COMPANY_CACHE_SIZE', 1024))
+    COMPANY_CACHE_TTL = int(os.environ.get('COMPANY_CACHE_TTL', 300))
+    COMPANY_CACHE_NEGATIVE_TTL = int(os.environ.get('COMPANY_CACHE_NEGATIVE_TTL', 30))
+
+    # Cross-worker pub/sub for cache invalidation: 'postgres' (LISTEN/NOTIFY),
+    # 'local' (loopback multicast, workers on one host) or 'memory' (single
+    # process). Empty = postgres when DATABASE_URL is Postgres, else memory.
+    PUBSUB_BACKEND = os.environ.get('PUBSUB_BACKEND', '')
+    PUBSUB_LOCAL_PORT = int(os.environ.get('PUBSUB_LOCAL_PORT', 47777))
+
+    # Dashboard SSE: events kept for Last-Event-ID resume, per-client queue
+    # (a client that falls this far behind is disconnected and resumes), and
+    # seconds between keepalive comments
+    EVENT_BUFFER_SIZE = int(os.environ.get('EVENT_BUFFER_SIZE', 1000))
+    SSE_SUBSCRIBER_QUEUE = int(os.environ.get('SSE_SUBSCRIBER_QUEUE', 256))
+    SSE_HEARTBEAT_INTERVAL = int(os.environ.get('SSE_HEARTBEAT_INTERVAL', 15))
+
+    # Dashboard: completed ('termine') orders per page, and a safety cap on
+    # active orders returned per status (the response flags when it cuts some off)
+    DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', 50))
+    DASHBOARD_ACTIVE_LIMIT = int(os.environ.get('DASHBOARD_ACTIVE_LIMIT', 500))
+
+    # Completed orders older than this move to the monthly-partitioned
+    # orders_archive table (scripts/archive_orders.py), in batches
+    ORDER_ARCHIVE_HORIZON_DAYS = int(os.environ.get('ORDER_ARCHIVE_HORIZON_DAYS', 90))
+    ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get('ORDER_ARCHIVE_BATCH_SIZE', 5000))
+
+    # Compiled per-company call profiles (prompt + live config); edits invalidate
+    # them immediately, the TTL bounds staleness for changes made elsewhere
+    CALL_PROFILE_TTL = int(os.environ.get('CALL_PROFILE_TTL', 300))
+
+    # Gemini warm pool: ready clients, and optional pre-connected live sessions
+    # kept for the busiest (voice, system prompt) configurations
+    GEMINI_CLIENT_POOL_SIZE = int(os.environ.get('GEMINI_CLIENT_POOL_SIZE', 2))
+    GEMINI_WARM_SESSIONS = int(os.environ.get('GEMINI_WARM_SESSIONS', 0))
+    GEMINI_WARM_KEYS = int(os.environ.get('GEMINI_WARM_KEYS', 3))
+    GEMINI_WARM_SESSION_TTL = int(os.environ.get('GEMINI_WARM_SESSION_TTL', 60))
+
+    # Menu image blobs: 'local' (content-addressed files under BLOB_STORE_PATH,
+    # put it on a persistent volume) or 's3' (S3-compatible bucket, needs boto3;
+    # S3_ENDPOINT_URL points at MinIO or similar for a local stand-in)
+    BLOB_STORE = os.environ.get('BLOB_STORE', 'local')
+    BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH', os.path.join('data', 'blobs'))
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_PREFIX = os.environ.get('S3_PREFIX', 'blobs/')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    # Upload variants (needs Pillow): admin-list thumbnail and the bounded
+    # copy sent to the model for menu extraction, processed by IMAGE_WORKERS threads
+    IMAGE_THUMB_SIZE = int(os.environ.get('IMAGE_THUMB_SIZE', 320))
+    IMAGE_MODEL_MAX_SIDE = int(os.environ.get('IMAGE_MODEL_MAX_SIDE', 1600))
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    # Background menu extractions: concurrent Gemini calls, waiting jobs
+    # allowed before new ones are refused, seconds finished jobs stay pollable
+    EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 2))
+    EXTRACTION_QUEUE_SIZE = int(os.environ.get('EXTRACTION_QUEUE_SIZE', 20))
+    EXTRACTION_JOB_TTL = int(os.environ.get('EXTRACTION_JOB_TTL', 3600))
+    # Seconds a stored extraction result is reused for the same images, prompt and model
+    EXTRACTION_CACHE_TTL = int(os.environ.get('EXTRACTION_CACHE_TTL', 30 * 24 * 3600))
+    # Menus up to this many items go into the call prompt whole; larger ones
+    # only list their categories and are queried with the lookup_menu_item tool
+    MENU_PROMPT_MAX_ITEMS = int(os.environ.get('MENU_PROMPT_MAX_ITEMS', 60))
+
     # Server
     PUBLIC_URL = os.environ.get('PUBLIC_URL')
 
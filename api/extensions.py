@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_sock import Sock
+from services.call_engine import CallEngine
 
 # Configure database with connection pooling for high concurrency
 db = SQLAlchemy(
@@ -12,3 +13,6 @@ db = SQLAlchemy(
     }
 )
 sock = Sock()
+
+# Shared asyncio loop running every Gemini Live call in this worker
+call_engine = CallEngine()
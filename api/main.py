@@ -19,6 +19,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def join_invalidation_bus():
+    # Cross-worker cache invalidation (company/menu/user edits)
+    from services.invalidation_bus import ensure_listening
+    ensure_listening()
+
 @app.get("/health")
 async def health_check():
     return {
@@ -28,16 +34,26 @@ async def health_check():
     }
 
 # We will import and include routers here later
-from routes import auth_routes, voice_routes, admin_routes
+from routes import auth_routes, voice_routes, admin_routes, events_routes
 
 app.include_router(auth_routes.router)
 app.include_router(voice_routes.router)
 app.include_router(admin_routes.router)
+app.include_router(events_routes.router)
 
 # --- Static Files & SPA ---
 import os
+from fastapi import Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from utils.static_cache import StaticFileCache, IMMUTABLE_CACHE_CONTROL, etag_matches
+
+class HashedAssets(StaticFiles):
+    # Vite's content-hashed bundles: cache forever (StaticFiles already does ETag/304)
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
 
 # Determine path to frontend dist
 # Local: ../web/dist (relative to api folder)
@@ -52,17 +68,22 @@ if os.path.exists(frontend_dist):
     # Mount assets (CSS, JS, Images)
     assets_path = os.path.join(frontend_dist, "assets")
     if os.path.exists(assets_path):
-        app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
+        app.mount("/assets", HashedAssets(directory=assets_path), name="assets")
+
+    # Cached stat() of the build: no filesystem calls per request
+    static_files = StaticFileCache(frontend_dist)
 
     # Serve other static files (favicon, manifest, etc.) or fallback to index.html
     @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str):
-        # Attempt to serve file directly if it exists
-        file_path = os.path.join(frontend_dist, full_path)
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            return FileResponse(file_path)
-        
+    async def serve_spa(full_path: str, request: Request):
         # Fallback to index.html for React Router
-        return FileResponse(os.path.join(frontend_dist, "index.html"))
+        entry = static_files.lookup(full_path) or static_files.lookup("index.html")
+        if entry is None:
+            return Response(status_code=404)
+        
+        headers = {"ETag": f'"{entry.etag}"', "Cache-Control": entry.cache_control}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(entry.path, headers=headers, stat_result=entry.stat)
 else:
     print(f"⚠️ Frontend build not found at: {frontend_dist}")
@@ -13,6 +13,8 @@ class Company(db.Model):
     menu = db.Column(db.Text) 
     agent_on = db.Column(db.Boolean, default=True)
     voice = db.Column(db.String(20), default='Charon')
+    vad_mode = db.Column(db.String(10))  # None = Config.VOICE_VAD_MODE
+    vad_threshold = db.Column(db.Integer)  # None = Config.VOICE_VAD_THRESHOLD
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -20,6 +22,7 @@ class Company(db.Model):
     orders = db.relationship('Order', backref='company_ref', lazy=True)
     demands = db.relationship('Demand', backref='company_ref', lazy=True)
     menu_images = db.relationship('MenuImage', backref='company_ref', lazy=True, cascade="all, delete-orphan")
+    menu_items = db.relationship('MenuItem', backref='company_ref', lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
         try:
@@ -34,6 +37,8 @@ class Company(db.Model):
             'phone_number': self.phone_number,
             'voice': self.voice,
             'agent_on': self.agent_on,
+            'vad_mode': self.vad_mode,
+            'vad_threshold': self.vad_threshold,
             'system_prompt': self.system_prompt,
             'menu': self.menu,
             'created_at': self.created_at.isoformat(),
@@ -83,6 +88,18 @@ class Order(db.Model):
     # Optional: Link order to a specific user (restaurant) if needed in future
     # user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
 
+    # Mirrors scripts/migrate_indexes.py (create_all only covers new databases)
+    __table_args__ = (
+        # Dashboard: per-status pages, newest first, keyset on (created_at, id)
+        db.Index('ix_orders_company_status_created', 'company_id', 'status', created_at.desc(), id.desc()),
+        # submit_demand lookup and active order counts: active orders only
+        db.Index('ix_orders_active_company_phone', 'company_id', 'customer_phone', created_at.desc(),
+                 postgresql_where=db.text("status IN ('recu', 'en_cours')"),
+                 sqlite_where=db.text("status IN ('recu', 'en_cours')")),
+        # Customer history
+        db.Index('ix_orders_phone_created', 'customer_phone', created_at.desc()),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -130,6 +147,12 @@ class Demand(db.Model):
     # Relationships
     order = db.relationship('Order', backref=db.backref('demands', lazy=True))
 
+    # Mirrors scripts/migrate_indexes.py
+    __table_args__ = (
+        db.Index('ix_demands_company_created', 'company_id', created_at.desc()),
+        db.Index('ix_demands_company_phone', 'company_id', 'customer_phone'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -146,7 +169,51 @@ class MenuImage(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
-    image_data = db.Column(db.LargeBinary, nullable=False) # Storing image as bytes
+    # Legacy inline bytes (rows not yet moved by scripts/migrate_menu_images.py);
+    # deferred so listing images never loads them
+    image_data = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    content_hash = db.Column(db.String(64), index=True) # SHA-256 key in the blob store
+    content_type = db.Column(db.String(50), default='image/jpeg')
+    size = db.Column(db.Integer)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    thumb_hash = db.Column(db.String(64)) # Admin-list thumbnail (JPEG)
+    model_hash = db.Column(db.String(64)) # Bounded-resolution copy for extraction
     filename = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+
+class MenuItem(db.Model):
+    """One dish parsed from the company menu (services/menu_catalog.py)"""
+    __tablename__ = 'menu_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
+    category = db.Column(db.String(100))
+    name = db.Column(db.String(200), nullable=False)
+    price = db.Column(db.Float)
+    price_label = db.Column(db.String(50)) # As written on the menu ("40/60 DH")
+    aliases = db.Column(db.JSON, default=list)
+    position = db.Column(db.Integer, default=0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'name': self.name,
+            'price': self.price,
+            'price_label': self.price_label,
+            'aliases': self.aliases or []
+        }
+
+class MenuExtraction(db.Model):
+    """Cached menu extraction result, keyed by image set + prompt + model"""
+    __tablename__ = 'menu_extractions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False) # See services/extraction_cache.py
+    model = db.Column(db.String(100))
+    image_count = db.Column(db.Integer)
+    menu_text = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -1,12 +1,29 @@
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context
 from flask_login import login_required, current_user
-from extensions import db
-from models.models import User, MenuImage
+from extensions import db, call_engine
+from models.models import User, Company, MenuImage, MenuItem, MenuExtraction
 from config.constants import DEFAULT_SYSTEM_PROMPTS
 from utils.phone import normalize_phone
-import os
+from utils.audio import vad_settings
+from services.gemini_pool import gemini_pool
+from services.call_setup import call_setups
+from services.call_profile import call_profile_stats
+from services.company_cache import company_cache, company_changed
+from services.invalidation_bus import publish_change
+from services.pubsub import get_bus
+from services.event_broker import event_broker
+from services.blob_store import blob_store, content_hash, menu_image_etag
+from services.image_pipeline import (
+    process_image, model_variant_bytes, menu_image_model_bytes, run_in_pool, variant_key, variant_keys,
+    referenced_keys_statement,
+)
+from services.extraction_jobs import (
+    extraction_jobs, extract_menu_text, job_key, JobQueueFull, EXTRACTION_MODEL, EXTRACTION_PROMPT,
+)
+from services.extraction_cache import extraction_cache_key, lookup_extraction, store_extraction
+from services.menu_catalog import sync_menu_items, menu_catalogs
+from utils.static_cache import MENU_IMAGE_CACHE_CONTROL
 import io
-import time
 
 admin_bp = Blueprint('admin_api', __name__, url_prefix='/api/admin')
 
@@ -54,6 +71,7 @@ def manage_user():
             db.session.add(new_company)
             db.session.flush()
             company_id = new_company.id
+            new_company_phone = new_company.phone_number
 
         user = User(
             username=username, 
@@ -64,10 +82,17 @@ def manage_user():
         user.set_password(password)
         db.session.add(user)
         db.session.commit()
+        if company and not data.get('company_id'):
+            # Clears a negative cache entry for the new number
+            company_changed(company_id, new_company_phone)
         return jsonify({'success': True, 'user': user.to_dict()}), 201
             
     elif action == 'edit':
         user_id = data.get('user_id')
+        try:
+            vad = vad_settings(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         user = User.query.get(user_id)
         if user:
             if user.company_ref:
@@ -77,6 +102,8 @@ def manage_user():
                     user.company_ref.phone_number = normalize_phone(data.get('phone_number'))
                 if 'voice' in data:
                     user.company_ref.voice = data.get('voice')
+                for field, value in vad.items():
+                    setattr(user.company_ref, field, value)
 
                 if 'agent_on' in data:
                     user.company_ref.agent_on = data.get('agent_on')
@@ -84,6 +111,7 @@ def manage_user():
                     user.company_ref.system_prompt = data.get('system_prompt')
                 if 'menu' in data:
                     user.company_ref.menu = data.get('menu')
+                    sync_menu_items(db.session, MenuItem, user.company_ref.id, user.company_ref.menu)
 
             # Allow superadmin to update user permissions
             if current_user.is_superadmin:
@@ -91,6 +119,9 @@ def manage_user():
                     user.is_admin = data.get('is_admin')
 
             db.session.commit()
+            if user.company_ref:
+                company_changed(user.company_ref.id, user.company_ref.phone_number)
+            publish_change('user', user_id=user.id)
             return jsonify({'success': True, 'user': user.to_dict()})
 
     elif action == 'delete':
@@ -99,6 +130,7 @@ def manage_user():
         if user:
             db.session.delete(user)
             db.session.commit()
+            publish_change('user', user_id=user_id)
             return jsonify({'success': True})
             
     return jsonify({'error': 'Action non valide'}), 400
@@ -119,7 +151,19 @@ def save_menu_images():
             image_bytes = f.read()
             if not image_bytes:
                 continue
-            menu_img = MenuImage(company_id=user.company_ref.id, image_data=image_bytes, filename=f.filename)
+            # Hashing, decoding and resizing run on the image pool, not the request greenlet
+            processed = run_in_pool(process_image, image_bytes)
+            menu_img = MenuImage(
+                company_id=user.company_ref.id,
+                content_hash=processed.content_hash,
+                content_type=processed.content_type,
+                size=processed.size,
+                width=processed.width,
+                height=processed.height,
+                thumb_hash=processed.thumb_hash,
+                model_hash=processed.model_hash,
+                filename=f.filename
+            )
             db.session.add(menu_img)
         
         db.session.commit()
@@ -132,90 +176,142 @@ def save_menu_images():
 
 @admin_bp.route('/menu/extract', methods=['POST'])
 def extract_menu():
+    """Answer from the extraction cache, or queue a job whose result arrives as a `menu_extraction` event"""
     user_id = request.form.get('user_id')
     user = User.query.get(user_id)
     if not user or not user.company_ref:
         return jsonify({'error': 'Utilisateur ou entreprise non trouvé'}), 404
 
-    files = request.files.getlist('menu_images')
-    
+    company_id = user.company_ref.id
+    app = current_app._get_current_object()
+    uploads = [data for data in (f.read() for f in request.files.getlist('menu_images')) if data]
+    # refresh=1 skips the cached result and re-extracts
+    refresh = request.form.get('refresh', '').lower() in ('1', 'true', 'yes')
+
+    if uploads:
+        hashes = [content_hash(data) for data in uploads]
+
+        def load_images():
+            return [run_in_pool(model_variant_bytes, data) for data in uploads]
+    else:
+        images = user.company_ref.menu_images
+        if not images:
+            return jsonify({'error': 'Aucune image à extraire'}), 400
+        # Legacy inline rows have no content hash: extract them, but never from cache
+        hashes = [img.content_hash or f"legacy:{img.id}" for img in images]
+
+        def load_images():
+            with app.app_context():
+                return [menu_image_model_bytes(img) for img in MenuImage.query.filter_by(company_id=company_id)]
+
+    key = job_key(company_id, hashes)
+    image_count = len(hashes)
+    cache_key = None
+    if all(not h.startswith('legacy:') for h in hashes):
+        cache_key = extraction_cache_key(hashes, EXTRACTION_PROMPT, EXTRACTION_MODEL)
+
+    if cache_key and not refresh:
+        menu_text = lookup_extraction(db.session, MenuExtraction, cache_key)
+        if menu_text is not None:
+            changed = user.company_ref.menu != menu_text
+            user.company_ref.menu = menu_text
+            if changed:
+                sync_menu_items(db.session, MenuItem, company_id, menu_text)
+            db.session.commit()
+            if changed:
+                company_changed(company_id, kind='menu')
+            return jsonify({'success': True, 'cached': True, 'status': 'done', 'menu_text': menu_text})
+
+    def run(job):
+        # No DB session is held while Gemini works
+        images = load_images()
+        app.logger.info(f"Starting Gemini extraction for company {company_id} ({len(images)} images)")
+        menu_text = extract_menu_text(images)
+        with app.app_context():
+            company = Company.query.get(company_id)
+            company.menu = menu_text
+            sync_menu_items(db.session, MenuItem, company_id, menu_text)
+            db.session.commit()
+            if cache_key:
+                # Separate transaction: the menu is saved even if caching fails
+                try:
+                    store_extraction(db.session, MenuExtraction, cache_key, menu_text, EXTRACTION_MODEL, image_count)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning(f"⚠️ Could not cache menu extraction {cache_key[:12]}: {e}")
+        company_changed(company_id, kind='menu')
+        return menu_text
+
     try:
-        from google import genai
-        from google.genai import types
-        
-        creds_path = os.path.abspath("vertex-json.json")
-        if os.path.exists(creds_path):
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = creds_path
-        
-        client = genai.Client(
-            vertexai=True,
-            project="polar-equinox-472800-j2",
-            location="us-central1"
-        )
-        
-        prompt_parts = [
-            "Extract strictly only the menu items and their prices from these images. Output the result as a raw text list (Item: Price). Do NOT include any introductory text, markdown formatting, headers, footers, or any conversational filler. Just the data."
-        ]
-        
-        if files:
-            for f in files:
-                image_bytes = f.read()
-                if not image_bytes:
-                    continue
-                prompt_parts.append(
-                    types.Part(inline_data=types.Blob(data=image_bytes, mime_type="image/jpeg"))
-                )
-        else:
-            company = user.company_ref
-            if not company or not company.menu_images:
-                return jsonify({'error': 'Aucune image à extraire'}), 400
-            for img in company.menu_images:
-                prompt_parts.append(
-                    types.Part(inline_data=types.Blob(data=img.image_data, mime_type="image/jpeg"))
-                )
-
-        start_time = time.time()
-        current_app.logger.info(f"Starting Gemini extraction for company {user.company_ref.id}")
-        
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt_parts
-        )
-        
-        duration = time.time() - start_time
-        current_app.logger.info(f"Gemini extraction completed in {duration:.2f}s")
-        
-        menu_text = response.text
-        user.company_ref.menu = menu_text
-        db.session.commit()
-        
-        return jsonify({
-            'success': True, 
-            'menu_text': menu_text
-        })
-        
-    except Exception as e:
-        import traceback
-        error_msg = traceback.format_exc()
-        current_app.logger.error(f"Vertex AI Vision Error for user {user_id}:\n{error_msg}")
-        return jsonify({'error': str(e)}), 500
+        job, coalesced = extraction_jobs.submit(key, company_id, image_count, run)
+    except JobQueueFull as e:
+        return jsonify({'error': f"Trop d'extractions en cours, réessayez plus tard ({e})"}), 503
+
+    # No 'success' here: the menu is not there yet (poll status_url or
+    # listen for the menu_extraction event until status is done/failed)
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'coalesced': coalesced,
+        'status_url': f"/api/admin/menu/extract/{job.id}"
+    }), 202
+
+@admin_bp.route('/menu/extract/<job_id>', methods=['GET'])
+def extraction_status(job_id):
+    job = extraction_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Tâche introuvable'}), 404
+    return jsonify(job.to_dict())
 
 @admin_bp.route('/menu/image/<int:image_id>')
 def get_menu_image(image_id):
     image = MenuImage.query.get_or_404(image_id)
-    return send_file(
-        io.BytesIO(image.image_data),
-        mimetype='image/jpeg',
-        as_attachment=False,
-        download_name=image.filename or f"menu_{image_id}.jpg"
-    )
+    # ?variant=thumb for the admin list, model for the extraction copy; original by default
+    key, mimetype = variant_key(image, request.args.get('variant', 'original'))
+    mimetype = mimetype or 'image/jpeg'
+    download_name = image.filename or f"menu_{image_id}.jpg"
+    etag = key or menu_image_etag(image)
+    
+    # Revalidation answers 304 before any bytes are read
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+    elif key and blob_store.path(key):
+        # Streamed from disk by the server, with Range support
+        response = send_file(blob_store.path(key), mimetype=mimetype, as_attachment=False,
+                             download_name=download_name, etag=etag, last_modified=image.created_at,
+                             conditional=True)
+    elif key:
+        response = Response(stream_with_context(blob_store.iter_chunks(key)), mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = image.created_at
+    else:
+        # Legacy row still holding its bytes inline
+        response = send_file(
+            io.BytesIO(image.image_data),
+            mimetype=mimetype,
+            as_attachment=False,
+            download_name=download_name,
+            etag=etag,
+            last_modified=image.created_at,
+            conditional=True
+        )
+    response.headers['Cache-Control'] = MENU_IMAGE_CACHE_CONTROL
+    return response
 
 @admin_bp.route('/menu/image/<int:image_id>', methods=['DELETE'])
 def delete_menu_image(image_id):
     image = MenuImage.query.get_or_404(image_id)
     # Superadmin can delete any image
+    keys = variant_keys(image)
     db.session.delete(image)
     db.session.commit()
+    # Blobs are shared by identical uploads: only drop the ones no image references
+    if keys:
+        referenced = set(db.session.execute(referenced_keys_statement(MenuImage, keys)).scalars())
+        for blob_key in keys - referenced:
+            blob_store.delete(blob_key)
     return jsonify({'success': True})
 
 @admin_bp.route('/menu/images', methods=['GET'])
@@ -233,4 +329,26 @@ def get_menu_images():
         return jsonify([])
 
     images = MenuImage.query.filter_by(company_id=company_id).all()
-    return jsonify([{'id': img.id, 'filename': img.filename, 'created_at': img.created_at.isoformat()} for img in images])
+    return jsonify([{
+        'id': img.id,
+        'filename': img.filename,
+        'created_at': img.created_at.isoformat(),
+        'width': img.width,
+        'height': img.height,
+        'thumb_url': f"/api/admin/menu/image/{img.id}?variant=thumb" if img.thumb_hash else None,
+    } for img in images])
+
+@admin_bp.route('/voice/stats', methods=['GET'])
+def voice_stats():
+    """Live call engine metrics for this worker"""
+    return jsonify({
+        'engine': call_engine.stats(),
+        'gemini_pool': gemini_pool.stats(),
+        'call_setups': call_setups.stats(),
+        'call_profiles': call_profile_stats(),
+        'company_cache': company_cache.stats(),
+        'bus': get_bus().stats(),
+        'events': event_broker.stats(),
+        'extraction_jobs': extraction_jobs.stats(),
+        'menu_catalogs': menu_catalogs.stats()
+    })
@@ -1,15 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, File, Form
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import desc, func
+from sqlalchemy.orm import defer
 from typing import List, Optional
 
 from database import get_db
 from models_new import Order, Demand, User, Company, MenuImage
+try:
+    from models_new import MenuItem
+except ImportError:  # models_new without the menu_items model: no structured catalog, prompts use company.menu
+    MenuItem = None
 from auth import get_current_user, get_current_admin_user, get_password_hash
 from schemas import OrderOut, DemandOut, CompanyOut, UserOut
 from utils.phone import normalize_phone
+from utils.audio import vad_settings
 from config.constants import DEFAULT_SYSTEM_PROMPTS
+from services.gemini_pool import gemini_pool
+from services.call_setup import call_setups
+from services.call_profile import call_profile_stats
+from services.company_cache import company_cache, company_changed
+from services.invalidation_bus import publish_change
+from services.pubsub import get_bus
+from services.event_broker import event_broker
+from services.blob_store import blob_store, content_hash
+from services.image_pipeline import process_image_async, variant_key, variant_keys, referenced_keys_statement
+from services.menu_catalog import sync_menu_items, menu_catalogs
+from utils.static_cache import MENU_IMAGE_CACHE_CONTROL, etag_matches
+from services.dashboard import dashboard_statement, build_dashboard, demands_statement, build_demands
+from config.config import Config
 
 # We split into two routers or keep one with prefix /api
 # Frontend calls /api/dashboard, /api/demands, etc.
@@ -21,48 +42,40 @@ router = APIRouter(prefix="/api", tags=["Admin"])
 # --- Dashboard & Orders ---
 
 @router.get("/dashboard")
-async def dashboard(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def dashboard(termine_cursor: Optional[str] = None, termine_limit: Optional[int] = None, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # Filter Logic
     if current_user.company_id:
-        filter_kwargs = {"company_id": current_user.company_id}
+        company_id = current_user.company_id
     else:
         # Superadmin sees all? Or empty? Legacy behavior: If no company, see all if superadmin.
         if current_user.is_superadmin:
-             filter_kwargs = {}
+             company_id = None
         else:
-             return {"orders_recu": [], "orders_en_cours": [], "orders_termine": []}
+             return {"orders_recu": [], "orders_en_cours": [], "orders_termine": [], "termine_next_cursor": None,
+                     "orders_recu_truncated": False, "orders_en_cours_truncated": False}
 
-    async def get_orders(status):
-        stmt = select(Order).filter_by(status=status, **filter_kwargs).order_by(desc(Order.created_at))
-        result = await db.execute(stmt)
-        return result.scalars().all()
+    # All statuses in one query; completed orders are paged by keyset cursor
+    page_size = min(max(termine_limit or Config.DASHBOARD_PAGE_SIZE, 1), 200)
+    try:
+        stmt = dashboard_statement(Order, Company, company_id=company_id, cursor=termine_cursor, page_size=page_size)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
-    return {
-        "orders_recu": await get_orders("recu"),
-        "orders_en_cours": await get_orders("en_cours"),
-        "orders_termine": await get_orders("termine")
-    }
+    result = await db.execute(stmt)
+    return build_dashboard(result.all(), cursor=termine_cursor, page_size=page_size)
 
 @router.get("/demands")
 async def get_demands(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if current_user.is_superadmin:
-        stmt = select(Demand).order_by(desc(Demand.created_at))
+        company_id = None
     elif current_user.company_id:
-        stmt = select(Demand).filter_by(company_id=current_user.company_id).order_by(desc(Demand.created_at))
+        company_id = current_user.company_id
     else:
         return {"demands_new": [], "demands_processed": []}
         
-    result = await db.execute(stmt)
-    all_demands = result.scalars().all()
-    
-    # Enrich with active orders count?
-    # For now return list, frontend might expect 'active_orders_count' in objects.
-    # We'll skip complex count logic for MVP speed unless vital.
-    
-    return {
-        "demands_new": [d for d in all_demands if d.status == 'new'],
-        "demands_processed": [d for d in all_demands if d.status == 'processed']
-    }
+    # Same enriched shape as the Flask endpoint: active_orders_count per demand in one query
+    result = await db.execute(demands_statement(Demand, Order, company_id=company_id))
+    return build_demands(result.all())
 
 @router.post("/demands/{demand_id}/status")
 async def update_demand_status(demand_id: int, payload: dict, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
@@ -75,6 +88,7 @@ async def update_demand_status(demand_id: int, payload: dict, current_user: User
     if status_val in ['new', 'processed']:
         demand.status = status_val
         await db.commit()
+        event_broker.publish('demand_status', {'demand_id': demand.id, 'status': status_val}, company_id=demand.company_id)
         return {"success": True}
     raise HTTPException(400, "Invalid status")
 
@@ -100,6 +114,7 @@ async def update_order_status(order_id: int, payload: dict, current_user: User =
     if status_val in ['recu', 'en_cours', 'termine']:
         order.status = status_val
         await db.commit()
+        event_broker.publish('order_status', {'order_id': order.id, 'status': status_val}, company_id=order.company_id)
         return {"success": True, "status": status_val}
     raise HTTPException(400, "Invalid status")
 
@@ -125,19 +140,46 @@ async def toggle_agent(current_user: User = Depends(get_current_user), db: Async
     if company:
         company.agent_on = not company.agent_on
         await db.commit()
+        company_changed(company.id)
         return {"success": True, "agent_on": company.agent_on}
     return {"error": "Company not found"}, 404
 
 # --- Admin Menu ---
 
 @router.get("/admin/menu/image/{image_id}")
-async def get_menu_image(image_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(MenuImage).where(MenuImage.id == image_id))
-    image = result.scalars().first()
+async def get_menu_image(image_id: int, request: Request, variant: str = "original", db: AsyncSession = Depends(get_db)):
+    # Metadata only: the bytes are streamed from the blob store
+    result = await db.execute(
+        select(
+            MenuImage.content_hash, MenuImage.content_type, MenuImage.thumb_hash, MenuImage.model_hash,
+            MenuImage.filename,
+        ).where(MenuImage.id == image_id)
+    )
+    image = result.first()
     if not image:
         raise HTTPException(404, "Image not found")
-        
-    return Response(content=image.image_data, media_type="image/jpeg")
+    # ?variant=thumb for the admin list, model for the extraction copy
+    key, media_type = variant_key(image, variant)
+    media_type = media_type or "image/jpeg"
+    if_none_match = request.headers.get("if-none-match")
+    
+    if key:
+        headers = {"ETag": f'"{key}"', "Cache-Control": MENU_IMAGE_CACHE_CONTROL}
+        if etag_matches(if_none_match, key):
+            return Response(status_code=304, headers=headers)
+        path = blob_store.path(key)
+        if path:
+            return FileResponse(path, media_type=media_type, headers=headers)
+        return StreamingResponse(blob_store.iter_chunks(key), media_type=media_type, headers=headers)
+    
+    # Legacy row still holding its bytes inline
+    result = await db.execute(select(MenuImage.image_data).where(MenuImage.id == image_id))
+    data = result.scalar() or b""
+    etag = content_hash(data)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": MENU_IMAGE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=media_type, headers=headers)
 
 @router.post("/admin/menu/save")
 async def save_menu_images(
@@ -154,9 +196,17 @@ async def save_menu_images(
     for file in menu_images:
         content = await file.read()
         if content:
+            # Hashing, decoding and resizing run on the image pool, off the event loop
+            processed = await process_image_async(content)
             new_img = MenuImage(
                 company_id=target_user.company_id,
-                image_data=content,
+                content_hash=processed.content_hash,
+                content_type=processed.content_type,
+                size=processed.size,
+                width=processed.width,
+                height=processed.height,
+                thumb_hash=processed.thumb_hash,
+                model_hash=processed.model_hash,
                 filename=file.filename
             )
             db.add(new_img)
@@ -210,6 +260,7 @@ async def manage_users(payload: dict, current_user: User = Depends(get_current_u
             
             db.add(new_user)
             await db.commit()
+            company_changed(new_company.id, new_company.phone_number)
             return {"success": True, "user": new_user.to_dict()}
         except Exception as e:
             print(f"Error creating user: {str(e)}")
@@ -218,6 +269,10 @@ async def manage_users(payload: dict, current_user: User = Depends(get_current_u
         
     elif action == 'edit':
         user_id = payload.get('user_id')
+        try:
+            vad = vad_settings(payload)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
         result = await db.execute(select(User).where(User.id == user_id))
         user = result.scalars().first()
         if not user:
@@ -230,11 +285,19 @@ async def manage_users(payload: dict, current_user: User = Depends(get_current_u
              if 'company' in payload: user.company_ref.name = payload.get('company')
              if 'phone_number' in payload: user.company_ref.phone_number = normalize_phone(payload.get('phone_number'))
              if 'voice' in payload: user.company_ref.voice = payload.get('voice')
+             for field, value in vad.items():
+                 if hasattr(Company, field): setattr(user.company_ref, field, value)
              if 'agent_on' in payload: user.company_ref.agent_on = payload.get('agent_on')
              if 'system_prompt' in payload: user.company_ref.system_prompt = payload.get('system_prompt')
-             if 'menu' in payload: user.company_ref.menu = payload.get('menu')
+             if 'menu' in payload:
+                 user.company_ref.menu = payload.get('menu')
+                 if MenuItem is not None:
+                     await db.run_sync(sync_menu_items, MenuItem, user.company_id, user.company_ref.menu)
         
         await db.commit()
+        if user.company_ref:
+             company_changed(user.company_id, user.company_ref.phone_number)
+        publish_change('user', user_id=user.id)
         return {"success": True, "user": user.to_dict()}
         
     elif action == 'delete':
@@ -244,6 +307,7 @@ async def manage_users(payload: dict, current_user: User = Depends(get_current_u
         if user:
              await db.delete(user)
              await db.commit()
+             publish_change('user', user_id=user_id)
         return {"success": True}
         
     raise HTTPException(400, "Invalid action")
@@ -264,13 +328,21 @@ async def get_menu_images_list(user_id: Optional[int] = None, current_user: User
     if not target_company_id:
          return []
          
-    result = await db.execute(select(MenuImage).filter_by(company_id=target_company_id))
-    images = result.scalars().all()
-    return [{'id': img.id, 'filename': img.filename} for img in images]
+    result = await db.execute(
+        select(MenuImage.id, MenuImage.filename, MenuImage.width, MenuImage.height, MenuImage.thumb_hash)
+        .filter_by(company_id=target_company_id)
+    )
+    return [{
+        'id': img.id,
+        'filename': img.filename,
+        'width': img.width,
+        'height': img.height,
+        'thumb_url': f"/api/admin/menu/image/{img.id}?variant=thumb" if img.thumb_hash else None,
+    } for img in result.all()]
 
 @router.delete("/admin/menu/image/{image_id}")
 async def delete_menu_image_endpoint(image_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(MenuImage).where(MenuImage.id == image_id))
+    result = await db.execute(select(MenuImage).options(defer(MenuImage.image_data)).where(MenuImage.id == image_id))
     image = result.scalars().first()
     if not image:
          raise HTTPException(404, "Image not found")
@@ -279,6 +351,26 @@ async def delete_menu_image_endpoint(image_id: int, current_user: User = Depends
          if image.company_id != current_user.company_id:
               raise HTTPException(403, "Access denied")
               
+    keys = variant_keys(image)
     await db.delete(image)
     await db.commit()
+    # Blobs are shared by identical uploads: only drop the ones no image references
+    if keys:
+        result = await db.execute(referenced_keys_statement(MenuImage, keys))
+        for blob_key in keys - set(result.scalars()):
+            await run_in_threadpool(blob_store.delete, blob_key)
     return {"success": True}
+
+@router.get("/admin/voice/stats")
+async def voice_stats(current_user: User = Depends(get_current_user)):
+    if not current_user.is_superadmin:
+         raise HTTPException(status_code=403, detail="Superadmin access required")
+    return {
+        "gemini_pool": gemini_pool.stats(),
+        "call_setups": call_setups.stats(),
+        "call_profiles": call_profile_stats(),
+        "company_cache": company_cache.stats(),
+        "bus": get_bus().stats(),
+        "events": event_broker.stats(),
+        "menu_catalogs": menu_catalogs.stats()
+    }
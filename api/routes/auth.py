@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from extensions import db
-from models.models import User, Company
+from models.models import User, Company, MenuItem
 from utils.phone import normalize_phone
+from utils.audio import vad_settings
+from services.company_cache import company_changed
+from services.menu_catalog import sync_menu_items
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 
@@ -73,6 +76,7 @@ def register():
     
     db.session.add(user)
     db.session.commit()
+    company_changed(new_company.id, new_company.phone_number)
     
     return jsonify({'success': True, 'message': 'Compte créé avec succès', 'user': user.to_dict()}), 201
 
@@ -88,6 +92,11 @@ def update_profile():
         # However, let's allow them to update their own profile/company here too.
         pass
 
+    try:
+        vad = vad_settings(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     if current_user.is_admin or current_user.is_superadmin:
         company = current_user.company_ref
         if company:
@@ -95,6 +104,8 @@ def update_profile():
                 company.agent_on = data.get('agent_on')
             if 'voice' in data:
                 company.voice = data.get('voice')
+            for field, value in vad.items():
+                setattr(company, field, value)
             
             # Superadmin only fields
             if current_user.is_superadmin:
@@ -104,8 +115,11 @@ def update_profile():
                     company.phone_number = normalize_phone(data.get('phone_number'))
                 if 'menu' in data:
                     company.menu = data.get('menu')
+                    sync_menu_items(db.session, MenuItem, company.id, company.menu)
     
     db.session.commit()
+    if current_user.company_ref:
+        company_changed(current_user.company_ref.id, current_user.company_ref.phone_number)
     return jsonify({
         'success': True,
         'user': current_user.to_dict()
@@ -4,7 +4,14 @@ from sqlalchemy.future import select
 from auth import verify_password, create_access_token, get_current_user
 from database import get_db
 from models_new import User
+try:
+    from models_new import MenuItem
+except ImportError:  # models_new without the menu_items model: no structured catalog, prompts use company.menu
+    MenuItem = None
 from schemas import UserLogin, Token, UserOut
+from services.company_cache import company_changed
+from utils.audio import vad_settings
+from services.menu_catalog import sync_menu_items
 
 # Create router (prefix /api is handled here or in main, let's include it here)
 router = APIRouter(prefix="/api", tags=["Auth"])
@@ -32,6 +39,11 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 @router.post("/profile")
 async def update_profile(data: dict, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    try:
+        vad = vad_settings(data)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
     # Update Password if provided
     if 'password' in data and data['password']:
         from auth import get_password_hash
@@ -43,12 +55,20 @@ async def update_profile(data: dict, current_user: User = Depends(get_current_us
             current_user.company_ref.agent_on = data['agent_on']
         if 'voice' in data:
             current_user.company_ref.voice = data['voice']
+        for field, value in vad.items():
+            # Only where the company model maps the column (scripts/migrate_company_vad.py)
+            if hasattr(type(current_user.company_ref), field):
+                setattr(current_user.company_ref, field, value)
         if 'system_prompt' in data:
             current_user.company_ref.system_prompt = data['system_prompt']
         if 'menu' in data:
             current_user.company_ref.menu = data['menu']
+            if MenuItem is not None:
+                await db.run_sync(sync_menu_items, MenuItem, current_user.company_id, data['menu'])
             
     await db.commit()
+    if current_user.company_ref:
+        company_changed(current_user.company_id, current_user.company_ref.phone_number)
     # Refresh user to get latest state
     # await db.refresh(current_user)
     
@@ -0,0 +1,56 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from auth import oauth2_scheme_optional, get_user_from_token
+from config.config import Config
+from database import async_session
+from services.event_broker import event_broker, AsyncSubscription, format_sse, parse_last_event_id
+
+router = APIRouter(prefix="/api", tags=["Events"])
+
+@router.get("/events")
+async def events(request: Request, token: Optional[str] = None, header_token: Optional[str] = Depends(oauth2_scheme_optional)):
+    # EventSource cannot set headers, so the JWT may also come as ?token=
+    token = header_token or token
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    
+    # Short-lived session: don't hold a DB connection for the life of the stream
+    async with async_session() as db:
+        user = await get_user_from_token(token, db)
+    
+    last_event_id = parse_last_event_id(
+        request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    )
+    subscription = event_broker.subscribe(
+        company_id=user.company_id,
+        all_companies=user.is_superadmin,
+        last_event_id=last_event_id,
+        subscription_cls=AsyncSubscription,
+    )
+    
+    async def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await subscription.get(timeout=Config.SSE_HEARTBEAT_INTERVAL)
+                except EOFError:
+                    # Evicted for falling behind: the browser reconnects with Last-Event-ID
+                    return
+                if event is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_sse(event)
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,77 +1,57 @@
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from extensions import db
-from models.models import Order, Demand
+from models.models import Order, Demand, Company
 from utils.phone import normalize_phone
-import json
-import time
+from config.config import Config
+from services.company_cache import company_cache, company_changed
+from services.event_broker import event_broker, format_sse, parse_last_event_id
+from services.order_archive import customer_history_statement, history_row_to_dict
+from services.dashboard import dashboard_statement, build_dashboard, demands_statement, build_demands
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/api')
 
-event_queue = []
-
-def add_event(event_type, data):
-    event_queue.append({
-        'type': event_type,
-        'data': data,
-        'timestamp': time.time()
-    })
+def add_event(event_type, data, company_id=None):
+    """Push a dashboard event to the SSE clients of `company_id` (and superadmins)"""
+    return event_broker.publish(event_type, data, company_id=company_id)
 
 @orders_bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Get phone from company, not user
-    user_phone = None
-    if current_user.company_ref and current_user.company_ref.phone_number:
-        user_phone = normalize_phone(current_user.company_ref.phone_number)
-    
-    # Filter by company_id instead of company_phone
+    # Filter by company_id; without a company only the superadmin sees (all) orders
     if current_user.company_ref:
         company_id = current_user.company_ref.id
-        orders_recu = Order.query.filter_by(status='recu', company_id=company_id).order_by(Order.created_at.desc()).all()
-        orders_en_cours = Order.query.filter_by(status='en_cours', company_id=company_id).order_by(Order.created_at.desc()).all()
-        orders_termine = Order.query.filter_by(status='termine', company_id=company_id).order_by(Order.created_at.desc()).all()
+    elif current_user.is_superadmin:
+        company_id = None
     else:
-        # Fallback: if no company, return empty or all orders (for superadmin)
-        orders_recu = Order.query.filter_by(status='recu').order_by(Order.created_at.desc()).all() if current_user.is_superadmin else []
-        orders_en_cours = Order.query.filter_by(status='en_cours').order_by(Order.created_at.desc()).all() if current_user.is_superadmin else []
-        orders_termine = Order.query.filter_by(status='termine').order_by(Order.created_at.desc()).all() if current_user.is_superadmin else []
+        return jsonify({'orders_recu': [], 'orders_en_cours': [], 'orders_termine': [], 'termine_next_cursor': None,
+                        'orders_recu_truncated': False, 'orders_en_cours_truncated': False})
     
-    return jsonify({
-        'orders_recu': [o.to_dict() for o in orders_recu],
-        'orders_en_cours': [o.to_dict() for o in orders_en_cours],
-        'orders_termine': [o.to_dict() for o in orders_termine]
-    })
+    # ?termine_cursor= pages through completed orders (keyset on created_at, id)
+    cursor = request.args.get('termine_cursor') or None
+    page_size = min(max(request.args.get('termine_limit', type=int) or Config.DASHBOARD_PAGE_SIZE, 1), 200)
+    try:
+        stmt = dashboard_statement(Order, Company, company_id=company_id, cursor=cursor, page_size=page_size)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows = db.session.execute(stmt).all()
+    return jsonify(build_dashboard(rows, cursor=cursor, page_size=page_size))
 
 @orders_bp.route('/demands')
 @login_required
 def demands_dashboard():
     # Filter by company_id instead of user_id
     if current_user.is_superadmin:
-        demands = Demand.query.order_by(Demand.created_at.desc()).all()
+        company_id = None
     elif current_user.company_ref:
         company_id = current_user.company_ref.id
-        demands = Demand.query.filter_by(company_id=company_id).order_by(Demand.created_at.desc()).all()
     else:
-        demands = []
+        return jsonify({'demands_new': [], 'demands_processed': []})
     
-    demand_list = []
-    for demand in demands:
-        d_dict = demand.to_dict()
-        if demand.customer_phone:
-            active_orders_count = Order.query.filter(
-                Order.customer_phone == demand.customer_phone,
-                Order.status.in_(['recu', 'en_cours'])
-            ).count()
-            d_dict['active_orders_count'] = active_orders_count
-        else:
-            d_dict['active_orders_count'] = 0
-        demand_list.append(d_dict)
-            
-    return jsonify({
-        'demands_new': [d for d in demand_list if d['status'] == 'new'],
-        'demands_processed': [d for d in demand_list if d['status'] == 'processed']
-    })
+    # active_orders_count comes from one grouped aggregate, scoped to the demand's company
+    rows = db.session.execute(demands_statement(Demand, Order, company_id=company_id)).all()
+    return jsonify(build_demands(rows))
 
 @orders_bp.route('/demands/<int:demand_id>/status', methods=['POST'])
 @login_required
@@ -81,6 +61,7 @@ def update_demand_status(demand_id):
     if new_status in ['new', 'processed']:
         demand.status = new_status
         db.session.commit()
+        add_event('demand_status', {'demand_id': demand.id, 'status': new_status}, company_id=demand.company_id)
         return jsonify({'success': True})
     return jsonify({'error': 'Invalid status'}), 400
 
@@ -101,6 +82,7 @@ def update_status(order_id):
     if new_status in ['recu', 'en_cours', 'termine']:
         order.status = new_status
         db.session.commit()
+        add_event('order_status', {'order_id': order.id, 'status': new_status}, company_id=order.company_id)
         return jsonify({'success': True, 'status': new_status})
         
     return jsonify({'error': 'Invalid status'}), 400
@@ -138,33 +120,59 @@ def toggle_agent():
         return jsonify({'error': 'No company associated'}), 400
     current_user.company_ref.agent_on = not current_user.company_ref.agent_on
     db.session.commit()
+    company_changed(current_user.company_ref.id)
     return jsonify({'success': True, 'agent_on': current_user.company_ref.agent_on})
 
 @orders_bp.route('/events')
+@login_required
 def events():
+    company_id = current_user.company_ref.id if current_user.company_ref else None
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    subscription = event_broker.subscribe(
+        company_id=company_id,
+        all_companies=current_user.is_superadmin,
+        last_event_id=last_event_id,
+    )
+    
     @stream_with_context
     def generate():
-        last_check = time.time()
-        while True:
-            current_events = [e for e in event_queue if e['timestamp'] > last_check]
-            for event in current_events:
-                yield f"data: {json.dumps(event)}\n\n"
-            if current_events:
-                last_check = current_events[-1]['timestamp']
-            time.sleep(1)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=Config.SSE_HEARTBEAT_INTERVAL)
+                except EOFError:
+                    # Evicted for falling behind: the browser reconnects with Last-Event-ID
+                    return
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_sse(event)
+        finally:
+            event_broker.unsubscribe(subscription)
             
-    return Response(generate(), mimetype='text/event-stream')
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @orders_bp.route('/orders', methods=['POST'])
 def create_order():
     data = request.json
+    company_phone = normalize_phone(data.get('company_phone'))
+    company = company_cache.get_or_load(
+        company_phone, lambda phone: Company.query.filter_by(phone_number=phone).first()
+    ) if company_phone else None
     order = Order(
         order_detail=data.get('order_detail'),
         customer_name=data.get('customer_name'),
         customer_phone=normalize_phone(data.get('customer_phone')),
         address=data.get('address'),
         status='recu',
-        company_phone=normalize_phone(data.get('company_phone'))
+        company_phone=company_phone,
+        company_id=company.id if company else None
     )
     db.session.add(order)
     db.session.commit()
@@ -178,11 +186,12 @@ def create_order():
     except:
         pass
 
-    add_event('new_order', {'message': 'Ordre reçu'})
+    add_event('new_order', {'message': 'Ordre reçu'}, company_id=order.company_id)
     return jsonify({'success': True, 'order_id': order.id}), 201
 
 @orders_bp.route('/customer/history/<phone>')
 @login_required
 def get_customer_history(phone):
-    orders = Order.query.filter_by(customer_phone=phone).order_by(Order.created_at.desc()).limit(20).all()
-    return jsonify([o.to_dict() for o in orders])
+    # Live and archived orders (UNION ALL), newest first
+    rows = db.session.execute(customer_history_statement(Order, Company, phone, limit=20)).all()
+    return jsonify([history_row_to_dict(row) for row in rows])
@@ -1,16 +1,25 @@
 import json
 import os
-import collections
 import base64
 import asyncio
+import functools
+import logging
 import threading
-import audioop
 import time
+import uuid
 from flask import Blueprint, request, jsonify, current_app
-from extensions import sock, db
-from models.models import User, Order, Demand
+from extensions import sock, db, call_engine
+from services.call_engine import CallRejected
+from services.gemini_pool import gemini_pool, session_key
+from services.call_setup import PreparedCall, call_setups, is_vonage_uuid
+from services.call_profile import CallProfile, CallProfileCache
+from services.company_cache import company_cache
+from services.menu_catalog import menu_catalogs, menu_items_statement, serialize_menu, lookup_menu_item
+from services.outbound_pacer import OutboundPacer
+from models.models import User, Order, Demand, Company, MenuItem
 from routes.orders import add_event
 from utils.phone import normalize_phone
+from utils.audio import PolyphaseResampler, SilenceGate
 
 # Gemini imports at top level for faster thread startup
 try:
@@ -20,29 +29,228 @@ except ImportError:
     pass
 
 voice_bp = Blueprint('voice', __name__)
+logger = logging.getLogger(__name__)
 
 # Gemini model for voice
 GEMINI_MODEL = "gemini-live-2.5-flash-native-audio"
 # GEMINI_MODEL = "gemini-2.5-flash-native-audio-preview-12-2025"
 
-# Company cache to reduce DB hits (TTL: 60 seconds)
-_company_cache = {}
-_CACHE_TTL = 60  # seconds
+def _create_order(app, company_id, caller_number, to_number, args):
+    """Persist an order from the create_order tool call (runs in a worker thread)"""
+    with app.app_context():
+        new_order = Order(
+            status='recu',
+            order_detail=args.get('order_details'),
+            customer_name=args.get('customer_name', 'Unknown'),
+            customer_phone=normalize_phone(caller_number) or 'Unknown',
+            company_id=company_id,
+            company_phone=normalize_phone(to_number),  # Keep for backward compatibility
+            address=args.get('address', 'Non defini')
+        )
+        db.session.add(new_order)
+        db.session.commit()
+        order_id = new_order.id
+        
+        add_event('new_order', {'message': 'Ordre reçu'}, company_id=company_id)
+        
+        try:
+            from routes.notifications import send_web_push
+            send_web_push({
+                "title": "Ordre reçus",
+                "message": f"{args.get('customer_name', 'Client')}: {args.get('order_details', '')}"
+            })
+        except:
+            pass
+        
+        current_app.logger.info(f"✅ Order {order_id} created successfully")
+        return order_id
+
+def _submit_demand(app, company_id, caller_number, to_number, args):
+    """Persist a demand from the submit_demand tool call (runs in a worker thread)"""
+    with app.app_context():
+        # Try to link to a recent order from this caller to this restaurant
+        # (only 'recu' or 'en_cours' as per requirement)
+        # Find recent order by company_id or company_phone (for backward compatibility)
+        if company_id:
+            recent_order = Order.query.filter(
+                Order.company_id == company_id,
+                Order.customer_phone == (caller_number or 'Unknown'),
+                Order.status.in_(['recu', 'en_cours'])
+            ).order_by(Order.created_at.desc()).first()
+        else:
+            recent_order = Order.query.filter(
+                Order.company_phone == to_number,
+                Order.customer_phone == (caller_number or 'Unknown'),
+                Order.status.in_(['recu', 'en_cours'])
+            ).order_by(Order.created_at.desc()).first()
+        
+        new_demand = Demand(
+            company_id=company_id,
+            order_id=recent_order.id if recent_order else None,
+            customer_name=args.get('customer_name') or (recent_order.customer_name if recent_order else 'Unknown'),
+            customer_phone=normalize_phone(caller_number) or 'Unknown',
+            content=args.get('content'),
+            status='new'
+        )
+        db.session.add(new_demand)
+        db.session.commit()
+        
+        add_event('new_demand', {'message': 'Nouvelle demande reçue'}, company_id=company_id)
+        
+        try:
+            from routes.notifications import send_web_push
+            send_web_push({
+                "title": "Nouvelle Demande",
+                "message": f"{args.get('content', '')[:50]}..."
+            })
+        except:
+            pass
 
-def get_cached_company(phone_number):
-    """Get company from cache or DB, with 60s TTL"""
-    from models.models import Company
-    now = time.time()
+def _build_system_instruction(company, menu_index=None):
+    """Voice name and system instruction for a company (Moroccan Darija default)"""
+    system_instruction = "You are a friendly AI restaurant assistant. You MUST speak in strictly Moroccan Darija (Arabic dialect). (تكلم بالدارجة المغربية فقط). Do not speak French or standard Arabic unless requested. Be polite and helpful."
+    voice_name = "Puck"
     
-    if phone_number in _company_cache:
-        company, cached_at = _company_cache[phone_number]
-        if now - cached_at < _CACHE_TTL:
-            return company
+    if company:
+        if company.voice:
+            voice_name = company.voice
+        if company.system_prompt:
+            system_instruction = company.system_prompt
+        
+        # Enforce Darija
+        system_instruction += "\n\nIMPORTANT: Speak in Moroccan Darija (Arabic dialect) at all times."
+        if menu_index:
+            # Compact structured menu; large menus are looked up with lookup_menu_item
+            system_instruction += f"\n\nHere is the Menu:\n{serialize_menu(menu_index)}"
+        elif company.menu:
+            system_instruction += f"\n\nHere is the Menu:\n{company.menu}"
     
-    # Cache miss or expired - fetch from DB
-    company = Company.query.filter_by(phone_number=phone_number).first()
-    _company_cache[phone_number] = (company, now)
-    return company
+    system_instruction += "\n\nWhen the order is confirmed, use the 'create_order' function to submit it. If the customer has a special request, demand, or modification that is NOT a direct food order, use 'submit_demand'. Always ask for the customer's name."
+    if menu_index:
+        system_instruction += " Use 'lookup_menu_item' to check an item or its price when unsure."
+    return voice_name, system_instruction
+
+@functools.lru_cache(maxsize=1)
+def _tool_declarations():
+    """Function declarations shared by every call (built once per process)"""
+    # Define order creation tool
+    create_order_tool = types.FunctionDeclaration(
+        name="create_order",
+        description="Submit a completed restaurant order after the customer confirms.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "order_details": types.Schema(
+                    type=types.Type.STRING,
+                    description="Full list of ordered items"
+                ),
+                "customer_name": types.Schema(
+                    type=types.Type.STRING,
+                    description="Customer's full name"
+                ),
+                "address": types.Schema(
+                    type=types.Type.STRING,
+                    description="Delivery address if provided, otherwise leave empty or 'Non defini'"
+                ),
+            },
+            required=["order_details", "customer_name"]
+        )
+    )
+
+    submit_demand_tool = types.FunctionDeclaration(
+        name="submit_demand",
+        description="Submit a special request, demand, or modification from the customer that is NOT a direct food order.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "content": types.Schema(
+                    type=types.Type.STRING,
+                    description="The details of the customer's demand or request. The detail should be in the language of the agent."
+                ),
+                "customer_name": types.Schema(
+                    type=types.Type.STRING,
+                    description="Customer's full name (if known)"
+                ),
+            },
+            required=["content"]
+        )
+    )
+    lookup_menu_item_tool = types.FunctionDeclaration(
+        name="lookup_menu_item",
+        description="Look up dishes on the restaurant menu by name (any spelling, French, Darija or Arabic) or by category, with their prices.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(
+                    type=types.Type.STRING,
+                    description="Dish or category name as the customer said it"
+                ),
+            },
+            required=["query"]
+        )
+    )
+    return [create_order_tool, submit_demand_tool, lookup_menu_item_tool]
+
+def _build_live_config(voice_name, system_instruction):
+    """Gemini LiveConnectConfig with the order/demand tools"""
+    config = types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
+            )
+        ),
+        system_instruction=types.Content(
+            parts=[types.Part(text=system_instruction)]
+        ),
+        tools=[types.Tool(function_declarations=_tool_declarations())]
+    )
+    return config
+
+def _build_call_profile(company, menu_index=None):
+    """Compile voice, system instruction and live config for a company (cached)"""
+    voice_name, system_instruction = _build_system_instruction(company, menu_index)
+    return CallProfile(
+        voice_name,
+        system_instruction,
+        _build_live_config(voice_name, system_instruction),
+        session_key(GEMINI_MODEL, voice_name, system_instruction)
+    )
+
+_call_profiles = CallProfileCache(_build_call_profile)
+
+def _load_company(app, phone):
+    """Company snapshot for a normalized phone on a cache miss (runs in a worker thread)"""
+    with app.app_context():
+        return company_cache.put(phone, Company.query.filter_by(phone_number=phone).first())
+
+def _load_menu_index(app, company_id):
+    """Build a company's menu search index on a cache miss (runs in a worker thread)"""
+    with app.app_context():
+        return menu_catalogs.put(company_id, db.session.execute(menu_items_statement(MenuItem, company_id)).all())
+
+async def _prepare_call(app, call_id, to_number):
+    """Company lookup, prompt build and Gemini connect for one call (engine loop)"""
+    # Company snapshot from the shared cache; only misses touch the DB
+    phone = normalize_phone(to_number)
+    found, company = company_cache.lookup(phone)
+    if not found:
+        loop = asyncio.get_running_loop()
+        company = await loop.run_in_executor(None, _load_company, app, phone)
+    prepared = PreparedCall(call_id, company)
+    if prepared.agent_off:
+        return prepared
+    
+    if company:
+        prepared.menu_index = menu_catalogs.get(company.id)
+        if prepared.menu_index is None:
+            loop = asyncio.get_running_loop()
+            prepared.menu_index = await loop.run_in_executor(None, _load_menu_index, app, company.id)
+    
+    # Warm pool hands out a pre-connected session when one is idle
+    profile = _call_profiles.get(company, prepared.menu_index)
+    await prepared.open_session(gemini_pool.session(GEMINI_MODEL, profile.config, profile.pool_key))
+    return prepared
 
 @voice_bp.route('/webhooks/event', methods=['POST'])
 def event():
@@ -56,6 +264,18 @@ def answer_call():
     to_number = data.get('to') or request.args.get('to')
     from_number = data.get('from') or request.args.get('from')
     
+    # Reserve the call ID (Vonage call leg uuid) and start setup speculatively:
+    # company lookup + Gemini connect run while Vonage opens the WebSocket.
+    # Only for real call legs; anything else is set up inline.
+    call_id = data.get('uuid') or request.args.get('uuid')
+    if is_vonage_uuid(call_id):
+        app = current_app._get_current_object()
+        call_engine.loop.call_soon_threadsafe(
+            call_setups.reserve, call_id, functools.partial(_prepare_call, app, call_id, to_number)
+        )
+    else:
+        call_id = uuid.uuid4().hex
+    
     host = current_app.config.get('PUBLIC_URL')
     if not host:
         host = request.host
@@ -64,7 +284,7 @@ def answer_call():
     if 'fly.dev' in host:
         scheme = 'wss'
 
-    ws_uri = f"{scheme}://{host}/voice/stream?to_number={to_number}&caller_number={from_number}"
+    ws_uri = f"{scheme}://{host}/voice/stream?to_number={to_number}&caller_number={from_number}&call_id={call_id}"
     
     current_app.logger.info(f"NCCO WebSocket URI: {ws_uri}")
     
@@ -78,7 +298,8 @@ def answer_call():
                 "content-type": "audio/l16;rate=16000",
                 "headers": {
                     "to-number": to_number,
-                    "caller-number": from_number
+                    "caller-number": from_number,
+                    "call-id": call_id
                 }
             }]
         }
@@ -89,414 +310,257 @@ def answer_call():
 def voice_stream(ws):
     """
     Handle incoming voice stream from Vonage using Gemini Live API.
-    Uses threading to bridge sync Flask-Sock with async Gemini SDK.
+    The Gemini session runs as a task on the shared call engine loop;
+    this handler only hands audio frames in and out.
     """
     to_number = request.args.get('to_number') or request.headers.get('to-number')
     caller_number = request.args.get('caller_number') or request.headers.get('caller-number')
     
     current_app.logger.info(f"📞 Incoming call to: {to_number} from: {caller_number}")
     
-    # Fetch company context with normalized phone (cached)
-    norm_to = normalize_phone(to_number)
-    company = get_cached_company(norm_to)
-    
-    if company and not company.agent_on:
-        current_app.logger.info(f"Agent OFF for {to_number}")
-        ws.close()
-        return
-    
-    # Build system instruction
-    # Build system instruction (Moroccan Darija default)
-    system_instruction = "You are a friendly AI restaurant assistant. You MUST speak in strictly Moroccan Darija (Arabic dialect). (تكلم بالدارجة المغربية فقط). Do not speak French or standard Arabic unless requested. Be polite and helpful."
-    voice_name = "Puck"
-    
-    if company:
-        if company.voice:
-            voice_name = company.voice
-        if company.system_prompt:
-            system_instruction = company.system_prompt
-        
-        # Enforce Darija
-        system_instruction += "\n\nIMPORTANT: Speak in Moroccan Darija (Arabic dialect) at all times."
-        if company.menu:
-            system_instruction += f"\n\nHere is the Menu:\n{company.menu}"
-    
-    system_instruction += "\n\nWhen the order is confirmed, use the 'create_order' function to submit it. If the customer has a special request, demand, or modification that is NOT a direct food order, use 'submit_demand'. Always ask for the customer's name."
-    
     app = current_app._get_current_object()
     
-    # Vertex AI Credentials
+    # Vertex AI Credentials (clients themselves come from the warm pool)
     creds_path = os.path.abspath("vertex-json.json")
-    if os.path.exists(creds_path):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = creds_path
-    else:
+    if not os.path.exists(creds_path):
         current_app.logger.error(f"Vertex message: Creds not found at {creds_path}")
     
     current_app.logger.info("🔗 Starting Gemini Live session...")
     
-    # Shared state between threads
-    stop_event = threading.Event()
-    audio_queue = collections.deque()
-    audio_lock = threading.Lock()
-    greeting_sent = threading.Event()  # Track if greeting was sent
+    call_id = request.args.get('call_id') or request.headers.get('call-id') or uuid.uuid4().hex
     
-    def gemini_thread():
-        """Run Gemini in a separate thread with its own event loop"""
+    async def run_gemini(handle):
+        """Run one Gemini Live session as a task on the shared call engine loop"""
+        stop_event = handle.stop_event
+        metrics = handle.metrics
+        loop = asyncio.get_running_loop()
         
-        async def run_gemini():
-            # Imports moved to top-level to avoid blocking/delays
-            # from google import genai
-            # from google.genai import types
+        try:
+            # Attach to the setup started by the answer webhook, or set up inline
+            setup = call_setups.claim(handle.call_id)
+            metrics.setup = 'speculative' if setup else 'inline'
+            if setup is None:
+                setup = asyncio.ensure_future(_prepare_call(app, handle.call_id, to_number))
+            prepared = await setup
+            company_id = prepared.company_id
+            menu_index = prepared.menu_index
             
-            try:
-                # Initialize Vertex AI Client
-                client = genai.Client(
-                    vertexai=True,
-                    project="polar-equinox-472800-j2",
-                    location="us-central1"
-                )
-                
-                # Define order creation tool
-                create_order_tool = types.FunctionDeclaration(
-                    name="create_order",
-                    description="Submit a completed restaurant order after the customer confirms.",
-                    parameters=types.Schema(
-                        type=types.Type.OBJECT,
-                        properties={
-                            "order_details": types.Schema(
-                                type=types.Type.STRING,
-                                description="Full list of ordered items"
-                            ),
-                            "customer_name": types.Schema(
-                                type=types.Type.STRING,
-                                description="Customer's full name"
-                            ),
-                            "address": types.Schema(
-                                type=types.Type.STRING,
-                                description="Delivery address if provided, otherwise leave empty or 'Non defini'"
-                            ),
-                        },
-                        required=["order_details", "customer_name"]
-                    )
-                )
+            if prepared.agent_off:
+                logger.info(f"Agent OFF for {to_number}")
+                await prepared.close()
+                return
+            
+            async with prepared as session:
+                metrics.connected_at = time.time()
+                logger.info(f"✅ Connected to Gemini Live! ({caller_number} -> {to_number}, call {handle.call_id})")
                 
-                submit_demand_tool = types.FunctionDeclaration(
-                    name="submit_demand",
-                    description="Submit a special request, demand, or modification from the customer that is NOT a direct food order.",
-                    parameters=types.Schema(
-                        type=types.Type.OBJECT,
-                        properties={
-                            "content": types.Schema(
-                                type=types.Type.STRING,
-                                description="The details of the customer's demand or request. The detail should be in the language of the agent."
-                            ),
-                            "customer_name": types.Schema(
-                                type=types.Type.STRING,
-                                description="Customer's full name (if known)"
-                            ),
-                        },
-                        required=["content"]
+                # Send greeting IMMEDIATELY after connect (before starting receive loop)
+                try:
+                    await session.send(
+                        input="The customer is online. Say 'Salam' and ask for their order in Moroccan Darija.", 
+                        end_of_turn=True
                     )
-                )
+                    logger.info("🎤 Greeting sent to Gemini")
+                except Exception as e:
+                    metrics.errors += 1
+                    logger.error(f"❌ Failed to send greeting: {e}")
                 
-                config = types.LiveConnectConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
-                        )
-                    ),
-                    system_instruction=types.Content(
-                        parts=[types.Part(text=system_instruction)]
-                    ),
-                    tools=[types.Tool(function_declarations=[create_order_tool, submit_demand_tool])]
+                # Local VAD: silence past the hangover is dropped or thinned before Gemini
+                company = prepared.company
+                gate = SilenceGate(
+                    mode=company.vad_mode if company and company.vad_mode is not None else app.config['VOICE_VAD_MODE'],
+                    threshold=company.vad_threshold if company and company.vad_threshold is not None else app.config['VOICE_VAD_THRESHOLD'],
+                    hangover_ms=app.config['VOICE_VAD_HANGOVER_MS'],
+                    keep_every=app.config['VOICE_VAD_KEEP_EVERY'],
                 )
+                metrics.channels['vad'] = gate
+
+                # Task to send audio to Gemini
+                async def send_audio():
+                    # Woken as soon as the WebSocket reader pushes a frame; None means hang-up
+                    while True:
+                        audio_data = await handle.inbound.get()
+                        if audio_data is None:
+                            break
+                        try:
+                            for chunk in gate.process(audio_data):
+                                await session.send(
+                                    input=types.LiveClientRealtimeInput(
+                                        media_chunks=[types.Blob(
+                                            mime_type="audio/pcm",
+                                            data=chunk
+                                        )]
+                                    )
+                                )
+                        except Exception as e:
+                            metrics.errors += 1
+                            logger.error(f"❌ Send to Gemini error for {caller_number}: {e}")
+                            break
                 
-                async with client.aio.live.connect(
-                    model=GEMINI_MODEL,
-                    config=config
-                ) as session:
-                    with app.app_context():
-                        current_app.logger.info("✅ Connected to Gemini Live!")
-                        current_app.logger.info(f"✨ Gemini Live session started for {caller_number} -> {to_number}")
-                    
-                    # Send greeting IMMEDIATELY after connect (before starting receive loop)
+                # Resampler (24k -> 16k), stateful across Gemini chunks
+                resampler = PolyphaseResampler(24000, 16000)
+
+                # Gemini's bursts are re-cut into 20ms frames and paced out to Vonage;
+                # the WebSocket side does the (blocking) ws.send
+                pacer = OutboundPacer(handle.send_audio)
+                metrics.channels['outbound'] = pacer
+
+                async def play_audio():
+                    try:
+                        await pacer.run()
+                    finally:
+                        stop_event.set()
+
+                # Task to receive from Gemini
+                async def receive_audio():
                     try:
-                        await session.send(
-                            input="The customer is online. Say 'Salam' and ask for their order in Moroccan Darija.", 
-                            end_of_turn=True
-                        )
-                        greeting_sent.set()
-                        with app.app_context():
-                            current_app.logger.info("🎤 Greeting sent to Gemini")
-                    except Exception as e:
-                        with app.app_context():
-                            current_app.logger.error(f"❌ Failed to send greeting: {e}")
-                    
-                    # Task to send audio to Gemini
-                    async def send_audio():
                         while not stop_event.is_set():
-                            audio_data = None
-                            with audio_lock:
-                                if audio_queue:
-                                    audio_data = audio_queue.popleft()
-                            
-                            if audio_data:
-                                try:
-                                    await session.send(
-                                        input=types.LiveClientRealtimeInput(
-                                            media_chunks=[types.Blob(
-                                                mime_type="audio/pcm",
-                                                data=audio_data
-                                            )]
-                                        )
-                                    )
-                                except Exception as e:
-                                    with app.app_context():
-                                        current_app.logger.error(f"❌ Send to Gemini error for {caller_number}: {e}")
-                                    break
-                            else:
-                                await asyncio.sleep(0.01)  # 10ms polling (safer for CPU than 2ms)
-                    
-                    # Resampling state (24k -> 16k)
-                    resample_state = None
+                            try:
+                                async for response in session.receive():
+                                    if stop_event.is_set():
+                                        break
+                                    
+                                    # Barge-in: cut the agent off before anything else in this response
+                                    if response.server_content and response.server_content.interrupted:
+                                        dropped_ms = pacer.flush()
+                                        resampler.reset()
+                                        metrics.record_barge_in(pacer.tail_ms, dropped_ms)
+                                        logger.info(f"🛑 User interrupted: dropped {dropped_ms}ms of queued audio")
 
-                    # Task to receive from Gemini
-                    async def receive_audio():
-                        nonlocal resample_state
-                        try:
-                            while not stop_event.is_set():
-                                try:
-                                    async for response in session.receive():
-                                        if stop_event.is_set():
-                                            break
-                                        
-                                        # Handle audio response
-                                        if response.server_content and response.server_content.model_turn:
-                                            for part in response.server_content.model_turn.parts:
-                                                if part.inline_data and part.inline_data.data:
-                                                    try:
-                                                        # Resample 24kHz (Gemini) -> 16kHz (Vonage)
-                                                        # audioop.ratecv(fragment, width, nchannels, inrate, outrate, state)
-                                                        fragment = part.inline_data.data
-                                                        new_fragment, resample_state = audioop.ratecv(
-                                                            fragment, 2, 1, 24000, 16000, resample_state
+                                    # Handle audio response
+                                    if response.server_content and response.server_content.model_turn:
+                                        for part in response.server_content.model_turn.parts:
+                                            if part.inline_data and part.inline_data.data:
+                                                # Resample 24kHz (Gemini) -> 16kHz (Vonage)
+                                                pacer.write(resampler.process(part.inline_data.data))
+                                    
+                                    # Handle function calls (DB + push work runs off the engine loop)
+                                    if response.tool_call:
+                                        for fc in response.tool_call.function_calls:
+                                            metrics.tool_calls += 1
+                                            args = dict(fc.args)
+                                            if fc.name == "create_order":
+                                                logger.info(f"📦 Creating order: {args}")
+                                                try:
+                                                    order_id = await loop.run_in_executor(
+                                                        None, _create_order, app, company_id, caller_number, to_number, args
+                                                    )
+                                                    await session.send(
+                                                        input=types.LiveClientToolResponse(
+                                                            function_responses=[types.FunctionResponse(
+                                                                name="create_order",
+                                                                id=fc.id,
+                                                                response={"status": "success", "order_id": order_id}
+                                                            )]
                                                         )
-                                                        ws.send(new_fragment)
-                                                    except Exception as e:
-                                                        with app.app_context():
-                                                            current_app.logger.info(f"Vonage closed or send error: {e}")
-                                                        stop_event.set()
-                                                        return
-                                        
-                                        # Handle function calls
-                                        if response.tool_call:
-                                            for fc in response.tool_call.function_calls:
-                                                if fc.name == "create_order":
-                                                    with app.app_context():
-                                                        args = dict(fc.args)
-                                                        current_app.logger.info(f"📦 Creating order: {args}")
-                                                        
-                                                        try:
-                                                            new_order = Order(
-                                                                status='recu',
-                                                                order_detail=args.get('order_details'),
-                                                                customer_name=args.get('customer_name', 'Unknown'),
-                                                                customer_phone=normalize_phone(caller_number) or 'Unknown',
-                                                                company_id=company.id if company else None,
-                                                                company_phone=normalize_phone(to_number),  # Keep for backward compatibility
-                                                                address=args.get('address', 'Non defini')
-                                                            )
-                                                            db.session.add(new_order)
-                                                            db.session.commit()
-                                                            order_id = new_order.id
-                                                            
-                                                            add_event('new_order', {'message': 'Ordre reçu'})
-                                                            
-                                                            try:
-                                                                from routes.notifications import send_web_push
-                                                                send_web_push({
-                                                                    "title": "Ordre reçus",
-                                                                    "message": f"{args.get('customer_name', 'Client')}: {args.get('order_details', '')}"
-                                                                })
-                                                            except:
-                                                                pass
-                                                            
-                                                            current_app.logger.info(f"✅ Order {order_id} created successfully")
-                                                            
-                                                            await session.send(
-                                                                input=types.LiveClientToolResponse(
-                                                                    function_responses=[types.FunctionResponse(
-                                                                        name="create_order",
-                                                                        id=fc.id,
-                                                                        response={"status": "success", "order_id": order_id}
-                                                                    )]
-                                                                )
-                                                            )
-                                                        except Exception as db_e:
-                                                            current_app.logger.error(f"❌ DB Error creating order: {db_e}")
-                                                
-                                                elif fc.name == "submit_demand":
-                                                    with app.app_context():
-                                                        args = dict(fc.args)
-                                                        current_app.logger.info(f"💡 Submitting demand: {args}")
-                                                        
-                                                        try:
-                                                            # Try to link to a recent order from this caller to this restaurant
-                                                            # (only 'recu' or 'en_cours' as per requirement)
-                                                            # Find recent order by company_id or company_phone (for backward compatibility)
-                                                            if company:
-                                                                recent_order = Order.query.filter(
-                                                                    Order.company_id == company.id,
-                                                                    Order.customer_phone == (caller_number or 'Unknown'),
-                                                                    Order.status.in_(['recu', 'en_cours'])
-                                                                ).order_by(Order.created_at.desc()).first()
-                                                            else:
-                                                                recent_order = Order.query.filter(
-                                                                    Order.company_phone == to_number,
-                                                                    Order.customer_phone == (caller_number or 'Unknown'),
-                                                                    Order.status.in_(['recu', 'en_cours'])
-                                                                ).order_by(Order.created_at.desc()).first()
-                                                            
-                                                            new_demand = Demand(
-                                                                company_id=company.id if company else None,
-                                                                order_id=recent_order.id if recent_order else None,
-                                                                customer_name=args.get('customer_name') or (recent_order.customer_name if recent_order else 'Unknown'),
-                                                                customer_phone=normalize_phone(caller_number) or 'Unknown',
-                                                                content=args.get('content'),
-                                                                status='new'
-                                                            )
-                                                            db.session.add(new_demand)
-                                                            db.session.commit()
-                                                            
-                                                            add_event('new_demand', {'message': 'Nouvelle demande reçue'})
-                                                            
-                                                            try:
-                                                                from routes.notifications import send_web_push
-                                                                send_web_push({
-                                                                    "title": "Nouvelle Demande",
-                                                                    "message": f"{args.get('content', '')[:50]}..."
-                                                                })
-                                                            except:
-                                                                pass
+                                                    )
+                                                except Exception as db_e:
+                                                    metrics.errors += 1
+                                                    logger.error(f"❌ DB Error creating order: {db_e}")
+                                            
+                                            elif fc.name == "submit_demand":
+                                                logger.info(f"💡 Submitting demand: {args}")
+                                                try:
+                                                    await loop.run_in_executor(
+                                                        None, _submit_demand, app, company_id, caller_number, to_number, args
+                                                    )
+                                                    await session.send(
+                                                        input=types.LiveClientToolResponse(
+                                                            function_responses=[types.FunctionResponse(
+                                                                name="submit_demand",
+                                                                id=fc.id,
+                                                                response={"status": "success", "message": "Demand received and restaurant notified."}
+                                                            )]
+                                                        )
+                                                    )
+                                                except Exception as db_e:
+                                                    metrics.errors += 1
+                                                    logger.error(f"DB Demand Error: {db_e}")
+                                            
+                                            elif fc.name == "lookup_menu_item":
+                                                # In-memory index: answered on the loop, no DB
+                                                result = lookup_menu_item(menu_index, args.get('query'))
+                                                logger.info(f"🔎 Menu lookup {args.get('query')!r}: {result['status']}")
+                                                await session.send(
+                                                    input=types.LiveClientToolResponse(
+                                                        function_responses=[types.FunctionResponse(
+                                                            name="lookup_menu_item",
+                                                            id=fc.id,
+                                                            response=result
+                                                        )]
+                                                    )
+                                                )
+                                    
+                                    if response.server_content and response.server_content.turn_complete:
+                                        pacer.end_turn()
                                                             
-                                                            await session.send(
-                                                                input=types.LiveClientToolResponse(
-                                                                    function_responses=[types.FunctionResponse(
-                                                                        name="submit_demand",
-                                                                        id=fc.id,
-                                                                        response={"status": "success", "message": "Demand received and restaurant notified."}
-                                                                    )]
-                                                                )
-                                                            )
-                                                        except Exception as db_e:
-                                                            current_app.logger.error(f"DB Demand Error: {db_e}")
-                                        
-                                        # Handle interruption
-                                        if response.server_content and response.server_content.interrupted:
-                                            with app.app_context():
-                                                current_app.logger.info("🛑 User interrupted")
-                                                                
-                                except Exception as e:
-                                    with app.app_context():
-                                        current_app.logger.error(f"Receive loop error: {e}")
-                                    # If critical error (not just empty turn), allow break?
-                                    # But usually we want to keep trying for next turn unless connection died
-                                    if "1000" in str(e) or "1001" in str(e): # WebSocket closed
-                                         break
-                                    # Slight delay before retry to prevent spin loop on error
-                                    await asyncio.sleep(0.1)
-                                        
-                        except Exception as e:
-                            with app.app_context():
-                                current_app.logger.error(f"Receive wrapper error: {e}")
-                        finally:
-                            stop_event.set()
-                    
-                    # Run audio tasks concurrently (greeting already sent above)
-                    await asyncio.gather(
-                        send_audio(),
-                        receive_audio(),
-                        return_exceptions=True
-                    )
-                    
-            except Exception as e:
-                with app.app_context():
-                    current_app.logger.error(f"Gemini session error: {e}")
-            finally:
-                stop_event.set()
-                with app.app_context():
-                    current_app.logger.info("Gemini session ended")
-        
-        
-        # Create a fresh event loop for this thread (avoids conflict with gevent's loop)
-        # This fixes: "asyncio.run() cannot be called from a running event loop"
-        loop = None
-        try:
-            # Import nest_asyncio dynamically (it will be installed in the container)
-            import nest_asyncio
-            
-            # Try to get existing loop or create new one
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            # Patch the loop to allow re-entrant execution
-            nest_asyncio.apply(loop)
-            
-            # Run the task
-            loop.run_until_complete(run_gemini())
-            
-        except KeyboardInterrupt:
-            pass
-        except Exception as e:
-            with app.app_context():
-                current_app.logger.error(f"Gemini thread fatal error: {e}")
-                # Log traceback for loop errors
-                import traceback
-                current_app.logger.error(traceback.format_exc())
-        finally:
-            # Properly cleanup pending tasks before closing the loop
-            if loop is not None and not loop.is_closed():
+                            except asyncio.CancelledError:
+                                raise
+                            except Exception as e:
+                                metrics.errors += 1
+                                logger.error(f"Receive loop error: {e}")
+                                # If critical error (not just empty turn), allow break?
+                                # But usually we want to keep trying for next turn unless connection died
+                                if "1000" in str(e) or "1001" in str(e): # WebSocket closed
+                                     break
+                                # Slight delay before retry to prevent spin loop on error
+                                await asyncio.sleep(0.1)
+                                    
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Receive wrapper error: {e}")
+                    finally:
+                        stop_event.set()
+                
+                # Run audio tasks concurrently (greeting already sent above).
+                # Whichever side finishes first ends the call.
+                tasks = [asyncio.ensure_future(send_audio()), asyncio.ensure_future(receive_audio()),
+                         asyncio.ensure_future(play_audio())]
                 try:
-                    # Cancel all pending tasks
-                    pending = asyncio.all_tasks(loop)
-                    for task in pending:
-                        task.cancel()
-                    # Allow cancelled tasks to complete
-                    if pending:
-                        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                except Exception:
-                    pass
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
                 finally:
-                    # Only close if we created it (not checks here, but safe to leave open in gevent usually 
-                    # OR strict close if we want. With nest_asyncio, closing shared loop is bad.
-                    # Safest: Don't close loop if it was 'get_running_loop', but we don't know easily.
-                    # Actually, if we are in a thread, we should own the loop.
-                    try:
-                        loop.close()
-                    except: 
-                        pass
-                    # CRITICAL: Detach loop from thread to prevent reuse issues
-                    asyncio.set_event_loop(None)
+                    pacer.close()
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.errors += 1
+            logger.error(f"Gemini session error: {e}")
+        finally:
+            stop_event.set()
+            logger.info(f"Gemini session ended (call {handle.call_id})")
     
-    # Start Gemini thread
-    gemini_t = threading.Thread(target=gemini_thread, daemon=True)
-    gemini_t.start()
+    # Hand the session to the shared call engine (one asyncio loop per worker)
+    try:
+        handle = call_engine.start_call(
+            run_gemini,
+            call_id=call_id,
+            caller_number=caller_number,
+            to_number=to_number
+        )
+    except CallRejected as e:
+        current_app.logger.warning(f"🚫 Call from {caller_number} rejected: {e}")
+        ws.close()
+        return
     
+    # Paced audio back to Vonage, sent off the engine loop
+    writer = threading.Thread(target=handle.drain_outbound, args=(ws.send,), name='vonage-writer', daemon=True)
+    writer.start()
+
     # Main thread: Read from Vonage WebSocket
     try:
-        while not stop_event.is_set():
+        while not handle.stop_event.is_set():
             try:
                 data = ws.receive(timeout=1.0)
                 if not data:
                     current_app.logger.info("Vonage WebSocket closed: received empty data")
                     break
                 if isinstance(data, bytes):
-                    with audio_lock:
-                        audio_queue.append(data)
+                    handle.push_audio(data)
             except Exception as e:
                 if "timed out" in str(e).lower():
                     continue
@@ -506,5 +570,6 @@ def voice_stream(ws):
                     current_app.logger.error(f"Vonage receive error: {e}")
                 break
     finally:
-        stop_event.set()
-        current_app.logger.info("Voice stream ended")
+        handle.hangup()
+        writer.join(timeout=1.0)
+        current_app.logger.info(f"Voice stream ended: {handle.metrics.to_dict()}")
@@ -1,9 +1,10 @@
 import asyncio
 import base64
+import functools
 import json
 import os
-import audioop
 import time
+import uuid
 from typing import Optional
 from collections import deque
 
@@ -19,9 +20,22 @@ except ImportError:
     pass
 
 from config.config import Config
-from database import get_db
+from database import get_db, async_session
 from models_new import Company, Order, Demand
+try:
+    from models_new import MenuItem
+except ImportError:  # models_new without the menu_items model: no structured catalog, prompts use company.menu
+    MenuItem = None
+from services.audio_channel import AudioChannel
+from services.gemini_pool import gemini_pool, session_key
+from services.call_setup import PreparedCall, call_setups, is_vonage_uuid
+from services.call_profile import CallProfile, CallProfileCache
+from services.company_cache import company_cache
+from services.menu_catalog import menu_catalogs, menu_items_statement, serialize_menu, lookup_menu_item
+from services.outbound_pacer import OutboundPacer
+from services.event_broker import event_broker
 from utils.phone import normalize_phone
+from utils.audio import DCBlocker, FrameAssembler, PolyphaseResampler, SilenceGate, byteswap16_inplace
 
 # Router
 router = APIRouter(tags=["Voice"])
@@ -29,6 +43,118 @@ router = APIRouter(tags=["Voice"])
 # Constants
 GEMINI_MODEL = "gemini-live-2.5-flash-native-audio"
 
+def _build_system_instruction(company, menu_index=None):
+    """Voice name and system instruction for a company"""
+    # Build System Instruction (RELAXED)
+    system_instruction = "You are a friendly AI restaurant assistant. Speak in Moroccan Darija (Arabic dialect). You can also understand French and English. (تكلم بالدارجة المغربية). Be polite and helpful."
+    voice_name = "Puck"
+    
+    if company:
+        if company.voice: voice_name = company.voice
+        if company.system_prompt: system_instruction = company.system_prompt
+        system_instruction += "\n\nIMPORTANT: Speak in Moroccan Darija (Arabic dialect) at all times."
+        if menu_index: system_instruction += f"\n\nMenu:\n{serialize_menu(menu_index)}"
+        elif company.menu: system_instruction += f"\n\nMenu:\n{company.menu}"
+            
+    system_instruction += "\n\nWhen the order is confirmed, use 'create_order'. If it's a special request, use 'submit_demand'. Always ask for the customer's name."
+    if menu_index: system_instruction += " Use 'lookup_menu_item' to check an item or its price when unsure."
+    return voice_name, system_instruction
+
+@functools.lru_cache(maxsize=1)
+def _tool_declarations():
+    """Function declarations shared by every call (built once per process)"""
+    # Define Tools
+    create_order_tool = types.FunctionDeclaration(
+        name="create_order",
+        description="Submit a completed restaurant order.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "order_details": types.Schema(type=types.Type.STRING),
+                "customer_name": types.Schema(type=types.Type.STRING),
+                "address": types.Schema(type=types.Type.STRING),
+            },
+            required=["order_details", "customer_name"]
+        )
+    )
+    submit_demand_tool = types.FunctionDeclaration(
+        name="submit_demand",
+        description="Submit a special request.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "content": types.Schema(type=types.Type.STRING),
+                "customer_name": types.Schema(type=types.Type.STRING),
+            },
+            required=["content"]
+        )
+    )
+    lookup_menu_item_tool = types.FunctionDeclaration(
+        name="lookup_menu_item",
+        description="Look up menu dishes by name (any spelling) or category, with prices.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(type=types.Type.STRING),
+            },
+            required=["query"]
+        )
+    )
+    return [create_order_tool, submit_demand_tool, lookup_menu_item_tool]
+
+def _build_live_config(voice_name, system_instruction):
+    """Gemini LiveConnectConfig with the order/demand tools"""
+    config = types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
+            )
+        ),
+        system_instruction=types.Content(parts=[types.Part(text=system_instruction)]),
+        tools=[types.Tool(function_declarations=_tool_declarations())]
+    )
+    return config
+
+def _build_call_profile(company, menu_index=None):
+    """Compile voice, system instruction and live config for a company (cached)"""
+    voice_name, system_instruction = _build_system_instruction(company, menu_index)
+    return CallProfile(
+        voice_name,
+        system_instruction,
+        _build_live_config(voice_name, system_instruction),
+        session_key(GEMINI_MODEL, voice_name, system_instruction)
+    )
+
+_call_profiles = CallProfileCache(_build_call_profile)
+
+async def prepare_call(call_id, to_number):
+    """Company lookup, prompt build and Gemini connect for one call"""
+    norm_to = normalize_phone(to_number)
+    
+    # Company snapshot from the shared cache; on a miss use our own DB session
+    # (speculative setups run outside any request)
+    found, company = company_cache.lookup(norm_to)
+    if not found:
+        async with async_session() as db:
+            result = await db.execute(select(Company).where(Company.phone_number == norm_to))
+            company = company_cache.put(norm_to, result.scalars().first())
+    
+    prepared = PreparedCall(call_id, company)
+    if prepared.agent_off:
+        return prepared
+    
+    if company and MenuItem is not None:
+        prepared.menu_index = menu_catalogs.get(company.id)
+        if prepared.menu_index is None:
+            async with async_session() as db:
+                result = await db.execute(menu_items_statement(MenuItem, company.id))
+                prepared.menu_index = menu_catalogs.put(company.id, result.all())
+    
+    profile = _call_profiles.get(company, prepared.menu_index)
+    await prepared.open_session(gemini_pool.session(GEMINI_MODEL, profile.config, profile.pool_key))
+    return prepared
+
 @router.post("/webhooks/event")
 async def event_webhook(request: Request):
     try:
@@ -54,6 +180,14 @@ async def answer_call(request: Request):
     to_number = data.get('to') or query_params.get('to')
     from_number = data.get('from') or query_params.get('from')
     
+    # Reserve the call ID (Vonage call leg uuid) and start setup speculatively
+    # (only for real call legs; anything else is set up inline)
+    call_id = data.get('uuid') or query_params.get('uuid')
+    if is_vonage_uuid(call_id):
+        call_setups.reserve(call_id, functools.partial(prepare_call, call_id, to_number))
+    else:
+        call_id = uuid.uuid4().hex
+    
     host = request.headers.get("host")
     # Use PUBLIC_URL if set, otherwise fallback to request host
     # In Fly.io, we might want to ensure https/wss
@@ -65,7 +199,7 @@ async def answer_call(request: Request):
     if proto == "http" and "localhost" in host:
         scheme = "ws"
         
-    ws_uri = f"{scheme}://{host}/voice/stream?to_number={to_number}&caller_number={from_number}"
+    ws_uri = f"{scheme}://{host}/voice/stream?to_number={to_number}&caller_number={from_number}&call_id={call_id}"
     
     print(f"📞 NCCO WebSocket URI: {ws_uri}")
     
@@ -79,7 +213,8 @@ async def answer_call(request: Request):
                 "content-type": "audio/l16;rate=16000",
                 "headers": {
                     "to-number": to_number,
-                    "caller-number": from_number
+                    "caller-number": from_number,
+                    "call-id": call_id
                 }
             }]
         }
@@ -95,79 +230,26 @@ async def voice_stream(websocket: WebSocket, db: AsyncSession = Depends(get_db))
     
     print(f"📞 Incoming call to: {to_number} from: {caller_number}")
     
-    # 1. Fetch Company
-    norm_to = normalize_phone(to_number)
-    
-    # Async DB query
-    result = await db.execute(select(Company).where(Company.phone_number == norm_to))
-    company = result.scalars().first()
+    # 1. Attach to the setup started by /webhooks/answer, or set up inline
+    call_id = websocket.headers.get("call-id") or websocket.query_params.get("call_id")
+    setup = call_setups.claim(call_id)
+    try:
+        prepared = await (setup or prepare_call(call_id, to_number))
+    except Exception as e:
+        print(f"Call setup error: {e}")
+        await websocket.close()
+        return
+    company = prepared.company
     
-    if company and not company.agent_on:
+    if prepared.agent_off:
         print(f"Agent OFF for {to_number}")
         await websocket.close()
         return
 
-    # 2. Build System Instruction (RELAXED)
-    system_instruction = "You are a friendly AI restaurant assistant. Speak in Moroccan Darija (Arabic dialect). You can also understand French and English. (تكلم بالدارجة المغربية). Be polite and helpful."
-    voice_name = "Puck"
-    
-    if company:
-        if company.voice: voice_name = company.voice
-        if company.system_prompt: system_instruction = company.system_prompt
-        system_instruction += "\n\nIMPORTANT: Speak in Moroccan Darija (Arabic dialect) at all times."
-        if company.menu: system_instruction += f"\n\nMenu:\n{company.menu}"
-            
-    system_instruction += "\n\nWhen the order is confirmed, use 'create_order'. If it's a special request, use 'submit_demand'. Always ask for the customer's name."
-
-    # 3. Setup Gemini Client
-    creds_path = os.path.abspath("vertex-json.json")
-    if os.path.exists(creds_path):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = creds_path
-        
-    client = genai.Client(vertexai=True, project="polar-equinox-472800-j2", location="us-central1")
-    
-    # Define Tools
-    create_order_tool = types.FunctionDeclaration(
-        name="create_order",
-        description="Submit a completed restaurant order.",
-        parameters=types.Schema(
-            type=types.Type.OBJECT,
-            properties={
-                "order_details": types.Schema(type=types.Type.STRING),
-                "customer_name": types.Schema(type=types.Type.STRING),
-                "address": types.Schema(type=types.Type.STRING),
-            },
-            required=["order_details", "customer_name"]
-        )
-    )
-    submit_demand_tool = types.FunctionDeclaration(
-        name="submit_demand",
-        description="Submit a special request.",
-        parameters=types.Schema(
-            type=types.Type.OBJECT,
-            properties={
-                "content": types.Schema(type=types.Type.STRING),
-                "customer_name": types.Schema(type=types.Type.STRING),
-            },
-            required=["content"]
-        )
-    )
-    
-    config = types.LiveConnectConfig(
-        response_modalities=["AUDIO"],
-        speech_config=types.SpeechConfig(
-            voice_config=types.VoiceConfig(
-                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
-            )
-        ),
-        system_instruction=types.Content(parts=[types.Part(text=system_instruction)]),
-        tools=[types.Tool(function_declarations=[create_order_tool, submit_demand_tool])]
-    )
-
-    # 4. Connect to Gemini Live
+    # 2. Gemini Live session (already connected by the setup)
     try:
-        async with client.aio.live.connect(model=GEMINI_MODEL, config=config) as session:
-            print(f"✅ Connected to Gemini Live ({GEMINI_MODEL})!")
+        async with prepared as session:
+            print(f"✅ Connected to Gemini Live ({GEMINI_MODEL}, {'speculative' if setup else 'inline'} setup)!")
             
             # Initial greeting
             await session.send(
@@ -176,15 +258,29 @@ async def voice_stream(websocket: WebSocket, db: AsyncSession = Depends(get_db))
             )
             
             # 5. Pipeline Logic
-            resample_state_out = None
-            chunk_count = 0
-            buffer_in = bytearray()
-            # 2 chunks of 20ms = 40ms (1280 bytes)
-            BUFFER_THRESHOLD = 1280
+            resampler = PolyphaseResampler(24000, 16000)
+            dc_blocker = DCBlocker(rate=16000)
+            # 2 chunks of 20ms = 40ms (1280 bytes), cut and transformed in place
+            assembler = FrameAssembler(frame_bytes=1280)
 
-            async def send_to_gemini():
-                """Read from Vonage -> Process -> Send to Gemini"""
-                nonlocal chunk_count, buffer_in
+            # Vonage reader -> channel -> Gemini sender, so a slow session.send
+            # never stalls the WebSocket reads (stale audio is dropped instead)
+            inbound = AudioChannel(maxsize=Config.VOICE_INBOUND_MAX_FRAMES)
+            # Gemini's bursts -> 20ms frames paced out to Vonage
+            pacer = OutboundPacer(websocket.send_bytes)
+            barge_ins = []  # (latency_ms, dropped_ms) per interruption
+            # Local VAD: silence past the hangover is dropped or thinned before Gemini
+            vad_mode = getattr(company, 'vad_mode', None)
+            vad_threshold = getattr(company, 'vad_threshold', None)
+            gate = SilenceGate(
+                mode=vad_mode if vad_mode is not None else Config.VOICE_VAD_MODE,
+                threshold=vad_threshold if vad_threshold is not None else Config.VOICE_VAD_THRESHOLD,
+                hangover_ms=Config.VOICE_VAD_HANGOVER_MS,
+                keep_every=Config.VOICE_VAD_KEEP_EVERY,
+            )
+
+            async def read_from_vonage():
+                """Read from Vonage -> Process -> Queue for Gemini"""
                 try:
                     while True:
                         message = await websocket.receive()
@@ -192,42 +288,59 @@ async def voice_stream(websocket: WebSocket, db: AsyncSession = Depends(get_db))
                         if "bytes" in message:
                             raw = message["bytes"]
                             if raw:
-                                buffer_in.extend(raw)
-                                if len(buffer_in) >= BUFFER_THRESHOLD:
-                                    chunk_count += 1
-                                    data_raw = bytes(buffer_in)
-                                    buffer_in.clear()
-
+                                for frame in assembler.write(raw):
                                     # 1. Byteswap (Big -> Little) - MANDATORY
-                                    data = audioop.byteswap(data_raw, 2)
+                                    byteswap16_inplace(frame)
                                     
-                                    # 2. DC Offset Removal (Subtract Mean)
+                                    # 2. DC Offset Removal (streaming, no steps between blocks)
                                     # This centers your voice at 0.
-                                    avg = audioop.avg(data, 2)
-                                    data = audioop.bias(data, 2, -avg)
+                                    dc_blocker.process_inplace(frame)
 
                                     # 3. No Boost (Clean Signal)
                                     # Previous RMS 21k was loud, let's try raw.
                                     
                                     # 4. No Resampling (Send 16k Raw)
 
+                                    # 5. VAD: forwarded frames are copied out of the ring
+                                    # (types.Blob only accepts bytes), suppressed ones never are
+                                    forward = gate.process(frame)
+
                                     # Monitoring
-                                    if chunk_count % 50 == 0:
-                                        rms = audioop.rms(data, 2)
-                                        print(f"🎤 [Stream] 40ms Block {chunk_count} | RMS: {rms} | DC Avg: {avg}")
+                                    if assembler.frames % 50 == 0:
+                                        print(f"🎤 [Stream] 40ms Block {assembler.frames} | RMS: {gate.level} | Speech: {gate.speaking} | DC Avg: {dc_blocker.offset:.0f} | Suppressed: {gate.suppressed_ms / 1000:.1f}s | Queue: {inbound.stats()}")
 
-                                    # Send Direct (Explicitly declare 16k)
-                                    await session.send(input=types.LiveClientRealtimeInput(
-                                        media_chunks=[types.Blob(mime_type="audio/l16;rate=16000", data=data)]
-                                    ))
+                                    for data in forward:
+                                        await inbound.put(data)
+                except Exception as e:
+                    print(f"Stream Read Error: {e}")
+                finally:
+                    inbound.close()
+                    pacer.close()
+
+            async def send_to_gemini():
+                """Drain the channel -> Send to Gemini (woken on every write)"""
+                try:
+                    while True:
+                        data = await inbound.get()
+                        if data is None: break
+                        # Send Direct (Explicitly declare 16k)
+                        await session.send(input=types.LiveClientRealtimeInput(
+                            media_chunks=[types.Blob(mime_type="audio/l16;rate=16000", data=data)]
+                        ))
                 except Exception as e:
                     print(f"Stream Send Error: {e}")
 
             async def receive_from_gemini():
                 """Read from Gemini -> Process -> Send to Vonage"""
-                nonlocal resample_state_out
                 try:
                     async for response in session.receive():
+                        # 0. Barge-in: cut the agent off before anything else
+                        if response.server_content and response.server_content.interrupted:
+                            dropped_ms = pacer.flush()
+                            resampler.reset()
+                            barge_ins.append((pacer.tail_ms, dropped_ms))
+                            print(f"🛑 Barge-in: dropped {dropped_ms}ms of queued audio, {pacer.tail_ms}ms still playing")
+
                         # LOG EVERYTHING for diagnostics
                         if not (response.server_content and response.server_content.model_turn):
                              msg = []
@@ -251,10 +364,9 @@ async def voice_stream(websocket: WebSocket, db: AsyncSession = Depends(get_db))
                             for part in response.server_content.model_turn.parts:
                                 if part.inline_data and part.inline_data.data:
                                     # Resample 24k -> 16k (Output is always 24k)
-                                    new_fragment, resample_state_out = audioop.ratecv(
-                                        part.inline_data.data, 2, 1, 24000, 16000, resample_state_out
-                                    )
-                                    await websocket.send_bytes(new_fragment)
+                                    pacer.write(resampler.process(part.inline_data.data))
+                        if response.server_content and response.server_content.turn_complete:
+                            pacer.end_turn()
                         
                         # 2. Handle Tools
                         if response.tool_call:
@@ -273,6 +385,7 @@ async def voice_stream(websocket: WebSocket, db: AsyncSession = Depends(get_db))
                                     )
                                     db.add(new_order)
                                     await db.commit()
+                                    event_broker.publish('new_order', {'message': 'Ordre reçu'}, company_id=new_order.company_id)
                                     await session.send(input=types.LiveClientToolResponse(
                                         function_responses=[types.FunctionResponse(
                                             name="create_order", id=fc.id, response={"status": "success"}
@@ -290,16 +403,35 @@ async def voice_stream(websocket: WebSocket, db: AsyncSession = Depends(get_db))
                                     )
                                     db.add(new_demand)
                                     await db.commit()
+                                    event_broker.publish('new_demand', {'message': 'Nouvelle demande reçue'}, company_id=new_demand.company_id)
                                     await session.send(input=types.LiveClientToolResponse(
                                         function_responses=[types.FunctionResponse(
                                             name="submit_demand", id=fc.id, response={"status": "success"}
                                         )]
                                     ))
+                                elif fc.name == "lookup_menu_item":
+                                    args = dict(fc.args)
+                                    result = lookup_menu_item(prepared.menu_index, args.get('query'))
+                                    print(f"🔎 Menu lookup {args.get('query')!r}: {result['status']}")
+                                    await session.send(input=types.LiveClientToolResponse(
+                                        function_responses=[types.FunctionResponse(
+                                            name="lookup_menu_item", id=fc.id, response=result
+                                        )]
+                                    ))
                 except Exception as e:
                     print(f"Stream Receive Error: {e}")
 
             # Execute
-            await asyncio.gather(send_to_gemini(), receive_from_gemini())
+            async def play_to_vonage():
+                """Paced playout of Gemini audio (ends when the caller hangs up)"""
+                try:
+                    await pacer.run()
+                except Exception as e:
+                    print(f"Stream Send Error: {e}")
+
+            await asyncio.gather(read_from_vonage(), send_to_gemini(), receive_from_gemini(), play_to_vonage())
+            print(f"📊 Inbound audio stats: {inbound.stats()} | VAD: {gate.stats()}")
+            print(f"📊 Outbound audio stats: {pacer.stats()} | Barge-ins (latency_ms, dropped_ms): {barge_ins}")
 
     except Exception as e:
         print(f"Final Error: {e}")
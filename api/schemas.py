@@ -19,6 +19,8 @@ class CompanyOut(BaseModel):
     phone_number: Optional[str] = None
     voice: Optional[str] = None
     agent_on: bool = True
+    vad_mode: Optional[str] = None
+    vad_threshold: Optional[int] = None
     system_prompt: Optional[str] = None
     menu: Optional[str] = None
     
@@ -0,0 +1,63 @@
+"""
+Move completed orders older than ORDER_ARCHIVE_HORIZON_DAYS into the
+monthly-partitioned orders_archive table. Creates the table on first run;
+safe to run from cron (e.g. nightly).
+
+    python scripts/archive_orders.py [--dry-run] [--horizon-days 90] [--max-batches N]
+"""
+import argparse
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from config.config import Config
+from scripts.schema_migrations import run_migrations
+from services.order_archive import orders_archive, archive_orders, eligible_count
+
+
+def create_archive_table(conn):
+    """Create orders_archive (partitioned by RANGE (created_at) on Postgres)"""
+    orders_archive.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    ('2026_10_orders_archive', 'Partitioned orders_archive table', [
+        create_archive_table,
+        """CREATE INDEX IF NOT EXISTS ix_orders_archive_phone_created
+           ON orders_archive (customer_phone, created_at DESC)""",
+        """CREATE INDEX IF NOT EXISTS ix_orders_archive_company_created
+           ON orders_archive (company_id, created_at DESC)""",
+    ]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--horizon-days', type=int, default=Config.ORDER_ARCHIVE_HORIZON_DAYS)
+    parser.add_argument('--batch-size', type=int, default=Config.ORDER_ARCHIVE_BATCH_SIZE)
+    parser.add_argument('--max-batches', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help="only count the orders that would move")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        run_migrations(db.engine, MIGRATIONS)
+        with db.engine.connect() as conn:
+            pending = eligible_count(conn, args.horizon_days)
+        print(f"📦 {pending} completed orders older than {args.horizon_days} days")
+        if args.dry_run or not pending:
+            return
+        try:
+            moved = archive_orders(db.engine, args.horizon_days, args.batch_size, args.max_batches)
+            print(f"🎉 Archived {moved} orders")
+        except Exception as e:
+            print(f"❌ Archival failed: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
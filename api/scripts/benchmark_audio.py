@@ -0,0 +1,109 @@
+"""
+Per-frame cost of the voice DSP: utils.audio (NumPy) against the audioop
+path it replaces. Runs on synthetic speech-like audio, no network or DB.
+
+    python scripts/benchmark_audio.py [--frames 5000] [--chunk-ms 40]
+
+audioop rows are skipped on Python 3.13+, where the module no longer exists.
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.audio import DCBlocker, FrameAssembler, PolyphaseResampler, byteswap16_inplace, rms
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop
+except ImportError:
+    audioop = None
+
+
+def speech_like(rate, seconds, seed=0):
+    """Noise shaped by a few formant-ish tones plus a DC offset, as int16 bytes."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    signal = sum(a * np.sin(2 * np.pi * f * t) for f, a in ((220, 3000), (700, 2000), (2400, 800)))
+    signal += rng.normal(0, 600, len(t)) + 400
+    return np.clip(signal, -32768, 32767).astype('<i2').tobytes()
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data) - size + 1, size)]
+
+
+def bench(name, frames, fn):
+    started = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    per_frame = (time.perf_counter() - started) / len(frames) * 1e6
+    print(f"⏱️  {name:<48} {per_frame:8.1f} µs/frame")
+    return per_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--chunk-ms', type=int, default=40, help="frame length for both directions")
+    args = parser.parse_args()
+    seconds = args.frames * args.chunk_ms / 1000
+
+    # Outbound: Gemini's 24 kHz chunks resampled to 16 kHz
+    out_frames = chunks(speech_like(24000, seconds), 48 * args.chunk_ms)[:args.frames]
+    # Inbound: Vonage 16 kHz big-endian, assembled into blocks
+    in_frames = chunks(speech_like(16000, seconds, seed=1), 32 * args.chunk_ms)[:args.frames]
+
+    print(f"🎧 {len(out_frames)} outbound frames ({args.chunk_ms} ms @ 24 kHz), "
+          f"{len(in_frames)} inbound ({args.chunk_ms} ms @ 16 kHz)\n")
+
+    resampler = PolyphaseResampler(24000, 16000)
+    bench("resample 24k->16k      utils.audio (polyphase)", out_frames, resampler.process)
+    if audioop:
+        state = [None]
+
+        def ratecv(frame):
+            out, state[0] = audioop.ratecv(frame, 2, 1, 24000, 16000, state[0])
+            return out
+        bench("resample 24k->16k      audioop.ratecv (linear)", out_frames, ratecv)
+
+    blocker = DCBlocker(rate=16000)
+
+    def inbound_numpy(frame):
+        data = bytearray(frame)
+        blocker.process_inplace(byteswap16_inplace(data))
+        return rms(data)
+
+    bench("inbound swap+DC+rms    utils.audio", in_frames, inbound_numpy)
+
+    # Same work on 20 ms Vonage messages cut by the ring assembler (no per-frame buffers)
+    assembler = FrameAssembler(frame_bytes=32 * args.chunk_ms)
+    blocker = DCBlocker(rate=16000)
+    messages = [(frame[:len(frame) // 2], frame[len(frame) // 2:]) for frame in in_frames]
+
+    def inbound_ring(message):
+        for part in message:
+            for frame in assembler.write(part):
+                blocker.process_inplace(byteswap16_inplace(frame))
+                rms(frame)
+
+    bench("inbound swap+DC+rms    utils.audio (ring)", messages, inbound_ring)
+    if audioop:
+        def inbound_audioop(frame):
+            data = audioop.byteswap(frame, 2)
+            data = audioop.bias(data, 2, -audioop.avg(data, 2))
+            return audioop.rms(data, 2)
+        bench("inbound swap+DC+rms    audioop", in_frames, inbound_audioop)
+    else:
+        print("\n(audioop not available on this Python: NumPy rows only)")
+
+
+if __name__ == "__main__":
+    main()
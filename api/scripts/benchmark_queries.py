@@ -0,0 +1,196 @@
+"""
+Benchmark the hot order/demand queries against a synthetic dataset.
+
+Seeds a scratch Postgres database (default: 1,000,000 orders over 200
+restaurants with a skewed size distribution, ~95% completed), then prints
+EXPLAIN ANALYZE plans and median timings for the dashboard, demands,
+submit_demand lookup and customer history queries.
+
+Never point this at production: it only runs against BENCH_DATABASE_URL.
+
+    BENCH_DATABASE_URL=postgresql://localhost/kitchenline_bench \\
+        python scripts/benchmark_queries.py --seed 1000000 --plans
+    python scripts/benchmark_queries.py --without-indexes   # baseline
+    python scripts/benchmark_queries.py                      # re-creates them
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_URL = os.environ.get('BENCH_DATABASE_URL')
+if not BENCH_URL:
+    print("❌ Set BENCH_DATABASE_URL to a scratch Postgres database")
+    sys.exit(1)
+if BENCH_URL.startswith("postgres://"):
+    BENCH_URL = BENCH_URL.replace("postgres://", "postgresql://", 1)
+# Config reads DATABASE_URL at import time
+os.environ['DATABASE_URL'] = BENCH_URL
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app import create_app
+from extensions import db
+from models.models import Order, Company, Demand
+from services.dashboard import dashboard_statement, demands_statement, encode_cursor
+from scripts.migrate_indexes import MIGRATIONS
+from scripts.schema_migrations import run_migrations
+
+INDEX_NAMES = [
+    'ix_orders_company_status_created',
+    'ix_orders_active_company_phone',
+    'ix_orders_phone_created',
+    'ix_demands_company_created',
+    'ix_demands_company_phone',
+]
+
+
+def seed(conn, orders, companies, demands):
+    existing = conn.execute(text("SELECT count(*) FROM companies WHERE name LIKE 'Bench %'")).scalar()
+    if existing:
+        print(f"✓ Dataset already seeded ({existing} bench companies), use --reset to rebuild")
+        return
+    print(f"🌱 Seeding {companies} companies, {orders:,} orders, {demands:,} demands...")
+    started = time.monotonic()
+    conn.execute(text("""
+        INSERT INTO companies (name, phone_number, agent_on, voice, created_at)
+        SELECT 'Bench ' || g, '+2125' || lpad(g::text, 8, '0'), true, 'Charon', now()
+        FROM generate_series(1, :n) g
+    """), {'n': companies})
+    first_id, last_id = conn.execute(text(
+        "SELECT min(id), max(id) FROM companies WHERE name LIKE 'Bench %'"
+    )).one()
+
+    # power(random(), 3) skews volume towards a few large restaurants;
+    # ~2% recu, ~3% en_cours, the rest completed, spread over two years
+    conn.execute(text("""
+        INSERT INTO orders (status, order_detail, customer_name, customer_phone, company_phone,
+                            address, company_id, created_at)
+        SELECT CASE WHEN r < 0.02 THEN 'recu' WHEN r < 0.05 THEN 'en_cours' ELSE 'termine' END,
+               'Bench order ' || g, 'Client ' || (g % 5000),
+               '+2126' || lpad((floor(random() * 200000))::int::text, 8, '0'),
+               NULL, 'Non defini',
+               :first + floor(power(random(), 3) * (:last - :first + 1))::int,
+               now() - (random() * interval '730 days')
+        FROM (SELECT g, random() AS r FROM generate_series(1, :n) g) s
+    """), {'n': orders, 'first': first_id, 'last': last_id})
+
+    conn.execute(text("""
+        INSERT INTO demands (customer_name, customer_phone, content, status, company_id, created_at)
+        SELECT 'Client', '+2126' || lpad((floor(random() * 200000))::int::text, 8, '0'),
+               'Bench demand ' || g, CASE WHEN random() < 0.3 THEN 'new' ELSE 'processed' END,
+               :first + floor(power(random(), 3) * (:last - :first + 1))::int,
+               now() - (random() * interval '365 days')
+        FROM generate_series(1, :n) g
+    """), {'n': demands, 'first': first_id, 'last': last_id})
+    conn.execute(text("ANALYZE companies; ANALYZE orders; ANALYZE demands"))
+    print(f"✅ Seeded in {time.monotonic() - started:.1f}s")
+
+
+def reset(conn):
+    print("🧹 Removing bench data...")
+    conn.execute(text("""
+        DELETE FROM demands WHERE company_id IN (SELECT id FROM companies WHERE name LIKE 'Bench %')
+    """))
+    conn.execute(text("""
+        DELETE FROM orders WHERE company_id IN (SELECT id FROM companies WHERE name LIKE 'Bench %')
+    """))
+    conn.execute(text("DELETE FROM companies WHERE name LIKE 'Bench %'"))
+
+
+def drop_indexes(conn):
+    for name in INDEX_NAMES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    conn.execute(text("DELETE FROM schema_migrations WHERE version LIKE '2026_10_indexes_%'"))
+    conn.execute(text("ANALYZE orders; ANALYZE demands"))
+    print("⚠️ Composite indexes dropped (baseline run)")
+
+
+def sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def queries(conn, page_size):
+    company_id, volume = conn.execute(text("""
+        SELECT company_id, count(*) FROM orders GROUP BY company_id ORDER BY count(*) DESC LIMIT 1
+    """)).one()
+    phone = conn.execute(text("""
+        SELECT customer_phone FROM orders WHERE company_id = :c AND status IN ('recu', 'en_cours') LIMIT 1
+    """), {'c': company_id}).scalar()
+    middle = conn.execute(text("""
+        SELECT created_at, id FROM orders WHERE company_id = :c AND status = 'termine'
+        ORDER BY created_at DESC, id DESC OFFSET 5000 LIMIT 1
+    """), {'c': company_id}).one()
+    print(f"🏪 Largest restaurant: company {company_id} ({volume:,} orders)")
+
+    return [
+        ('dashboard (legacy: all termine rows)', f"""
+            SELECT * FROM orders WHERE company_id = {company_id} AND status = 'termine'
+            ORDER BY created_at DESC"""),
+        ('dashboard (single query, first page)',
+         sql(dashboard_statement(Order, Company, company_id=company_id, page_size=page_size))),
+        ('dashboard (keyset page 100)',
+         sql(dashboard_statement(Order, Company, company_id=company_id, page_size=page_size,
+                                 cursor=encode_cursor(middle.created_at, middle.id)))),
+        ('demands with active_orders_count', sql(demands_statement(Demand, Order, company_id=company_id))),
+        ('submit_demand recent active order', f"""
+            SELECT * FROM orders WHERE company_id = {company_id} AND customer_phone = '{phone}'
+            AND status IN ('recu', 'en_cours') ORDER BY created_at DESC LIMIT 1"""),
+        ('customer history', f"""
+            SELECT * FROM orders WHERE customer_phone = '{phone}' ORDER BY created_at DESC LIMIT 20"""),
+    ]
+
+
+def benchmark(conn, name, query, runs, show_plan):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        conn.execute(text(query)).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"⏱️  {name:<40} median {statistics.median(timings):8.2f} ms   (min {min(timings):.2f}, runs {runs})")
+    if show_plan:
+        plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}")).fetchall()
+        for row in plan:
+            print(f"      {row[0]}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=1_000_000, help="orders to generate")
+    parser.add_argument('--companies', type=int, default=200)
+    parser.add_argument('--demands', type=int, default=50_000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--plans', action='store_true', help="print EXPLAIN (ANALYZE, BUFFERS) for each query")
+    parser.add_argument('--reset', action='store_true', help="delete and re-seed the bench data")
+    parser.add_argument('--without-indexes', action='store_true', help="drop the composite indexes first")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("❌ The benchmark needs Postgres (generate_series, EXPLAIN ANALYZE)")
+            sys.exit(1)
+        with db.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if args.reset:
+                reset(conn)
+            seed(conn, args.seed, args.companies, args.demands)
+            if args.without_indexes:
+                drop_indexes(conn)
+        if not args.without_indexes:
+            run_migrations(db.engine, MIGRATIONS)
+
+        with db.engine.connect() as conn:
+            for name, query in queries(conn, args.page_size):
+                benchmark(conn, name, query, args.runs, args.plans)
+
+
+if __name__ == "__main__":
+    main()
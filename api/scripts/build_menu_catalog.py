@@ -0,0 +1,58 @@
+"""
+Parse every company's free-text menu into menu_items (the structured
+catalog used by the call prompt and the lookup_menu_item tool).
+
+The table itself is created by db.create_all(); menus saved or extracted
+afterwards are parsed on write, so this only backfills existing ones.
+
+    python scripts/build_menu_catalog.py [--company-id 12] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from models.models import Company, MenuItem
+from services.company_cache import company_changed
+from services.menu_catalog import parse_menu_text, sync_menu_items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--company-id', type=int, help="only this company")
+    parser.add_argument('--dry-run', action='store_true', help="print the parsed items without saving")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        query = Company.query.filter(Company.menu.isnot(None))
+        if args.company_id:
+            query = query.filter(Company.id == args.company_id)
+        total = 0
+        for company in query.all():
+            if args.dry_run:
+                items = parse_menu_text(company.menu)
+                print(f"🍽️ {company.name}: {len(items)} items")
+                for item in items:
+                    print(f"   [{item['category'] or '-'}] {item['name']} = {item['price_label']} {item['aliases'] or ''}")
+                continue
+            try:
+                count = sync_menu_items(db.session, MenuItem, company.id, company.menu)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ {company.name}: {e}")
+                continue
+            company_changed(company.id, kind='menu')
+            total += count
+            print(f"✅ {company.name}: {count} items")
+        if not args.dry_run:
+            print(f"🎉 Done ({total} items)")
+
+
+if __name__ == "__main__":
+    main()
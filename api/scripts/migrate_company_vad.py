@@ -0,0 +1,53 @@
+"""
+Add the per-company voice activity detection settings (vad_mode and
+vad_threshold) to companies. Both stay NULL, which means the platform
+defaults (VOICE_VAD_MODE / VOICE_VAD_THRESHOLD), until a company sets them.
+
+    python scripts/migrate_company_vad.py [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from extensions import db
+from scripts.schema_migrations import run_migrations
+
+
+def add_vad_columns(conn):
+    """Add vad_mode and vad_threshold to companies"""
+    existing = {col['name'] for col in inspect(conn).get_columns('companies')}
+    for name, ddl in (('vad_mode', 'VARCHAR(10)'), ('vad_threshold', 'INTEGER')):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE companies ADD COLUMN {name} {ddl}"))
+
+
+MIGRATIONS = [
+    ('2026_10_company_vad', 'Voice activity detection settings on companies', [
+        add_vad_columns,
+    ]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help="print the pending migrations without applying them")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            run_migrations(db.engine, MIGRATIONS, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            sys.exit(1)
+        print("🎉 Done")
+
+
+if __name__ == "__main__":
+    main()
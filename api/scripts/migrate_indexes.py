@@ -0,0 +1,56 @@
+"""
+Composite and partial indexes for the hot order/demand queries.
+Versioned and idempotent: safe to run on every deploy.
+
+    python scripts/migrate_indexes.py [--dry-run]
+"""
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from scripts.schema_migrations import run_migrations
+
+MIGRATIONS = [
+    ('2026_10_indexes_orders', 'Composite/partial indexes on orders', [
+        # Dashboard: WHERE company_id = ? AND status = ? ORDER BY created_at DESC, id DESC
+        # (row_number() per status and the keyset cursor both walk this index)
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_company_status_created
+           ON orders (company_id, status, created_at DESC, id DESC)""",
+        # submit_demand's recent active order lookup and the demands active_orders_count
+        # aggregate; partial, so it only holds the small set of live orders
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_active_company_phone
+           ON orders (company_id, customer_phone, created_at DESC)
+           WHERE status IN ('recu', 'en_cours')""",
+        # /api/customer/history/<phone>: newest 20 orders of a caller
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_phone_created
+           ON orders (customer_phone, created_at DESC)""",
+    ]),
+    ('2026_10_indexes_demands', 'Composite indexes on demands', [
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_demands_company_created
+           ON demands (company_id, created_at DESC)""",
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_demands_company_phone
+           ON demands (company_id, customer_phone)""",
+    ]),
+    ('2026_10_indexes_analyze', 'Refresh planner statistics', [
+        "ANALYZE orders",
+        "ANALYZE demands",
+    ]),
+]
+
+def migrate(dry_run=False):
+    app = create_app()
+    with app.app_context():
+        print("🚀 Migrating indexes...")
+        try:
+            applied = run_migrations(db.engine, MIGRATIONS, dry_run=dry_run)
+            print(f"🎉 Done ({len(applied)} migration(s) applied)")
+        except Exception as e:
+            print(f"❌ Index migration failed: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    migrate(dry_run='--dry-run' in sys.argv)
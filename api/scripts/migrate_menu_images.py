@@ -0,0 +1,143 @@
+"""
+Move menu image bytes from menu_images.image_data into the blob store.
+
+Adds content_hash / content_type / size (versioned, idempotent), then copies
+rows in small batches. image_data is kept unless --purge is given, so the
+switch can be verified (and rolled back) before the column is emptied.
+--variants then builds the thumbnail and model variants (needs Pillow) for
+images uploaded before the pipeline existed.
+
+    python scripts/migrate_menu_images.py [--batch-size 20] [--purge] [--variants]
+"""
+import argparse
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app import create_app
+from extensions import db
+from scripts.schema_migrations import run_migrations
+from services.blob_store import blob_store
+from services.image_pipeline import process_image, sniff_mime
+
+
+def add_blob_columns(conn):
+    """Add content_hash, content_type and size to menu_images"""
+    existing = {col['name'] for col in inspect(conn).get_columns('menu_images')}
+    for name, ddl in (('content_hash', 'VARCHAR(64)'), ('content_type', 'VARCHAR(50)'), ('size', 'INTEGER')):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE menu_images ADD COLUMN {name} {ddl}"))
+
+
+def relax_image_data(conn):
+    """Allow NULL image_data (Postgres; other databases keep the old constraint)"""
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("ALTER TABLE menu_images ALTER COLUMN image_data DROP NOT NULL"))
+
+
+def add_variant_columns(conn):
+    """Add width, height, thumb_hash and model_hash to menu_images"""
+    existing = {col['name'] for col in inspect(conn).get_columns('menu_images')}
+    for name, ddl in (('width', 'INTEGER'), ('height', 'INTEGER'),
+                      ('thumb_hash', 'VARCHAR(64)'), ('model_hash', 'VARCHAR(64)')):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE menu_images ADD COLUMN {name} {ddl}"))
+
+
+MIGRATIONS = [
+    ('2026_10_menu_image_blobs', 'Blob store columns on menu_images', [
+        add_blob_columns,
+        relax_image_data,
+        "CREATE INDEX IF NOT EXISTS ix_menu_images_content_hash ON menu_images (content_hash)",
+    ]),
+    ('2026_10_menu_image_variants', 'Thumbnail and model variant columns on menu_images', [
+        add_variant_columns,
+    ]),
+]
+
+
+def copy_images(batch_size, purge):
+    moved = 0
+    while True:
+        rows = db.session.execute(text(
+            "SELECT id, image_data FROM menu_images "
+            "WHERE content_hash IS NULL AND image_data IS NOT NULL ORDER BY id LIMIT :n"
+        ), {'n': batch_size}).all()
+        if not rows:
+            break
+        for image_id, data in rows:
+            data = bytes(data)
+            key = blob_store.put(data)
+            db.session.execute(text(
+                "UPDATE menu_images SET content_hash = :key, content_type = :type, size = :size "
+                + (", image_data = NULL " if purge else "")
+                + "WHERE id = :id"
+            ), {'key': key, 'type': sniff_mime(data, 'image/jpeg'), 'size': len(data), 'id': image_id})
+        db.session.commit()
+        moved += len(rows)
+        print(f"   {moved} images copied")
+
+    if purge:
+        # Rows copied by an earlier run without --purge
+        result = db.session.execute(text(
+            "UPDATE menu_images SET image_data = NULL WHERE content_hash IS NOT NULL AND image_data IS NOT NULL"
+        ))
+        db.session.commit()
+        print(f"   {result.rowcount} inline copies purged")
+    return moved
+
+
+def build_variants(batch_size):
+    done = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(text(
+            "SELECT id, content_hash FROM menu_images "
+            "WHERE content_hash IS NOT NULL AND thumb_hash IS NULL AND id > :last ORDER BY id LIMIT :n"
+        ), {'last': last_id, 'n': batch_size}).all()
+        if not rows:
+            break
+        for image_id, key in rows:
+            processed = process_image(blob_store.read(key))
+            db.session.execute(text(
+                "UPDATE menu_images SET content_type = :type, width = :width, height = :height, "
+                "thumb_hash = :thumb, model_hash = :model WHERE id = :id"
+            ), {'type': processed.content_type, 'width': processed.width, 'height': processed.height,
+                'thumb': processed.thumb_hash, 'model': processed.model_hash, 'id': image_id})
+            last_id = image_id
+        db.session.commit()
+        done += len(rows)
+        print(f"   {done} images processed")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--purge', action='store_true', help="clear image_data once the blob is stored")
+    parser.add_argument('--variants', action='store_true', help="build missing thumbnail/model variants")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        run_migrations(db.engine, MIGRATIONS)
+        print("🚀 Copying menu images to the blob store...")
+        try:
+            moved = copy_images(args.batch_size, args.purge)
+            print(f"🎉 Done ({moved} images)")
+            if args.variants:
+                print("🖼️ Building image variants...")
+                built = build_variants(args.batch_size)
+                print(f"🎉 Done ({built} images)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Migration failed: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
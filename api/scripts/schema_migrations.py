@@ -0,0 +1,80 @@
+"""
+Minimal versioned migration runner.
+
+Each migration is (version, description, [statements]); a statement is SQL
+text or a callable taking the connection. Applied versions
+are recorded in `schema_migrations`, so running a script twice is a no-op;
+statements should still be idempotent (IF NOT EXISTS) so a half-applied
+migration can simply be re-run. Statements run in autocommit mode, which
+Postgres requires for CREATE INDEX CONCURRENTLY; on other databases
+CONCURRENTLY is dropped.
+"""
+from sqlalchemy import text
+
+
+def _ensure_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(64) PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def applied_versions(conn):
+    _ensure_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _drop_invalid_index(conn, statement):
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index that IF NOT EXISTS would skip
+    words = statement.split()
+    upper = [w.upper() for w in words]
+    if 'INDEX' not in upper or 'EXISTS' not in upper:
+        return
+    name = words[upper.index('EXISTS') + 1]
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {'name': name}).first()
+    if invalid:
+        print(f"⚠️ Dropping invalid index {name} left by an interrupted build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def run_migrations(engine, migrations, dry_run=False):
+    """Apply pending `migrations` in order; returns the versions applied."""
+    applied = []
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        is_postgres = conn.dialect.name == 'postgresql'
+        done = applied_versions(conn)
+
+        for version, description, statements in migrations:
+            if version in done:
+                print(f"✓ {version} already applied ({description})")
+                continue
+            print(f"🚀 Applying {version}: {description}")
+            for statement in statements:
+                if callable(statement):
+                    print(f"   {statement.__doc__ or statement.__name__}")
+                    if not dry_run:
+                        statement(conn)
+                    continue
+                if not is_postgres:
+                    statement = statement.replace(' CONCURRENTLY', '')
+                if dry_run:
+                    print(f"   {' '.join(statement.split())}")
+                    continue
+                if is_postgres and 'CREATE' in statement.upper() and 'CONCURRENTLY' in statement.upper():
+                    _drop_invalid_index(conn, statement)
+                conn.execute(text(statement))
+            if not dry_run:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                    {'v': version, 'd': description},
+                )
+                applied.append(version)
+                print(f"✅ {version} applied")
+    return applied
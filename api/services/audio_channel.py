@@ -0,0 +1,112 @@
+import asyncio
+import collections
+import threading
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AudioChannel:
+    """
+    Bounded channel carrying audio frames from the Vonage WebSocket reader to
+    the Gemini sender. Writers on any thread wake the async reader immediately
+    (no polling); when the channel is full the oldest (stalest) frame is dropped.
+    """
+
+    def __init__(self, maxsize=25):
+        self.maxsize = maxsize
+        self._frames = collections.deque()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._waiter = None        # Reader waiting for a frame
+        self._space_waiter = None  # Async writer waiting for room
+        self._closed = False
+
+        # Counters
+        self.frames_in = 0
+        self.frames_out = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.backpressure_waits = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put_nowait(self, frame):
+        """Thread-safe write. Drops the oldest frame when full. Returns False once closed."""
+        with self._lock:
+            if self._closed:
+                return False
+            if len(self._frames) >= self.maxsize:
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append(frame)
+            self.frames_in += 1
+            if len(self._frames) > self.high_water:
+                self.high_water = len(self._frames)
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            self._loop.call_soon_threadsafe(_wake, waiter)
+        return True
+
+    async def put(self, frame, timeout=0.02):
+        """
+        Async write with backpressure: waits up to `timeout` seconds for the
+        reader to make room, then falls back to drop-oldest. Must run on the
+        reader's loop.
+        """
+        if timeout and len(self._frames) >= self.maxsize and not self._closed:
+            self.backpressure_waits += 1
+            waiter = asyncio.get_running_loop().create_future()
+            with self._lock:
+                self._space_waiter = waiter
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.put_nowait(frame)
+
+    async def get(self):
+        """Wait for the next frame. Returns None once the channel is closed and drained."""
+        while True:
+            with self._lock:
+                if self._frames:
+                    frame = self._frames.popleft()
+                    self.frames_out += 1
+                    space_waiter, self._space_waiter = self._space_waiter, None
+                    break
+                if self._closed:
+                    return None
+                self._loop = asyncio.get_running_loop()
+                waiter = self._loop.create_future()
+                self._waiter = waiter
+            await waiter
+
+        if space_waiter is not None:
+            _wake(space_waiter)
+        return frame
+
+    def close(self):
+        """Thread-safe. Wakes the reader, which drains what is left and then gets None."""
+        with self._lock:
+            self._closed = True
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            self._loop.call_soon_threadsafe(_wake, waiter)
+
+    def stats(self):
+        return {
+            'depth': len(self._frames),
+            'maxsize': self.maxsize,
+            'high_water': self.high_water,
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'dropped': self.dropped,
+            'backpressure_waits': self.backpressure_waits,
+        }
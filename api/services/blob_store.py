@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import tempfile
+
+try:
+    import boto3
+except ImportError:
+    pass
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    """
+    Content-addressed blobs on the local filesystem: `root/ab/cd/<sha256>`.
+    Identical uploads are stored once; writes are atomic (temp file + rename).
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data):
+        """Store `data` and return its key (the SHA-256 hex digest)."""
+        key = content_hash(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return key
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def read(self, key):
+        with self.open(key) as f:
+            return f.read()
+
+    def iter_chunks(self, key, chunk_size=CHUNK_SIZE):
+        with self.open(key) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore:
+    """
+    The same interface on an S3-compatible bucket (AWS, or MinIO as a
+    local stand-in via `endpoint_url`). Needs boto3. Blobs have no local
+    path, so callers stream them with `iter_chunks`.
+    """
+
+    def __init__(self, bucket, prefix='blobs/', endpoint_url=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def _object_key(self, key):
+        return f"{self.prefix}{key[:2]}/{key}"
+
+    def path(self, key):
+        return None
+
+    def put(self, data):
+        key = content_hash(data)
+        if not self.exists(key):
+            self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=data)
+        return key
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except Exception:
+            return False
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))['Body']
+
+    def read(self, key):
+        return self.open(key).read()
+
+    def iter_chunks(self, key, chunk_size=CHUNK_SIZE):
+        body = self.open(key)
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+
+def create_blob_store():
+    """Blob store from BLOB_STORE ('local' or 's3')."""
+    if Config.BLOB_STORE == 's3':
+        return S3BlobStore(Config.S3_BUCKET, prefix=Config.S3_PREFIX, endpoint_url=Config.S3_ENDPOINT_URL)
+    return LocalBlobStore(Config.BLOB_STORE_PATH)
+
+
+blob_store = create_blob_store()
+
+
+def menu_image_bytes(image):
+    """Bytes of a MenuImage, from the blob store or the legacy image_data column."""
+    if image.content_hash:
+        return blob_store.read(image.content_hash)
+    return image.image_data
+
+
+def menu_image_etag(image):
+    """Strong ETag value (unquoted): the content hash."""
+    return image.content_hash or content_hash(image.image_data or b'')
@@ -0,0 +1,251 @@
+import asyncio
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from services.audio_channel import AudioChannel
+from utils.audio import FrameAssembler
+
+logger = logging.getLogger(__name__)
+
+
+class CallRejected(Exception):
+    """Raised when the engine is already running its maximum number of calls."""
+
+
+class CallMetrics:
+    """Per-call counters, readable from any thread."""
+
+    def __init__(self, call_id, caller_number=None, to_number=None):
+        self.call_id = call_id
+        self.caller_number = caller_number
+        self.to_number = to_number
+        self.started_at = time.time()
+        self.connected_at = None       # Gemini Live session established
+        self.first_audio_out_at = None  # First audio frame sent back to Vonage
+        self.ended_at = None
+        self.setup = None  # 'speculative' (started by the answer webhook) or 'inline'
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.frames_out_dropped = 0  # Vonage socket too slow to take paced frames
+        self.tool_calls = 0
+        self.errors = 0
+        self.barge_ins = []  # (latency_ms, dropped_ms) per interruption
+        self.channels = {}  # name -> AudioChannel, for queue depth / drop counters
+
+    def _ms_since_start(self, ts):
+        if ts is None:
+            return None
+        return round((ts - self.started_at) * 1000)
+
+    def record_barge_in(self, latency_ms, dropped_ms):
+        """The caller talked over the agent: how long it kept sounding, and how much was cut."""
+        self.barge_ins.append((latency_ms, dropped_ms))
+
+    def _barge_in_stats(self):
+        if not self.barge_ins:
+            return None
+        latencies = [latency for latency, _ in self.barge_ins]
+        return {
+            'count': len(self.barge_ins),
+            'avg_ms': round(sum(latencies) / len(latencies)),
+            'max_ms': max(latencies),
+            'dropped_ms': sum(dropped for _, dropped in self.barge_ins),
+        }
+
+    def to_dict(self):
+        end = self.ended_at or time.time()
+        return {
+            'call_id': self.call_id,
+            'caller_number': self.caller_number,
+            'to_number': self.to_number,
+            'started_at': self.started_at,
+            'duration_s': round(end - self.started_at, 1),
+            'setup': self.setup,
+            'connect_ms': self._ms_since_start(self.connected_at),
+            'first_audio_ms': self._ms_since_start(self.first_audio_out_at),
+            'frames_in': self.frames_in,
+            'bytes_in': self.bytes_in,
+            'frames_out': self.frames_out,
+            'bytes_out': self.bytes_out,
+            'frames_out_dropped': self.frames_out_dropped,
+            'tool_calls': self.tool_calls,
+            'errors': self.errors,
+            'barge_in': self._barge_in_stats(),
+            'channels': {name: ch.stats() for name, ch in self.channels.items()},
+            'active': self.ended_at is None,
+        }
+
+
+class CallHandle:
+    """
+    Thread-safe handle for one call running on the engine loop.
+    The WebSocket handler pushes inbound audio and waits for `stop_event`;
+    the session task reads it with `await handle.inbound.get()`. Outbound
+    frames go the other way through `outbound`, which the WebSocket side
+    drains (`drain_outbound`), so a slow Vonage socket never blocks the
+    loop shared by every call.
+    """
+
+    def __init__(self, engine, call_id, metrics, inbound_frames=25, frame_bytes=640, outbound_frames=25):
+        self.engine = engine
+        self.call_id = call_id
+        self.metrics = metrics
+        self.stop_event = threading.Event()
+        self.inbound = AudioChannel(maxsize=inbound_frames)
+        # Vonage messages are re-cut into fixed 20ms frames in a reused ring
+        self.assembler = FrameAssembler(frame_bytes=frame_bytes)
+        metrics.channels['inbound'] = self.inbound
+        self.outbound = queue.Queue(maxsize=outbound_frames)
+        self._future = None
+
+    def push_audio(self, data):
+        """Queue inbound audio from Vonage (called from the WebSocket thread)."""
+        self.metrics.bytes_in += len(data)
+        for frame in self.assembler.write(data):
+            self.inbound.put_nowait(bytes(frame))
+            self.metrics.frames_in += 1
+
+    def send_audio(self, frame):
+        """Queue a paced outbound frame for Vonage (engine loop, never blocks). Drops it when the socket lags."""
+        try:
+            self.outbound.put_nowait(frame)
+        except queue.Full:
+            self.metrics.frames_out_dropped += 1
+
+    def drain_outbound(self, send):
+        """Send queued frames with `send` until the call stops (run by the WebSocket side)."""
+        metrics = self.metrics
+        while not self.stop_event.is_set():
+            try:
+                frame = self.outbound.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                send(frame)
+            except Exception as e:
+                logger.info(f"Vonage closed or send error: {e}")
+                self.stop_event.set()
+                break
+            if metrics.first_audio_out_at is None:
+                metrics.first_audio_out_at = time.time()
+            metrics.frames_out += 1
+            metrics.bytes_out += len(frame)
+
+    def hangup(self):
+        """Stop the call and cancel its task on the engine loop."""
+        self.stop_event.set()
+        self.inbound.close()
+        if self._future is not None:
+            self._future.cancel()
+
+
+class CallEngine:
+    """
+    One long-lived asyncio loop per worker process that multiplexes every
+    active Gemini Live session as a task, with a bounded admission limit.
+    """
+
+    def __init__(self, max_calls=60, inbound_frames=25):
+        self.max_calls = max_calls
+        self.inbound_frames = inbound_frames
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._recent = collections.deque(maxlen=50)
+        self.total_calls = 0
+        self.rejected_calls = 0
+
+    def init_app(self, app):
+        self.max_calls = app.config.get('VOICE_MAX_CONCURRENT_CALLS', self.max_calls)
+        self.inbound_frames = app.config.get('VOICE_INBOUND_MAX_FRAMES', self.inbound_frames)
+        app.extensions['call_engine'] = self
+
+    @property
+    def loop(self):
+        return self._ensure_loop()
+
+    def _ensure_loop(self):
+        # Started lazily: gunicorn imports the app before forking workers, and a
+        # thread started in the master would not survive into the children.
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                ready.set()
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name='call-engine', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            self._pid = os.getpid()
+            self._calls.clear()
+            logger.info("🎛️ Call engine loop started")
+            return loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop, returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def start_call(self, run_call, call_id=None, caller_number=None, to_number=None):
+        """
+        Admit a call and schedule `run_call(handle)` on the engine loop.
+        Raises CallRejected when `max_calls` sessions are already active.
+        """
+        loop = self._ensure_loop()
+        call_id = call_id or uuid.uuid4().hex
+        with self._lock:
+            if len(self._calls) >= self.max_calls:
+                self.rejected_calls += 1
+                raise CallRejected(f"{len(self._calls)} calls active (max {self.max_calls})")
+            metrics = CallMetrics(call_id, caller_number, to_number)
+            handle = CallHandle(self, call_id, metrics, inbound_frames=self.inbound_frames)
+            # Keyed by handle: call_id comes from the query string and may be reused
+            self._calls[id(handle)] = handle
+            self.total_calls += 1
+
+        handle._future = asyncio.run_coroutine_threadsafe(self._run(handle, run_call), loop)
+        return handle
+
+    async def _run(self, handle, run_call):
+        try:
+            await run_call(handle)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            handle.metrics.errors += 1
+            logger.exception(f"Call {handle.call_id} crashed: {e}")
+        finally:
+            handle.stop_event.set()
+            handle.inbound.close()
+            handle.metrics.ended_at = time.time()
+            with self._lock:
+                self._calls.pop(id(handle), None)
+                self._recent.append(handle.metrics)
+
+    def stats(self):
+        with self._lock:
+            active = [h.metrics.to_dict() for h in self._calls.values()]
+            recent = [m.to_dict() for m in self._recent]
+        return {
+            'active_calls': len(active),
+            'max_calls': self.max_calls,
+            'total_calls': self.total_calls,
+            'rejected_calls': self.rejected_calls,
+            'calls': active,
+            'recent_calls': recent,
+        }
@@ -0,0 +1,86 @@
+import collections
+import threading
+import time
+
+from config.config import Config
+
+
+class CallProfile:
+    """Everything a call needs from its company, compiled once: voice, prompt, live config."""
+
+    __slots__ = ('voice_name', 'system_instruction', 'config', 'pool_key', 'built_at')
+
+    def __init__(self, voice_name, system_instruction, config, pool_key):
+        self.voice_name = voice_name
+        self.system_instruction = system_instruction
+        self.config = config
+        self.pool_key = pool_key
+        self.built_at = time.monotonic()
+
+
+_caches = []
+
+
+class CallProfileCache:
+    """
+    Per-company cache of compiled CallProfiles.
+
+    `build(company, *args)` is only called on a miss. Entries are dropped by
+    `invalidate_call_profiles(company_id)` when a company's prompt, menu or
+    voice is edited, and in any case after `ttl` seconds.
+    """
+
+    def __init__(self, build, maxsize=512, ttl=None):
+        self._build = build
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl is not None else Config.CALL_PROFILE_TTL
+        self._profiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.append(self)
+
+    def get(self, company, *args):
+        key = company.id if company else None
+        now = time.monotonic()
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None and now - profile.built_at < self.ttl:
+                self._profiles.move_to_end(key)
+                self.hits += 1
+                return profile
+            self.misses += 1
+
+        profile = self._build(company, *args)
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def invalidate(self, company_id=None):
+        with self._lock:
+            if company_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(company_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._profiles),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def invalidate_call_profiles(company_id=None):
+    """Drop the compiled profile of `company_id` (or every profile) from all caches."""
+    for cache in _caches:
+        cache.invalidate(company_id)
+
+
+def call_profile_stats():
+    return [cache.stats() for cache in _caches]
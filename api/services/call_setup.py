@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+import re
+import time
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Vonage call leg uuids are canonical 8-4-4-4-12 hex UUIDs
+_VONAGE_UUID = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+
+def is_vonage_uuid(value):
+    return bool(value) and isinstance(value, str) and bool(_VONAGE_UUID.match(value))
+
+
+class PreparedCall:
+    """
+    Result of a call setup: the resolved company and, unless the agent is
+    off, an open Gemini Live session. `async with prepared as session:`
+    hands the session over and closes it when the call ends.
+    """
+
+    def __init__(self, call_id, company=None):
+        self.call_id = call_id
+        self.company = company
+        self.company_id = company.id if company else None
+        self.agent_off = bool(company and not company.agent_on)
+        self.menu_index = None  # MenuIndex for the lookup_menu_item tool
+        self.session = None
+        self.ready_at = None
+        self._stack = contextlib.AsyncExitStack()
+
+    async def open_session(self, session_cm):
+        self.session = await self._stack.enter_async_context(session_cm)
+        self.ready_at = time.time()
+        return self.session
+
+    async def close(self):
+        await self._stack.aclose()
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class CallSetupRegistry:
+    """
+    Speculative call setups keyed by call ID.
+
+    The answer webhook `reserve`s a setup (company lookup, prompt build,
+    Gemini connect) as soon as Vonage asks for the NCCO; `voice_stream`
+    `claim`s it when the WebSocket opens. Setups nobody claims within
+    `timeout` seconds are cancelled and their session closed. The webhook
+    is unauthenticated, so at most `max_pending` setups are in flight;
+    beyond that `reserve` refuses and the call is set up inline. All methods
+    must run on the event loop that owns the voice sessions. With several
+    workers the WebSocket may land on another process: the claim misses
+    and the call is set up inline as before.
+    """
+
+    def __init__(self, timeout=15, max_pending=60):
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._pending = {}  # call_id -> (task, TimerHandle)
+
+        # Metrics
+        self.reserved = 0
+        self.refused = 0
+        self.claimed = 0
+        self.expired = 0
+        self.claim_misses = 0
+
+    def reserve(self, call_id, prepare):
+        """
+        Start `prepare()` (a coroutine function returning a PreparedCall) for
+        `call_id`. Returns False when the setup was not started.
+        """
+        if not call_id or call_id in self._pending:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.refused += 1
+            logger.warning(f"🚫 Call setup {call_id} refused: {len(self._pending)} setups pending")
+            return False
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(prepare())
+        timer = loop.call_later(self.timeout, self._expire, call_id)
+        self._pending[call_id] = (task, timer)
+        self.reserved += 1
+        return True
+
+    def claim(self, call_id):
+        """Take over the setup task for `call_id`, or None if none is in flight."""
+        entry = self._pending.pop(call_id, None) if call_id else None
+        if entry is None:
+            self.claim_misses += 1
+            return None
+        task, timer = entry
+        timer.cancel()
+        self.claimed += 1
+        return task
+
+    def _expire(self, call_id):
+        entry = self._pending.pop(call_id, None)
+        if entry is None:
+            return
+        task, _ = entry
+        self.expired += 1
+        logger.info(f"⌛ Call setup {call_id} never claimed, cleaning up")
+        if task.done():
+            if not task.cancelled() and task.exception() is None:
+                asyncio.get_running_loop().create_task(task.result().close())
+        else:
+            task.cancel()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'max_pending': self.max_pending,
+            'reserved': self.reserved,
+            'refused': self.refused,
+            'claimed': self.claimed,
+            'expired': self.expired,
+            'claim_misses': self.claim_misses,
+        }
+
+
+# One registry per worker process, living on its voice event loop
+call_setups = CallSetupRegistry(timeout=Config.VOICE_SETUP_TIMEOUT, max_pending=Config.VOICE_SETUP_MAX_PENDING)
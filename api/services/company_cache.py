@@ -0,0 +1,139 @@
+import collections
+import threading
+import time
+
+from config.config import Config
+from services.call_profile import invalidate_call_profiles
+from services.invalidation_bus import ensure_listening, on_change, publish_change
+
+
+class CompanySnapshot(collections.namedtuple('CompanySnapshot', [
+    'id', 'name', 'phone_number', 'system_prompt', 'menu', 'agent_on', 'voice',
+    'vad_mode', 'vad_threshold'
+])):
+    """Immutable copy of the Company fields a call needs; safe to share across sessions and threads."""
+
+    @classmethod
+    def from_model(cls, company):
+        return cls(
+            id=company.id,
+            name=company.name,
+            phone_number=company.phone_number,
+            system_prompt=company.system_prompt,
+            menu=company.menu,
+            agent_on=company.agent_on,
+            voice=company.voice,
+            # Not mapped on every Company model (models_new); None = platform default
+            vad_mode=getattr(company, 'vad_mode', None),
+            vad_threshold=getattr(company, 'vad_threshold', None),
+        )
+
+
+class CompanyCache:
+    """
+    LRU cache of company snapshots keyed by normalized phone number.
+
+    Unknown numbers are cached too (negative entries, shorter TTL) so spam
+    calls to unassigned numbers do not hit the database. Writers call
+    `company_changed()` after committing so edits apply immediately in
+    every worker (via the invalidation bus).
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, negative_ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = collections.OrderedDict()  # phone -> (snapshot or None, expires_at)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, phone):
+        """Return (found, snapshot). `found` is False on a miss; snapshot is None for unknown numbers."""
+        ensure_listening()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(phone)
+                if entry[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def put(self, phone, company):
+        """Cache a Company model (or None for an unknown number) and return its snapshot."""
+        snapshot = CompanySnapshot.from_model(company) if company is not None else None
+        ttl = self.ttl if snapshot is not None else self.negative_ttl
+        with self._lock:
+            self._entries[phone] = (snapshot, time.monotonic() + ttl)
+            self._entries.move_to_end(phone)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def get_or_load(self, phone, load):
+        """Cached snapshot for `phone`, calling `load(phone)` -> Company | None on a miss."""
+        found, snapshot = self.lookup(phone)
+        if found:
+            return snapshot
+        return self.put(phone, load(phone))
+
+    def invalidate(self, company_id=None, phones=()):
+        """Drop entries for `company_id` and the given phone numbers (no arguments: everything)."""
+        with self._lock:
+            self.invalidations += 1
+            if company_id is None and not phones:
+                self._entries.clear()
+                return
+            for phone in phones:
+                self._entries.pop(phone, None)
+            if company_id is not None:
+                stale = [phone for phone, (snapshot, _) in self._entries.items()
+                         if snapshot is not None and snapshot.id == company_id]
+                for phone in stale:
+                    del self._entries[phone]
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+            'invalidations': self.invalidations,
+        }
+
+
+company_cache = CompanyCache(
+    maxsize=Config.COMPANY_CACHE_SIZE,
+    ttl=Config.COMPANY_CACHE_TTL,
+    negative_ttl=Config.COMPANY_CACHE_NEGATIVE_TTL,
+)
+
+
+def _on_company_change(message):
+    company_cache.invalidate(company_id=message.get('company_id'), phones=tuple(message.get('phones') or ()))
+    invalidate_call_profiles(message.get('company_id'))
+
+
+on_change('company', _on_company_change)
+on_change('menu', _on_company_change)
+
+
+def company_changed(company_id, *phones, kind='company'):
+    """
+    Call after committing a change to a company (kind='menu' for menu edits):
+    drops its cached snapshot, any negative entry for its phone numbers and
+    its compiled call profile, in this worker and every other one.
+    """
+    publish_change(kind, company_id=company_id, phones=[p for p in phones if p])
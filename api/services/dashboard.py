@@ -0,0 +1,168 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select, union_all
+
+from config.config import Config
+
+ACTIVE_STATUSES = ('recu', 'en_cours')
+
+
+def encode_cursor(created_at, order_id):
+    """Opaque keyset cursor for the (created_at, id) position of an order."""
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from `encode_cursor`; raises ValueError on a malformed cursor."""
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _status_page(Order, Company, status, limit, company_id=None, after=None):
+    """
+    Newest `limit` orders of one status (after the keyset position `after`):
+    an index range scan on ix_orders_company_status_created that stops at
+    the limit. Selects just the columns the UI shows; the company phone
+    comes from an outer join instead of a lazy load per row.
+    """
+    stmt = select(
+        Order.id,
+        Order.status,
+        Order.order_detail,
+        Order.customer_name,
+        Order.customer_phone,
+        func.coalesce(Company.phone_number, Order.company_phone).label('company_phone'),
+        Order.address,
+        Order.created_at,
+    ).outerjoin(Company, Company.id == Order.company_id).where(Order.status == status)
+
+    if company_id is not None:
+        stmt = stmt.where(Order.company_id == company_id)
+    if after is not None:
+        created_at, order_id = after
+        stmt = stmt.where(
+            or_(Order.created_at < created_at, and_(Order.created_at == created_at, Order.id < order_id))
+        )
+    # Wrapped so each branch keeps its own ORDER BY / LIMIT inside the UNION
+    return select(stmt.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit).subquery())
+
+
+def dashboard_statement(Order, Company, company_id=None, cursor=None, page_size=None, active_limit=None):
+    """
+    One query for the whole dashboard: UNION ALL of one LIMITed branch per
+    status, so each reads only the rows it returns instead of ranking the
+    company's whole order history. Active orders are capped at
+    `active_limit` (plus one row, to flag truncation) and 'termine' at the
+    first page (plus one, to tell whether there is a next page). With a
+    `cursor`, returns only the next page of 'termine' orders after it.
+
+    `Order` and `Company` are the models of the calling stack (Flask-SQLAlchemy
+    or models_new); pass company_id=None for the superadmin view.
+    """
+    page_size = page_size or Config.DASHBOARD_PAGE_SIZE
+    active_limit = active_limit or Config.DASHBOARD_ACTIVE_LIMIT
+
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        return _status_page(Order, Company, 'termine', page_size + 1, company_id, after)
+
+    pages = union_all(
+        *(_status_page(Order, Company, status, active_limit + 1, company_id) for status in ACTIVE_STATUSES),
+        _status_page(Order, Company, 'termine', page_size + 1, company_id),
+    ).subquery()
+    return select(pages).order_by(pages.c.status, pages.c.created_at.desc(), pages.c.id.desc())
+
+
+def _row_to_dict(row):
+    return {
+        'id': row.id,
+        'status': row.status,
+        'order_detail': row.order_detail,
+        'customer_name': row.customer_name,
+        'customer_phone': row.customer_phone,
+        'company_phone': row.company_phone,
+        'address': row.address,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def build_dashboard(rows, cursor=None, page_size=None, active_limit=None):
+    """
+    Group the rows of `dashboard_statement` into the dashboard response.
+    `orders_<status>_truncated` is True when more active orders exist than
+    the `active_limit` returned, so the kitchen can tell some are missing.
+    """
+    page_size = page_size or Config.DASHBOARD_PAGE_SIZE
+    active_limit = active_limit or Config.DASHBOARD_ACTIVE_LIMIT
+    grouped = {'recu': [], 'en_cours': [], 'termine': []}
+    truncated = {'recu': False, 'en_cours': False}
+    last_termine = None
+    has_more = False
+    for row in rows:
+        bucket = grouped.get(row.status)
+        if bucket is None:
+            continue
+        if row.status == 'termine':
+            if len(bucket) >= page_size:
+                has_more = True
+                continue
+            last_termine = row
+        elif len(bucket) >= active_limit:
+            truncated[row.status] = True
+            continue
+        bucket.append(_row_to_dict(row))
+
+    next_cursor = encode_cursor(last_termine.created_at, last_termine.id) if has_more else None
+
+    if cursor is not None:
+        return {'orders_termine': grouped['termine'], 'termine_next_cursor': next_cursor}
+    return {
+        'orders_recu': grouped['recu'],
+        'orders_en_cours': grouped['en_cours'],
+        'orders_termine': grouped['termine'],
+        'termine_next_cursor': next_cursor,
+        'orders_recu_truncated': truncated['recu'],
+        'orders_en_cours_truncated': truncated['en_cours'],
+    }
+
+
+def demands_statement(Demand, Order, company_id=None):
+    """
+    Demands (newest first) with the caller's active order count at the same
+    company, from one grouped aggregate joined in, instead of a COUNT per
+    demand. Pass company_id=None for the superadmin view.
+    """
+    active = select(
+        Order.company_id,
+        Order.customer_phone,
+        func.count(Order.id).label('active_orders_count'),
+    ).where(Order.status.in_(ACTIVE_STATUSES))
+    if company_id is not None:
+        active = active.where(Order.company_id == company_id)
+    active = active.group_by(Order.company_id, Order.customer_phone).subquery()
+
+    stmt = select(Demand, func.coalesce(active.c.active_orders_count, 0)).outerjoin(
+        active,
+        and_(active.c.company_id == Demand.company_id, active.c.customer_phone == Demand.customer_phone),
+    )
+    if company_id is not None:
+        stmt = stmt.where(Demand.company_id == company_id)
+    return stmt.order_by(Demand.created_at.desc())
+
+
+def build_demands(rows):
+    """Split the rows of `demands_statement` into the demands response."""
+    demands_new, demands_processed = [], []
+    for demand, active_orders_count in rows:
+        d_dict = demand.to_dict()
+        d_dict['active_orders_count'] = active_orders_count
+        if demand.status == 'new':
+            demands_new.append(d_dict)
+        elif demand.status == 'processed':
+            demands_processed.append(d_dict)
+    return {'demands_new': demands_new, 'demands_processed': demands_processed}
@@ -0,0 +1,274 @@
+import asyncio
+import collections
+import json
+import logging
+import queue
+import threading
+import time
+
+from config.config import Config
+from services.pubsub import get_bus, on_bus_start
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'kitchenline_events'
+
+_CLOSED = object()
+
+
+class Subscription:
+    """
+    One SSE client. Receives the events its scope allows, in ID order.
+    `company_id=None` with `all_companies=True` is the superadmin view.
+    """
+
+    def __init__(self, broker, company_id=None, all_companies=False, maxsize=256):
+        self.broker = broker
+        self.company_id = company_id
+        self.all_companies = all_companies
+        self.maxsize = maxsize
+        self.closed = False
+        self._queue = queue.Queue(maxsize)
+
+    def wants(self, event):
+        return self.all_companies or (event['company_id'] is not None and event['company_id'] == self.company_id)
+
+    def _put(self, item):
+        """Queue `item`; returns False when the subscriber is too far behind."""
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout=None):
+        """Next event, None on timeout, or raises EOFError once the subscription is closed."""
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _CLOSED:
+            raise EOFError
+        return item
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._put_closed()
+
+    def _put_closed(self):
+        try:
+            self._queue.put_nowait(_CLOSED)
+        except queue.Full:
+            # Make room: the reader must learn it was closed
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(_CLOSED)
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription read from an event loop (FastAPI). Publishers on any
+    thread wake the waiting coroutine; no thread is held per client.
+    """
+
+    def __init__(self, broker, company_id=None, all_companies=False, maxsize=256, loop=None):
+        super().__init__(broker, company_id=company_id, all_companies=all_companies, maxsize=maxsize)
+        self._loop = loop or asyncio.get_running_loop()
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._waiter = None
+
+    def _put(self, item):
+        with self._lock:
+            if item is not _CLOSED and len(self._items) >= self.maxsize:
+                return False
+            self._items.append(item)
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            self._loop.call_soon_threadsafe(_wake, waiter)
+        return True
+
+    def _put_closed(self):
+        self._put(_CLOSED)
+
+    async def get(self, timeout=None):
+        """Next event, None on timeout, or raises EOFError once the subscription is closed."""
+        with self._lock:
+            if not self._items:
+                self._waiter = waiter = self._loop.create_future()
+            else:
+                waiter = None
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+        with self._lock:
+            if not self._items:
+                return None
+            item = self._items.popleft()
+        if item is _CLOSED:
+            raise EOFError
+        return item
+
+
+class EventBroker:
+    """
+    Fan-out of dashboard events (new orders, demands, status changes).
+
+    Keeps the last `buffer_size` events in a ring buffer so reconnecting
+    clients resume from `Last-Event-ID`. Publishing wakes each matching
+    subscriber's queue directly; a subscriber whose queue is full is
+    evicted and resumes on reconnect.
+
+    With `relay=True` events are also sent over the pub/sub bus, so a
+    dashboard connected to any worker sees events published by all of
+    them. IDs are hybrid clock values (milliseconds * 1000 + counter, never
+    below any ID seen from another worker), so they increase across
+    workers and Last-Event-ID stays meaningful after reconnecting to a
+    different one.
+    """
+
+    def __init__(self, buffer_size=1000, subscriber_queue=256, relay=False):
+        self.buffer_size = buffer_size
+        self.subscriber_queue = subscriber_queue
+        self.relay = relay
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.published = 0
+        self.received = 0
+        self.relay_errors = 0
+        self.evicted = 0
+
+    def _next_id(self):
+        self._last_id = max(self._last_id + 1, int(time.time() * 1000) * 1000)
+        return self._last_id
+
+    def publish(self, event_type, data, company_id=None):
+        """Record an event and deliver it to every subscriber allowed to see it, in every worker."""
+        with self._lock:
+            event = {
+                'id': self._next_id(),
+                'type': event_type,
+                'data': data,
+                'company_id': company_id,
+                'timestamp': time.time(),
+            }
+            self.published += 1
+        self._deliver(event)
+        if self.relay:
+            try:
+                get_bus().publish(CHANNEL, event)
+            except Exception as e:
+                self.relay_errors += 1
+                logger.warning(f"Event relay failed for {event_type}: {e}")
+        return event
+
+    def receive(self, event):
+        """Deliver an event published by another worker."""
+        with self._lock:
+            self._last_id = max(self._last_id, event['id'])
+            self.received += 1
+        self._deliver(event)
+
+    def _deliver(self, event):
+        with self._lock:
+            self._buffer.append(event)
+            subscribers = [sub for sub in self._subscribers if sub.wants(event)]
+        for sub in subscribers:
+            if not sub._put(event):
+                self._evict(sub)
+
+    def subscribe(self, company_id=None, all_companies=False, last_event_id=None, subscription_cls=Subscription, **kwargs):
+        """
+        Register a subscriber, pre-loaded with buffered events newer than
+        `last_event_id`. If the buffer cannot prove nothing was missed, a
+        `resync` event tells the client to reload its data.
+        """
+        if self.relay:
+            get_bus()  # Start listening in this worker before the first event
+        sub = subscription_cls(self, company_id=company_id, all_companies=all_companies,
+                               maxsize=self.subscriber_queue, **kwargs)
+        with self._lock:
+            if last_event_id is not None:
+                oldest = min(e['id'] for e in self._buffer) if self._buffer else None
+                missed = sorted((e for e in self._buffer if e['id'] > last_event_id and sub.wants(e)),
+                                key=lambda e: e['id'])
+                room = self.subscriber_queue - 1
+                # Nothing buffered that old (evicted, or this worker restarted): resume may have a gap
+                if oldest is None or last_event_id < oldest or len(missed) > room:
+                    sub._put({'id': None, 'type': 'resync', 'data': {}, 'company_id': company_id,
+                              'timestamp': time.time()})
+                for event in missed[-room:] if room > 0 else ():
+                    sub._put(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+        sub.close()
+
+    def _evict(self, sub):
+        with self._lock:
+            if sub not in self._subscribers:
+                return
+            self._subscribers.discard(sub)
+            self.evicted += 1
+        sub.close()
+
+    def last_event_id(self):
+        with self._lock:
+            return self._last_id
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'buffered': len(self._buffer),
+                'buffer_size': self.buffer_size,
+                'last_event_id': self._last_id,
+                'relay': self.relay,
+                'published': self.published,
+                'received': self.received,
+                'relay_errors': self.relay_errors,
+                'evicted': self.evicted,
+            }
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def format_sse(event):
+    """Serialize an event as an SSE message (same JSON shape as before, plus `id:`)."""
+    payload = json.dumps({'type': event['type'], 'data': event['data'], 'timestamp': event['timestamp']})
+    if event['id'] is None:
+        return f"data: {payload}\n\n"
+    return f"id: {event['id']}\ndata: {payload}\n\n"
+
+
+# One broker per worker process, relaying through the bus to the others
+event_broker = EventBroker(
+    buffer_size=Config.EVENT_BUFFER_SIZE,
+    subscriber_queue=Config.SSE_SUBSCRIBER_QUEUE,
+    relay=True,
+)
+
+# Our own events were delivered locally by publish()
+on_bus_start(lambda bus: bus.subscribe(CHANNEL, event_broker.receive, skip_own=True))
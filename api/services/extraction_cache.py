@@ -0,0 +1,78 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def extraction_cache_key(image_hashes, prompt, model):
+    """
+    SHA-256 of the sorted image content hashes, the prompt and the model:
+    the same photos extracted the same way give the same menu, whichever
+    company or upload order they come from. A prompt edit is a new key.
+    """
+    h = hashlib.sha256()
+    for image_hash in sorted(image_hashes):
+        h.update(image_hash.encode())
+        h.update(b'\0')
+    h.update(b'\1' + prompt.encode('utf-8'))
+    h.update(b'\1' + model.encode())
+    return h.hexdigest()
+
+
+def lookup_statement(MenuExtraction, key, ttl=None):
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl or Config.EXTRACTION_CACHE_TTL)
+    return select(MenuExtraction).where(MenuExtraction.cache_key == key, MenuExtraction.created_at >= cutoff)
+
+
+def lookup_extraction(session, MenuExtraction, key, ttl=None):
+    """Fresh cached menu text for `key`, or None. Counts the hit (caller commits)."""
+    entry = session.execute(lookup_statement(MenuExtraction, key, ttl)).scalars().first()
+    if entry is None:
+        return None
+    session.execute(
+        update(MenuExtraction).where(MenuExtraction.id == entry.id)
+        .values(hits=MenuExtraction.hits + 1)
+    )
+    return entry.menu_text
+
+
+def _upsert(session, MenuExtraction, values):
+    """INSERT ... ON CONFLICT (cache_key) DO UPDATE where the dialect has it, else None."""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    stmt = insert(MenuExtraction).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[MenuExtraction.cache_key],
+        set_={name: stmt.excluded[name] for name in values if name != 'cache_key'},
+    )
+
+
+def store_extraction(session, MenuExtraction, key, menu_text, model, image_count, ttl=None):
+    """
+    Record (or refresh) the result for `key` and drop expired entries.
+    An upsert, so two companies storing the same images at once both
+    succeed. Caller commits, in its own transaction: a failed cache write
+    must not roll back the menu it was extracted for.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl or Config.EXTRACTION_CACHE_TTL)
+    session.execute(delete(MenuExtraction).where(
+        MenuExtraction.created_at < cutoff, MenuExtraction.cache_key != key
+    ))
+    values = dict(cache_key=key, menu_text=menu_text, model=model, image_count=image_count,
+                  hits=0, created_at=datetime.utcnow())
+    upsert = _upsert(session, MenuExtraction, values)
+    if upsert is not None:
+        session.execute(upsert)
+    else:
+        session.execute(delete(MenuExtraction).where(MenuExtraction.cache_key == key))
+        session.add(MenuExtraction(**values))
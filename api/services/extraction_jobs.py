@@ -0,0 +1,202 @@
+import collections
+import hashlib
+import logging
+import queue
+import threading
+import time
+import uuid
+
+try:
+    from google.genai import types
+except ImportError:
+    pass
+
+from config.config import Config
+from services.event_broker import event_broker
+from services.gemini_pool import gemini_pool
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODEL = "gemini-2.0-flash-exp"
+EXTRACTION_PROMPT = (
+    "Extract strictly only the menu items and their prices from these images. Output the result as a raw "
+    "text list (Item: Price), one item per line, with each menu section name on its own line as '# Section'. "
+    "Do NOT include any introductory text, other markdown formatting, footers, or any conversational filler. "
+    "Just the data."
+)
+
+ACTIVE = ('queued', 'running')
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def extract_menu_text(images, prompt=EXTRACTION_PROMPT, model=EXTRACTION_MODEL):
+    """Run one extraction on the shared client; `images` is a list of (bytes, mime)."""
+    parts = [prompt]
+    for data, mime_type in images:
+        parts.append(types.Part(inline_data=types.Blob(data=data, mime_type=mime_type)))
+    response = gemini_pool.get_client().models.generate_content(model=model, contents=parts)
+    return response.text
+
+
+def job_key(company_id, image_hashes):
+    """Coalescing key: the same image set extracted for the same company is one job."""
+    digest = hashlib.sha256('|'.join(sorted(image_hashes)).encode()).hexdigest()
+    return f"{company_id}:{digest}"
+
+
+class ExtractionJob:
+    def __init__(self, key, company_id, image_count, run):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.company_id = company_id
+        self.image_count = image_count
+        self.run = run
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'company_id': self.company_id,
+            'images': self.image_count,
+            'menu_text': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'duration': round(self.finished_at - self.started_at, 2) if self.finished_at and self.started_at else None,
+        }
+
+
+class ExtractionJobs:
+    """
+    Menu extractions run in the background instead of inside the request.
+
+    `submit` queues a job and returns at once; `workers` threads (greenlets
+    under gevent) run them, at most `max_pending` waiting. A request for an
+    image set that is already queued or running joins that job instead of
+    starting another. Each state change is published on the events stream
+    as `menu_extraction`; finished jobs stay pollable for `ttl` seconds.
+    Jobs live in this worker process.
+    """
+
+    def __init__(self, workers=2, max_pending=20, ttl=3600):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._queue = queue.Queue(max_pending)
+        self._jobs = collections.OrderedDict()  # id -> job, oldest first
+        self._active = {}  # key -> queued/running job
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Metrics
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            workers=config.EXTRACTION_WORKERS,
+            max_pending=config.EXTRACTION_QUEUE_SIZE,
+            ttl=config.EXTRACTION_JOB_TTL,
+        )
+
+    def _start_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self.workers):
+            thread = threading.Thread(target=self._work, name=f"extraction-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, company_id, image_count, run):
+        """
+        Queue `run(job)` (returns the menu text) unless a job for `key` is
+        already active. Returns (job, coalesced); raises JobQueueFull.
+        """
+        with self._lock:
+            self._expire()
+            job = self._active.get(key)
+            if job is not None:
+                self.coalesced += 1
+                return job, True
+            if self._queue.full():
+                self.rejected += 1
+                raise JobQueueFull(f"{self.max_pending} extractions already waiting")
+            job = ExtractionJob(key, company_id, image_count, run)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self.submitted += 1
+            # Announced before a worker can pick it up, so events arrive in order
+            self._publish(job)
+            self._queue.put_nowait(job)
+            self._start_workers()
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.status in ACTIVE or job.finished_at > cutoff:
+                break
+            self._jobs.popitem(last=False)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            job.started_at = time.time()
+            self._publish(job)
+            try:
+                job.result = job.run(job)
+                job.status = 'done'
+                self.completed += 1
+                logger.info(f"🍽️ Menu extraction {job.id} done in {time.time() - job.started_at:.2f}s")
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+                self.failed += 1
+                logger.exception(f"Menu extraction {job.id} failed")
+            finally:
+                job.finished_at = time.time()
+                job.run = None
+                with self._lock:
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+            self._publish(job)
+
+    def _publish(self, job):
+        try:
+            event_broker.publish('menu_extraction', job.to_dict(), company_id=job.company_id)
+        except Exception as e:
+            logger.warning(f"menu_extraction event failed for {job.id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self._queue.qsize(),
+                'active': len(self._active),
+                'tracked': len(self._jobs),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+
+extraction_jobs = ExtractionJobs.from_config()
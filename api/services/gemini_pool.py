@@ -0,0 +1,234 @@
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+
+try:
+    from google import genai
+except ImportError:
+    pass
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+VERTEX_PROJECT = "polar-equinox-472800-j2"
+VERTEX_LOCATION = "us-central1"
+
+
+def session_key(model, voice_name, system_instruction):
+    """Pool key for a live session: (model, voice, system_instruction hash)."""
+    digest = hashlib.sha1((system_instruction or "").encode("utf-8")).hexdigest()[:16]
+    return (model, voice_name, digest)
+
+
+class _WarmSession:
+    def __init__(self, key, cm, session):
+        self.key = key
+        self.cm = cm
+        self.session = session
+        self.created_at = time.monotonic()
+
+    async def close(self):
+        try:
+            await self.cm.__aexit__(None, None, None)
+        except Exception as e:
+            logger.info(f"Warm session close error: {e}")
+
+
+class GeminiPool:
+    """
+    Warm pool for Gemini Live.
+
+    Keeps `client_count` ready `genai.Client` instances and, when
+    `warm_sessions` > 0, pre-connected live sessions for the `warm_keys`
+    busiest (voice, system_instruction) configurations, refilled in the
+    background. Idle sessions are closed after `session_ttl` seconds.
+    All session work happens on the loop that first uses the pool.
+    """
+
+    def __init__(self, client_count=2, warm_sessions=0, warm_keys=3, session_ttl=60, refill_interval=5):
+        self.client_count = max(1, client_count)
+        self.warm_sessions = warm_sessions
+        self.warm_keys = warm_keys
+        self.session_ttl = session_ttl
+        self.refill_interval = refill_interval
+
+        self._clients = []
+        self._client_cycle = None
+        self._client_lock = threading.Lock()
+
+        self._loop = None
+        self._refill_task = None
+        self._idle = {}     # key -> [_WarmSession]
+        self._demand = {}   # key -> [score, model, config]
+        self._connecting = set()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.connect_errors = 0
+        self._connect_ms_total = 0.0
+        self._connects = 0
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            client_count=config.GEMINI_CLIENT_POOL_SIZE,
+            warm_sessions=config.GEMINI_WARM_SESSIONS,
+            warm_keys=config.GEMINI_WARM_KEYS,
+            session_ttl=config.GEMINI_WARM_SESSION_TTL,
+        )
+
+    # --- Clients ---
+
+    def _new_client(self):
+        creds_path = os.path.abspath("vertex-json.json")
+        if os.path.exists(creds_path):
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = creds_path
+        return genai.Client(vertexai=True, project=VERTEX_PROJECT, location=VERTEX_LOCATION)
+
+    def get_client(self):
+        """Return a ready client, creating the pool on first use."""
+        with self._client_lock:
+            if not self._clients:
+                self._clients = [self._new_client() for _ in range(self.client_count)]
+                self._client_cycle = itertools.cycle(self._clients)
+                logger.info(f"🔥 Gemini client pool ready ({self.client_count} clients)")
+            return next(self._client_cycle)
+
+    # --- Live sessions ---
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # New loop (first use or after a fork): sessions from the old one are unusable
+            self._loop = loop
+            self._idle.clear()
+            self._connecting.clear()
+            self._refill_task = None
+        if self.warm_sessions > 0 and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = loop.create_task(self._refill_loop())
+
+    async def _connect(self, key, model, config):
+        started = time.monotonic()
+        cm = self.get_client().aio.live.connect(model=model, config=config)
+        session = await cm.__aenter__()
+        self._connect_ms_total += (time.monotonic() - started) * 1000
+        self._connects += 1
+        return _WarmSession(key, cm, session)
+
+    def _take_idle(self, key):
+        idle = self._idle.get(key)
+        now = time.monotonic()
+        while idle:
+            warm = idle.pop(0)
+            if now - warm.created_at < self.session_ttl:
+                return warm
+            self.expired += 1
+            self._loop.create_task(warm.close())
+        return None
+
+    @contextlib.asynccontextmanager
+    async def session(self, model, config, key):
+        """
+        Drop-in for `client.aio.live.connect(...)`: yields a warm session for
+        `key` when one is idle, otherwise connects on demand.
+        """
+        self._bind_loop()
+        demand = self._demand.setdefault(key, [0.0, model, config])
+        demand[0] += 1
+        demand[2] = config
+
+        warm = self._take_idle(key)
+        if warm is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            warm = await self._connect(key, model, config)
+
+        if self.warm_sessions > 0:
+            self._loop.create_task(self._refill_key(key))
+
+        try:
+            yield warm.session
+        finally:
+            await warm.close()
+
+    async def _refill_key(self, key):
+        if key in self._connecting:
+            return
+        demand = self._demand.get(key)
+        if not demand:
+            return
+        _, model, config = demand
+        self._connecting.add(key)
+        try:
+            while len(self._idle.get(key, ())) < self.warm_sessions:
+                try:
+                    warm = await self._connect(key, model, config)
+                    self._idle.setdefault(key, []).append(warm)
+                except Exception as e:
+                    self.connect_errors += 1
+                    logger.warning(f"Warm session connect failed for {key}: {e}")
+                    break
+        finally:
+            self._connecting.discard(key)
+
+    async def _refill_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.refill_interval)
+                now = time.monotonic()
+
+                # Expire idle sessions (lists are edited in place, before any await)
+                stale = []
+                for idle in self._idle.values():
+                    stale.extend(w for w in idle if now - w.created_at >= self.session_ttl)
+                    idle[:] = [w for w in idle if now - w.created_at < self.session_ttl]
+                for warm in stale:
+                    self.expired += 1
+                    await warm.close()
+
+                # Decay demand and keep only the busiest keys warm
+                for demand in self._demand.values():
+                    demand[0] *= 0.9
+                ranked = sorted(self._demand.items(), key=lambda kv: kv[1][0], reverse=True)
+                hot = {key for key, demand in ranked[:self.warm_keys] if demand[0] >= 0.5}
+
+                for key in list(self._idle):
+                    if key not in hot:
+                        for warm in self._idle.pop(key):
+                            await warm.close()
+                for key in list(self._demand):
+                    if self._demand[key][0] < 0.01:
+                        del self._demand[key]
+                for key in hot:
+                    await self._refill_key(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Gemini pool refill error: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'clients': len(self._clients),
+            'warm_sessions_per_key': self.warm_sessions,
+            'idle_sessions': {'/'.join(map(str, key)): len(idle) for key, idle in self._idle.items()},
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'expired': self.expired,
+            'connect_errors': self.connect_errors,
+            'avg_connect_ms': round(self._connect_ms_total / self._connects) if self._connects else None,
+        }
+
+
+# One pool per worker process, shared by the Flask and FastAPI voice stacks
+gemini_pool = GeminiPool.from_config()
@@ -0,0 +1,191 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    pass
+
+from sqlalchemy import select, union
+
+from config.config import Config
+from services.blob_store import blob_store, menu_image_bytes
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ('original', 'thumb', 'model')
+
+_MAGIC = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+def sniff_mime(data, fallback='application/octet-stream'):
+    """Real image type from the magic bytes (the upload's declared type is often wrong)."""
+    for magic, mime in _MAGIC:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'heic', b'heix', b'mif1', b'msf1'):
+        return 'image/heic'
+    return fallback
+
+
+class ProcessedImage:
+    """Blob keys and metadata produced for one upload."""
+
+    __slots__ = ('content_hash', 'content_type', 'size', 'width', 'height', 'thumb_hash', 'model_hash')
+
+    def __init__(self, content_hash, content_type, size, width=None, height=None, thumb_hash=None, model_hash=None):
+        self.content_hash = content_hash
+        self.content_type = content_type
+        self.size = size
+        self.width = width
+        self.height = height
+        self.thumb_hash = thumb_hash
+        self.model_hash = model_hash
+
+
+def _encode_jpeg(image, quality):
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _downscale(image, max_side):
+    scaled = image.copy()
+    scaled.thumbnail((max_side, max_side), Image.LANCZOS)
+    return scaled
+
+
+def model_variant_bytes(data, max_side=None):
+    """
+    (bytes, mime) to send to the model: JPEG bounded to `max_side` pixels,
+    or the original bytes when they are already small enough (or Pillow
+    cannot read them).
+    """
+    max_side = max_side or Config.IMAGE_MODEL_MAX_SIDE
+    mime = sniff_mime(data, 'image/jpeg')
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            if max(image.size) <= max_side and mime == 'image/jpeg':
+                return data, mime
+            return _encode_jpeg(_downscale(image, max_side), Config.IMAGE_JPEG_QUALITY), 'image/jpeg'
+    except NameError:
+        # Pillow not installed
+        return data, mime
+    except Exception as e:
+        logger.warning(f"Could not downscale image for the model: {e}")
+        return data, mime
+
+
+def process_image(data):
+    """
+    Store an upload and its variants: the original, a `thumb` for the admin
+    list and a bounded-resolution `model` variant for menu extraction.
+    CPU-bound; run it through `run_in_pool` / `process_image_async`.
+    """
+    mime = sniff_mime(data, 'image/jpeg')
+    processed = ProcessedImage(blob_store.put(data), mime, len(data))
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            processed.width, processed.height = image.size
+
+            thumb = _downscale(image, Config.IMAGE_THUMB_SIZE)
+            processed.thumb_hash = blob_store.put(_encode_jpeg(thumb, 80))
+
+            if max(image.size) <= Config.IMAGE_MODEL_MAX_SIDE and mime == 'image/jpeg':
+                processed.model_hash = processed.content_hash
+            else:
+                model = _downscale(image, Config.IMAGE_MODEL_MAX_SIDE)
+                processed.model_hash = blob_store.put(_encode_jpeg(model, Config.IMAGE_JPEG_QUALITY))
+    except NameError:
+        # Pillow not installed: originals only
+        pass
+    except Exception as e:
+        logger.warning(f"Image variants skipped ({mime}, {len(data)} bytes): {e}")
+    return processed
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=Config.IMAGE_WORKERS, thread_name_prefix='image')
+    return _executor
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched('threading')
+    except ImportError:
+        return False
+
+
+def run_in_pool(fn, *args):
+    """
+    Run CPU-bound `fn(*args)` off the request and return its result. Under
+    gevent a greenlet would block the whole hub, so work goes to gevent's
+    native threadpool; otherwise to a ThreadPoolExecutor.
+    """
+    if _gevent_patched():
+        import gevent
+        return gevent.get_hub().threadpool.spawn(fn, *args).get()
+    return _get_executor().submit(fn, *args).result()
+
+
+async def process_image_async(data):
+    """process_image on the worker pool, for async (FastAPI) callers."""
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), process_image, data)
+
+
+async def model_variant_bytes_async(data):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), model_variant_bytes, data)
+
+
+def variant_key(image, variant):
+    """(blob key, mime) of `variant` for a MenuImage, falling back to the original."""
+    if variant == 'thumb' and image.thumb_hash:
+        return image.thumb_hash, 'image/jpeg'
+    if variant == 'model' and image.model_hash and image.model_hash != image.content_hash:
+        return image.model_hash, 'image/jpeg'
+    return image.content_hash, image.content_type
+
+
+def variant_keys(image):
+    """Every blob a MenuImage owns (they are derived from the original, so shared with its duplicates)."""
+    return {key for key in (image.content_hash, image.thumb_hash, image.model_hash) if key}
+
+
+def referenced_keys_statement(MenuImage, keys):
+    """Which of `keys` a MenuImage still uses, as its original, thumbnail or model variant."""
+    keys = list(keys)
+    return union(*(
+        select(column).where(column.in_(keys))
+        for column in (MenuImage.content_hash, MenuImage.thumb_hash, MenuImage.model_hash)
+    ))
+
+
+def menu_image_model_bytes(image):
+    """
+    (bytes, mime) of a MenuImage for extraction: the stored model variant,
+    or (rows uploaded before the pipeline) one made on the image pool.
+    Row attributes are read on the caller's thread.
+    """
+    if image.model_hash:
+        key, mime = variant_key(image, 'model')
+        return blob_store.read(key), mime
+    return run_in_pool(model_variant_bytes, menu_image_bytes(image))
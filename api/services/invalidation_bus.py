@@ -0,0 +1,44 @@
+import collections
+import logging
+
+from services.pubsub import get_bus, on_bus_start
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'kitchenline_invalidate'
+
+# kind ('company', 'menu', 'user') -> [handler(message)]
+_handlers = collections.defaultdict(list)
+
+
+def on_change(kind, handler):
+    """Run `handler(message)` in every worker whenever a `kind` change is published."""
+    _handlers[kind].append(handler)
+
+
+def _dispatch(message):
+    for handler in _handlers.get(message.get('kind'), ()):
+        handler(message)
+
+
+def publish_change(kind, **fields):
+    """
+    Apply a change locally, then broadcast it to the other workers.
+    Call after the DB commit; fields must be JSON-serializable.
+    """
+    message = dict(fields, kind=kind)
+    _dispatch(message)
+    try:
+        get_bus().publish(CHANNEL, message)
+    except Exception as e:
+        # Other workers fall back to their cache TTLs
+        logger.warning(f"Invalidation broadcast failed for {message}: {e}")
+
+
+def ensure_listening():
+    """Join this worker's bus (cheap and idempotent, safe on hot paths)."""
+    get_bus()
+
+
+# Our own messages were already applied by publish_change
+on_bus_start(lambda bus: bus.subscribe(CHANNEL, _dispatch, skip_own=True))
@@ -0,0 +1,330 @@
+import collections
+import difflib
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import delete, select
+
+from config.config import Config
+from services.invalidation_bus import on_change
+
+MenuEntry = collections.namedtuple('MenuEntry', ['id', 'category', 'name', 'price', 'price_label', 'aliases'])
+
+# --- Parsing extraction output ---
+
+_CURRENCY = r'(?:dhs?|mad|dirhams?|درهم|€|eur)'
+_PRICE_TAIL = re.compile(
+    rf'[\s:\-–—.…|]*((?:\d+(?:[.,]\d{{1,2}})?\s*{_CURRENCY}?\s*(?:/|-|–|ou)?\s*)+)$', re.IGNORECASE
+)
+_NUMBER = re.compile(r'\d+(?:[.,]\d{1,2})?')
+_BULLET = re.compile(r'^\s*(?:[-*•·]+|\d+[.)])\s+')
+_HEADER = re.compile(r'^\s*(?:#+\s*(.+?)\s*#*|\*\*(.+?)\*\*:?|(.+?):)\s*$')
+
+
+def _clean(text):
+    return text.strip(' \t*_:-–—.|').strip()
+
+
+def _split_aliases(name):
+    """
+    'Pastilla / Bastilla ou Bestila (au poulet)' -> ('Pastilla (au poulet)', ['Bastilla', 'Bestila']).
+    Parenthesized qualifiers ("(6 pièces)", "(taille M ou L)") stay part of the name.
+    """
+    qualifiers = ' '.join(f"({_clean(q)})" for q in re.findall(r'\(([^)]*)\)', name) if _clean(q))
+    bare = re.sub(r'\([^)]*\)', ' ', name)
+    if ',' in bare or len(bare) > 60:
+        return _clean(name), []  # A description ("nuggets, frites ou salade"), not alternative names
+    parts = [_clean(p) for p in re.split(r'\s+/\s+|\s+ou\s+|\s+aka\s+', bare) if _clean(p)]
+    if not parts:
+        return _clean(name), []
+    return f"{parts[0]} {qualifiers}".strip(), parts[1:]
+
+
+def _item(category, name, price, price_label, position):
+    item_name, aliases = _split_aliases(name)
+    return {'category': category, 'name': item_name[:200], 'price': price, 'price_label': price_label,
+            'aliases': aliases, 'position': position}
+
+
+def parse_menu_text(text):
+    """
+    Structured items from extraction output ("Item: Price" lines, with
+    optional '# Category' headers). Lines with a price are items; a bare
+    line is a category when it looks like a heading (short, uppercase or
+    opening a section) and an item without a price otherwise, so no line
+    of the menu is lost. Returns dicts with category, name, price,
+    price_label, aliases and position.
+    """
+    items = []
+    category = None
+    explicit = False  # The current category came from a '#', '**' or 'Title:' header
+    for line in (text or '').splitlines():
+        line = _BULLET.sub('', line.replace('\t', ' ')).strip()
+        if not line or line.startswith('```') or not _clean(line):
+            continue
+        match = _PRICE_TAIL.search(line)
+        name = line[:match.start()] if match else None
+        if match and _clean(name):
+            label = match.group(1).strip()
+            number = _NUMBER.search(label)
+            price = float(number.group().replace(',', '.')) if number else None
+            items.append(_item(category, _clean(name), price, label[:50], len(items)))
+            continue
+        header = _HEADER.match(line)
+        if header and len(line) <= 60:
+            category = _clean(next(g for g in header.groups() if g))[:100] or None
+            explicit = True
+            continue
+        opens_section = not explicit and (not items or items[-1]['category'] != category)
+        if len(line) <= 60 and (line.isupper() or opens_section):
+            category = _clean(line)[:100] or category
+            explicit = False
+        else:
+            items.append(_item(category, _clean(line), None, None, len(items)))
+    return items
+
+
+def sync_menu_items(session, MenuItem, company_id, menu_text):
+    """Replace a company's MenuItem rows with the items parsed from `menu_text` (caller commits)."""
+    session.execute(delete(MenuItem).where(MenuItem.company_id == company_id))
+    items = parse_menu_text(menu_text)
+    session.add_all([MenuItem(company_id=company_id, **item) for item in items])
+    return len(items)
+
+
+def menu_items_statement(MenuItem, company_id):
+    return select(
+        MenuItem.id, MenuItem.category, MenuItem.name, MenuItem.price, MenuItem.price_label, MenuItem.aliases,
+    ).where(MenuItem.company_id == company_id).order_by(MenuItem.position, MenuItem.id)
+
+
+# --- Normalization (French / Latin-script Darija / Arabic script) ---
+
+_ARABIC = {
+    'ا': 'a', 'أ': 'a', 'إ': 'i', 'آ': 'a', 'ء': '', 'ؤ': 'u', 'ئ': 'i', 'ب': 'b', 'ت': 't',
+    'ث': 't', 'ج': 'j', 'ح': 'h', 'خ': 'kh', 'د': 'd', 'ذ': 'd', 'ر': 'r', 'ز': 'z', 'س': 's',
+    'ش': 'ch', 'ص': 's', 'ض': 'd', 'ط': 't', 'ظ': 'd', 'ع': 'a', 'غ': 'gh', 'ف': 'f', 'ق': 'k',
+    'ك': 'k', 'ل': 'l', 'م': 'm', 'ن': 'n', 'ه': 'h', 'ة': 'a', 'و': 'u', 'ي': 'i', 'ى': 'a',
+    'ڤ': 'v', 'ݣ': 'g', 'گ': 'g', 'پ': 'p', 'ـ': '',
+}
+# Arabizi digits inside words: 3assir, 7rira, 9ahwa
+_ARABIZI = {'2': 'a', '3': 'a', '5': 'kh', '7': 'h', '8': 'gh', '9': 'k'}
+_SPELLING = (
+    (re.compile(r'ou'), 'u'), (re.compile(r'sh'), 'ch'), (re.compile(r'q'), 'k'),
+    (re.compile(r'ph'), 'f'), (re.compile(r'w'), 'u'), (re.compile(r'y'), 'i'),
+    (re.compile(r'ck'), 'k'), (re.compile(r'c(?=[aoukrl])'), 'k'), (re.compile(r'g(?=[ei])'), 'j'),
+    (re.compile(r'([a-z])\1+'), r'\1'),
+)
+_STOP_WORDS = {'le', 'la', 'les', 'de', 'du', 'des', 'au', 'aux', 'a', 'al', 'el', 'l', 'd', 'u', 'et'}
+
+
+def _transliterate(word):
+    if word.startswith('ال') and len(word) > 3:
+        word = word[2:]
+    return ''.join(_ARABIC.get(ch, ch) for ch in word)
+
+
+def normalize(text):
+    """Comparable spelling: lowercase, no accents, Arabic script and Arabizi digits in Latin letters."""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = ' '.join(_transliterate(word) for word in text.split())
+    text = re.sub(r'(?<=[a-z])[235789]|[235789](?=[a-z])', lambda m: _ARABIZI[m.group()], text)
+    text = re.sub(r"[^a-z0-9]+", ' ', text)
+    for pattern, replacement in _SPELLING:
+        text = pattern.sub(replacement, text)
+    return ' '.join(text.split())
+
+
+def tokens(text):
+    return [t for t in normalize(text).split() if t not in _STOP_WORDS]
+
+
+def skeleton(token):
+    """Consonant skeleton (vowels are the least stable part of a transliteration): harira/hrira -> hrr."""
+    return token[0] + re.sub(r'[aeiou]', '', token[1:]) if token else token
+
+
+# --- Search index ---
+
+class MenuIndex:
+    """
+    In-memory search over one company's menu: exact token, consonant
+    skeleton and prefix matches through inverted indexes, with a fuzzy
+    fallback for misheard names. Built once per company and cached.
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self._tokens = collections.defaultdict(set)
+        self._skeletons = collections.defaultdict(set)
+        self._names = []
+        self._categories = collections.defaultdict(list)
+        for i, entry in enumerate(self.entries):
+            names = [entry.name] + list(entry.aliases or ())
+            self._names.append([normalize(n) for n in names])
+            for name in names:
+                for token in tokens(name):
+                    self._tokens[token].add(i)
+                    self._skeletons[skeleton(token)].add(i)
+            if entry.category:
+                self._categories[' '.join(tokens(entry.category))].append(i)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _candidates(self, token):
+        """{index: score} for one query token."""
+        found = {i: 1.0 for i in self._tokens.get(token, ())}
+        for i in self._skeletons.get(skeleton(token), ()):
+            found.setdefault(i, 0.8)
+        if len(token) >= 3:
+            for known, indexes in self._tokens.items():
+                if known != token and known.startswith(token):
+                    for i in indexes:
+                        found.setdefault(i, 0.6)
+        return found
+
+    def search(self, query, limit=5):
+        """Best matching entries for `query`, best first (a category name returns its items)."""
+        query_tokens = tokens(query)
+        if not query_tokens:
+            return []
+        normalized = ' '.join(query_tokens)
+        category = self._categories.get(normalized)
+        if category:
+            return [self.entries[i] for i in category[:max(limit, 20)]]
+
+        scores = collections.defaultdict(float)
+        for token in query_tokens:
+            for i, score in self._candidates(token).items():
+                scores[i] += score / len(query_tokens)
+        if not scores:
+            # Misheard or misspelled: closest full names
+            for i, names in enumerate(self._names):
+                ratio = max(difflib.SequenceMatcher(None, normalized, name).ratio() for name in names)
+                if ratio >= 0.7:
+                    scores[i] = ratio
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.entries[item[0]].name))
+        return [self.entries[i] for i, score in ranked[:limit] if score >= 0.5]
+
+    def categories(self):
+        seen = []
+        for entry in self.entries:
+            if entry.category and entry.category not in seen:
+                seen.append(entry.category)
+        return seen
+
+
+def entry_to_dict(entry):
+    result = {'name': entry.name, 'category': entry.category, 'price': entry.price_label or entry.price}
+    if entry.aliases:
+        result['aliases'] = list(entry.aliases)
+    return result
+
+
+def _format_price(entry):
+    if entry.price_label:
+        return entry.price_label
+    if entry.price is None:
+        return ''
+    return f"{entry.price:g}"
+
+
+def serialize_menu(index, max_items=None):
+    """
+    Menu text for the system instruction. Small menus go in whole, one
+    compact line per category ("Plats: Tajine 50, Couscous 60"); larger
+    ones only list their categories, and the model looks items up with
+    `lookup_menu_item` during the call.
+    """
+    max_items = Config.MENU_PROMPT_MAX_ITEMS if max_items is None else max_items
+    grouped = collections.OrderedDict()
+    for entry in index.entries:
+        grouped.setdefault(entry.category or 'Menu', []).append(entry)
+    if len(index) <= max_items:
+        lines = []
+        for category, entries in grouped.items():
+            listed = ', '.join(f"{e.name} {_format_price(e)}".strip() for e in entries)
+            lines.append(f"{category}: {listed}")
+        return '\n'.join(lines)
+    summary = ', '.join(f"{category} ({len(entries)})" for category, entries in grouped.items())
+    return (f"{len(index)} items in these categories: {summary}. "
+            "Use 'lookup_menu_item' to check an item, its price or a category before confirming it.")
+
+
+# --- Per-company cache ---
+
+class MenuCatalogCache:
+    """
+    MenuIndex per company, built from its MenuItem rows on first use and
+    dropped whenever the company's menu changes (invalidation bus) or
+    after `ttl` seconds. A company without items caches an empty index.
+    """
+
+    def __init__(self, maxsize=512, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl is not None else Config.CALL_PROFILE_TTL
+        self._indexes = collections.OrderedDict()  # company_id -> (MenuIndex, built_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, company_id):
+        """Cached MenuIndex, or None when it must be loaded (see `put`)."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._indexes.get(company_id)
+            if cached is not None and now - cached[1] < self.ttl:
+                self._indexes.move_to_end(company_id)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+            return None
+
+    def put(self, company_id, rows):
+        """Build and cache the index from `menu_items_statement` rows."""
+        index = MenuIndex(
+            MenuEntry(row.id, row.category, row.name, row.price, row.price_label, tuple(row.aliases or ()))
+            for row in rows
+        )
+        with self._lock:
+            self._indexes[company_id] = (index, time.monotonic())
+            self._indexes.move_to_end(company_id)
+            while len(self._indexes) > self.maxsize:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, company_id=None):
+        with self._lock:
+            if company_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(company_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._indexes),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+menu_catalogs = MenuCatalogCache()
+
+on_change('company', lambda message: menu_catalogs.invalidate(message.get('company_id')))
+on_change('menu', lambda message: menu_catalogs.invalidate(message.get('company_id')))
+
+
+def lookup_menu_item(index, query, limit=5):
+    """Tool response for `lookup_menu_item`."""
+    if index is None or not len(index):
+        return {'status': 'no_menu', 'message': 'No structured menu; use the menu in your instructions.'}
+    matches = index.search(query or '', limit=limit)
+    if not matches:
+        return {'status': 'not_found', 'query': query, 'categories': index.categories()}
+    return {'status': 'success', 'items': [entry_to_dict(e) for e in matches]}
@@ -0,0 +1,188 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, Text,
+    func, literal, select, text, union_all,
+)
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Stack-neutral definition (Flask-SQLAlchemy and models_new both use it),
+# created by scripts/archive_orders.py. On Postgres the table is
+# range-partitioned by month on created_at, so the primary key includes it.
+archive_metadata = MetaData()
+
+orders_archive = Table(
+    'orders_archive', archive_metadata,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    Column('created_at', DateTime, primary_key=True),
+    Column('status', String(20)),
+    Column('order_detail', Text, nullable=False),
+    Column('customer_name', String(100)),
+    Column('customer_phone', String(20)),
+    Column('company_phone', String(20)),
+    Column('address', String(255)),
+    Column('company_id', Integer),
+    Column('archived_at', DateTime, default=datetime.utcnow),
+    postgresql_partition_by='RANGE (created_at)',
+)
+
+ARCHIVED_COLUMNS = (
+    'id', 'created_at', 'status', 'order_detail', 'customer_name',
+    'customer_phone', 'company_phone', 'address', 'company_id',
+)
+
+# Completed orders past the horizon, unless a demand still points at them
+_ELIGIBLE = """
+    FROM orders o
+    WHERE o.status = 'termine' AND o.created_at < :cutoff
+      AND NOT EXISTS (SELECT 1 FROM demands d WHERE d.order_id = o.id)
+"""
+
+
+def _month_start(ts):
+    return datetime(ts.year, ts.month, 1)
+
+
+def _next_month(ts):
+    return (ts.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month):
+    return f"orders_archive_{month:%Y_%m}"
+
+
+def ensure_partitions(conn, first, last):
+    """Create the monthly partitions covering [first, last] (Postgres only)."""
+    month = _month_start(first)
+    while month <= last:
+        upper = _next_month(month)
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF orders_archive "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+        month = upper
+
+
+def eligible_count(conn, horizon_days=None):
+    cutoff = datetime.utcnow() - timedelta(days=horizon_days or Config.ORDER_ARCHIVE_HORIZON_DAYS)
+    return conn.execute(text(f"SELECT count(*) {_ELIGIBLE}"), {'cutoff': cutoff}).scalar()
+
+
+def archive_orders(engine, horizon_days=None, batch_size=None, max_batches=None):
+    """
+    Move completed orders older than `horizon_days` from `orders` into
+    `orders_archive`, `batch_size` rows per transaction so the hot table is
+    never locked for long. Orders referenced by a demand stay live.
+    Returns the number of orders moved.
+    """
+    horizon_days = horizon_days or Config.ORDER_ARCHIVE_HORIZON_DAYS
+    batch_size = batch_size or Config.ORDER_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=horizon_days)
+    columns = ', '.join(ARCHIVED_COLUMNS)
+    is_postgres = engine.dialect.name == 'postgresql'
+
+    with engine.begin() as conn:
+        first, last = conn.execute(
+            text(f"SELECT min(o.created_at), max(o.created_at) {_ELIGIBLE}"), {'cutoff': cutoff}
+        ).one()
+        if first is None:
+            return 0
+        if is_postgres:
+            ensure_partitions(conn, first, last)
+
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with engine.begin() as conn:
+            if is_postgres:
+                # One statement: the rows leave `orders` and land in the archive atomically
+                count = conn.execute(text(f"""
+                    WITH batch AS (
+                        SELECT o.id {_ELIGIBLE}
+                        ORDER BY o.id LIMIT :batch FOR UPDATE SKIP LOCKED
+                    ), moved AS (
+                        DELETE FROM orders WHERE id IN (SELECT id FROM batch)
+                        RETURNING {columns}
+                    ), inserted AS (
+                        INSERT INTO orders_archive ({columns}, archived_at)
+                        SELECT {columns}, now() AT TIME ZONE 'utc' FROM moved
+                        RETURNING 1
+                    )
+                    SELECT count(*) FROM inserted
+                """), {'cutoff': cutoff, 'batch': batch_size}).scalar()
+            else:
+                ids = [row[0] for row in conn.execute(
+                    text(f"SELECT o.id {_ELIGIBLE} ORDER BY o.id LIMIT :batch"),
+                    {'cutoff': cutoff, 'batch': batch_size},
+                )]
+                count = len(ids)
+                if ids:
+                    params = {f'id{i}': order_id for i, order_id in enumerate(ids)}
+                    id_list = ', '.join(f':id{i}' for i in range(len(ids)))
+                    conn.execute(text(
+                        f"INSERT INTO orders_archive ({columns}, archived_at) "
+                        f"SELECT {columns}, CURRENT_TIMESTAMP FROM orders WHERE id IN ({id_list})"
+                    ), params)
+                    conn.execute(text(f"DELETE FROM orders WHERE id IN ({id_list})"), params)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        logger.info(f"📦 Archived {moved} orders so far")
+    return moved
+
+
+def customer_history_statement(Order, Company, phone, limit=20):
+    """
+    A caller's newest orders across the live table and the archive (UNION
+    ALL), in the Order.to_dict() shape plus an `archived` flag. Each branch
+    is limited first, so both are short (customer_phone, created_at) index
+    scans.
+    """
+    archive = orders_archive.c
+    live = select(
+        Order.id,
+        Order.status,
+        Order.order_detail,
+        Order.customer_name,
+        Order.customer_phone,
+        func.coalesce(Company.phone_number, Order.company_phone).label('company_phone'),
+        Order.address,
+        Order.created_at,
+        literal(False).label('archived'),
+    ).outerjoin(Company, Company.id == Order.company_id).where(Order.customer_phone == phone) \
+        .order_by(Order.created_at.desc()).limit(limit)
+
+    archived = select(
+        archive.id,
+        archive.status,
+        archive.order_detail,
+        archive.customer_name,
+        archive.customer_phone,
+        func.coalesce(Company.phone_number, archive.company_phone).label('company_phone'),
+        archive.address,
+        archive.created_at,
+        literal(True).label('archived'),
+    ).outerjoin(Company, Company.id == archive.company_id).where(archive.customer_phone == phone) \
+        .order_by(archive.created_at.desc()).limit(limit)
+
+    both = union_all(live.subquery().select(), archived.subquery().select()).subquery()
+    return select(both).order_by(both.c.created_at.desc(), both.c.id.desc()).limit(limit)
+
+
+def history_row_to_dict(row):
+    return {
+        'id': row.id,
+        'status': row.status,
+        'order_detail': row.order_detail,
+        'customer_name': row.customer_name,
+        'customer_phone': row.customer_phone,
+        'company_phone': row.company_phone,
+        'address': row.address,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'archived': bool(row.archived),
+    }
@@ -0,0 +1,174 @@
+import asyncio
+import collections
+import inspect
+import time
+
+from config.config import Config
+
+FRAME_MS = 20
+FRAME_BYTES = 640  # 20 ms of 16 kHz 16-bit mono L16, what Vonage expects
+STEADY_FRAMES = 250  # 5 s without an underrun before the jitter buffer shrinks a step
+
+
+class OutboundPacer:
+    """
+    Per-call scheduler for audio going back to Vonage. Gemini's bursty,
+    variable-size chunks are re-cut into exact 20 ms frames and sent one
+    per tick of a monotonic clock. Each talkspurt starts once a small
+    jitter buffer has filled; the buffer grows a frame after every
+    underrun (up to the max) and shrinks again after a steady stretch.
+
+    `write()` and `end_turn()` are called from the Gemini receive loop,
+    `run()` is the playout task; all three on the same event loop.
+    `send(frame)` may be a plain or an async function.
+    """
+
+    def __init__(self, send, min_ms=None, max_ms=None, capacity_ms=None,
+                 frame_ms=FRAME_MS, frame_bytes=FRAME_BYTES):
+        self._send = send
+        self.frame_ms = frame_ms
+        self.frame_bytes = frame_bytes
+        self.min_frames = max(1, (min_ms or Config.VOICE_OUTBOUND_JITTER_MIN_MS) // frame_ms)
+        self.max_frames = max(self.min_frames, (max_ms or Config.VOICE_OUTBOUND_JITTER_MAX_MS) // frame_ms)
+        self.capacity = max(self.max_frames, (capacity_ms or Config.VOICE_OUTBOUND_BUFFER_MS) // frame_ms)
+        self.target = self.min_frames
+        self._frames = collections.deque()
+        self._partial = bytearray()
+        self._wakeup = asyncio.Event()
+        self._turn_done = False
+        self._closed = False
+        self._steady = 0
+        self._playing_until = 0.0  # When the audio already sent finishes playing
+
+        # Counters
+        self.frames_in = 0
+        self.frames_out = 0
+        self.high_water = 0
+        self.underruns = 0  # Ran dry mid-turn (Gemini fell behind real time)
+        self.overruns = 0   # Frames dropped because the buffer was full
+        self.late = 0       # Clock resyncs after the loop stalled
+        self.flushes = 0
+        self.flushed_frames = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def _push(self, frame):
+        if len(self._frames) >= self.capacity:
+            self._frames.popleft()
+            self.overruns += 1
+        self._frames.append(frame)
+        self.frames_in += 1
+        if len(self._frames) > self.high_water:
+            self.high_water = len(self._frames)
+
+    def write(self, data):
+        """Queue 16 kHz PCM of any length; whole frames become playable at once."""
+        if self._closed or not data:
+            return
+        self._turn_done = False
+        self._partial += data
+        whole = len(self._partial) - len(self._partial) % self.frame_bytes
+        for start in range(0, whole, self.frame_bytes):
+            self._push(bytes(self._partial[start:start + self.frame_bytes]))
+        del self._partial[:whole]
+        self._wakeup.set()
+
+    def end_turn(self):
+        """Gemini finished speaking: pad the last partial frame with silence and play it out."""
+        if self._partial:
+            self._push(bytes(self._partial) + bytes(self.frame_bytes - len(self._partial)))
+            self._partial.clear()
+        self._turn_done = True
+        self._wakeup.set()
+
+    @property
+    def tail_ms(self):
+        """Audio already handed to Vonage that has not finished playing yet."""
+        return max(0, round((self._playing_until - time.monotonic()) * 1000))
+
+    def flush(self):
+        """
+        Barge-in: drop every queued frame and the partial one, so playout
+        stops after the frame already on the wire. Returns the ms of audio
+        dropped.
+        """
+        dropped = len(self._frames) + (1 if self._partial else 0)
+        self._frames.clear()
+        self._partial.clear()
+        self._turn_done = True  # Not an underrun
+        self.flushes += 1
+        self.flushed_frames += dropped
+        self._wakeup.set()
+        return dropped * self.frame_ms
+
+    def close(self):
+        """Stop playout; whatever is still queued is dropped."""
+        self._closed = True
+        self._wakeup.set()
+
+    async def _prebuffer(self):
+        """
+        Wait for `target` frames, the end of the turn, or `target` frames'
+        worth of time since audio started arriving, whichever comes first.
+        Returns False once closed.
+        """
+        started = None
+        while not self._closed:
+            timeout = None
+            if self._frames:
+                if started is None:
+                    started = time.monotonic()
+                if len(self._frames) >= self.target or self._turn_done:
+                    return True
+                timeout = started + self.target * self.frame_ms / 1000 - time.monotonic()
+                if timeout <= 0:
+                    return True
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def run(self):
+        """Playout loop; returns after close(). Errors from `send` propagate."""
+        period = self.frame_ms / 1000
+        while await self._prebuffer():
+            due = time.monotonic()
+            while self._frames and not self._closed:
+                result = self._send(self._frames.popleft())
+                if inspect.isawaitable(result):
+                    await result
+                self.frames_out += 1
+                self._steady += 1
+                if self._steady >= STEADY_FRAMES and self.target > self.min_frames:
+                    self.target -= 1
+                    self._steady = 0
+                due += period
+                self._playing_until = due
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -self.max_frames * period:
+                    # Stalled longer than the jitter buffer: resync rather than burst to catch up
+                    self.late += 1
+                    due = time.monotonic()
+            if not self._closed and not self._turn_done:
+                self.underruns += 1
+                self._steady = 0
+                self.target = min(self.max_frames, self.target + 1)
+
+    def stats(self):
+        return {
+            'depth': len(self._frames),
+            'target_ms': self.target * self.frame_ms,
+            'high_water': self.high_water,
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'underruns': self.underruns,
+            'overruns': self.overruns,
+            'late': self.late,
+            'flushes': self.flushes,
+            'flushed_ms': self.flushed_frames * self.frame_ms,
+        }
@@ -0,0 +1,299 @@
+import collections
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+import uuid
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process delivery: every publish reaches this process's subscribers only."""
+
+    def __init__(self):
+        self._subs = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, payload):
+        with self._lock:
+            callbacks = list(self._subs[channel])
+        for callback in callbacks:
+            callback(payload)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subs[channel].append(callback)
+
+    def close(self):
+        with self._lock:
+            self._subs.clear()
+
+
+class LocalSocketBackend:
+    """
+    UDP multicast on 127.0.0.1: every process on this host that subscribed
+    receives every message, including the publisher itself. The listener is
+    bound to the group address (not every interface) and drops datagrams
+    from non-loopback sources, so other hosts cannot inject messages.
+    """
+
+    def __init__(self, group='239.255.77.77', port=47777):
+        self.group = group
+        self.port = port
+        self._subs = collections.defaultdict(list)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self._send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 0)
+        self._send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self._send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton('127.0.0.1'))
+
+    def publish(self, channel, payload):
+        message = json.dumps({'c': channel, 'p': payload}).encode('utf-8')
+        self._send_sock.sendto(message, (self.group, self.port))
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subs[channel].append(callback)
+            if self._thread is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if hasattr(socket, 'SO_REUSEPORT'):
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                sock.bind((self.group, self.port))
+                membership = struct.pack('4s4s', socket.inet_aton(self.group), socket.inet_aton('127.0.0.1'))
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+                self._thread = threading.Thread(target=self._listen, args=(sock,), name='pubsub-local', daemon=True)
+                self._thread.start()
+
+    def _listen(self, sock):
+        while not self._closed:
+            try:
+                data, (source, _) = sock.recvfrom(65535)
+                if not source.startswith('127.'):
+                    logger.warning(f"⚠️ Local pubsub: dropped datagram from non-local {source}")
+                    continue
+                message = json.loads(data.decode('utf-8'))
+            except Exception as e:
+                logger.warning(f"Local pubsub receive error: {e}")
+                continue
+            with self._lock:
+                callbacks = list(self._subs.get(message['c'], ()))
+            for callback in callbacks:
+                callback(message['p'])
+
+    def close(self):
+        self._closed = True
+        self._send_sock.close()
+
+
+class PostgresBackend:
+    """
+    Postgres LISTEN/NOTIFY. One listening connection per process, driven by
+    a background thread that reconnects with backoff. `publish` only queues
+    the NOTIFY: a sender thread runs it on its own autocommit connection, so
+    callers on an event loop (FastAPI handlers, live voice sessions) never
+    wait on a database round trip. Payloads must stay under 8000 bytes.
+    """
+
+    def __init__(self, dsn, max_pending=1000):
+        self.dsn = dsn
+        self._subs = collections.defaultdict(list)
+        self._lock = threading.Lock()
+        self._publish_conn = None
+        self._outbox = queue.Queue(maxsize=max_pending)
+        self._sender = None
+        self._sender_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.dropped = 0
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def publish(self, channel, payload):
+        """Queue a NOTIFY (never blocks; dropped with a warning if the sender is far behind)."""
+        if self._sender is None:
+            with self._sender_lock:
+                if self._sender is None:
+                    self._sender = threading.Thread(target=self._send_loop, name='pubsub-notify', daemon=True)
+                    self._sender.start()
+        try:
+            self._outbox.put_nowait((channel, payload))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"NOTIFY on {channel} dropped: {self._outbox.maxsize} messages pending")
+
+    def _drop_publish_conn(self):
+        conn, self._publish_conn = self._publish_conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _notify(self, channel, payload):
+        for attempt in range(2):
+            try:
+                if self._publish_conn is None or self._publish_conn.closed:
+                    self._publish_conn = self._connect()
+                with self._publish_conn.cursor() as cur:
+                    cur.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+                return
+            except Exception as e:
+                logger.warning(f"NOTIFY on {channel} failed (attempt {attempt + 1}): {e}")
+                self._drop_publish_conn()
+
+    def _send_loop(self):
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                break
+            self._notify(*item)
+        self._drop_publish_conn()
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subs[channel].append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='pubsub-postgres', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        backoff = 1
+        while not self._closed:
+            conn = None
+            try:
+                conn = self._connect()
+                listening = set()
+                backoff = 1
+                while not self._closed:
+                    with self._lock:
+                        channels = set(self._subs)
+                    for channel in channels - listening:
+                        with conn.cursor() as cur:
+                            cur.execute(f'LISTEN "{channel}"')
+                        listening.add(channel)
+
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        with self._lock:
+                            callbacks = list(self._subs.get(notify.channel, ()))
+                        for callback in callbacks:
+                            callback(notify.payload)
+            except Exception as e:
+                logger.warning(f"LISTEN connection lost, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def close(self):
+        self._closed = True
+        if self._sender is not None:
+            # Sent after whatever is already queued; the sender closes its connection
+            self._outbox.put(None)
+
+
+def create_backend(name=None):
+    """Backend from PUBSUB_BACKEND ('postgres', 'local', 'memory'); defaults to Postgres when configured."""
+    name = name or Config.PUBSUB_BACKEND
+    dsn = Config.SQLALCHEMY_DATABASE_URI
+    if not name:
+        name = 'postgres' if dsn and dsn.startswith('postgresql') else 'memory'
+    if name == 'postgres':
+        return PostgresBackend(dsn)
+    if name == 'local':
+        return LocalSocketBackend(port=Config.PUBSUB_LOCAL_PORT)
+    return MemoryBackend()
+
+
+class Bus:
+    """
+    JSON messages over a backend, tagged with this process's origin id.
+    Handlers run on the backend's listener thread (inline for MemoryBackend)
+    and must be thread-safe and quick.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def publish(self, channel, message):
+        payload = json.dumps({'origin': self.origin, 'msg': message})
+        self.backend.publish(channel, payload)
+        self.published += 1
+
+    def subscribe(self, channel, handler, skip_own=False):
+        """`handler(message)`; with `skip_own` messages published by this process are ignored."""
+        def callback(payload):
+            try:
+                data = json.loads(payload)
+                if skip_own and data.get('origin') == self.origin:
+                    return
+                self.received += 1
+                handler(data['msg'])
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Bus handler error on {channel}: {e}")
+        self.backend.subscribe(channel, callback)
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'origin': self.origin,
+            'published': self.published,
+            'received': self.received,
+            'errors': self.errors,
+        }
+
+
+_bus = None
+_bus_pid = None
+_bus_lock = threading.RLock()
+_on_start = []
+
+
+def on_bus_start(setup):
+    """Register `setup(bus)`, run once for each process's bus (e.g. to subscribe)."""
+    _on_start.append(setup)
+    with _bus_lock:
+        if _bus is not None and _bus_pid == os.getpid():
+            setup(_bus)
+
+
+def get_bus():
+    """This process's bus; created (and re-created after a fork) on first use."""
+    global _bus, _bus_pid
+    if _bus is not None and _bus_pid == os.getpid():
+        return _bus
+    with _bus_lock:
+        if _bus is None or _bus_pid != os.getpid():
+            _bus = Bus(create_backend())
+            _bus_pid = os.getpid()
+            for setup in _on_start:
+                setup(_bus)
+        return _bus
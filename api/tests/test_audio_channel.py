@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+from services.audio_channel import AudioChannel
+
+
+def test_full_channel_drops_the_oldest_frame():
+    channel = AudioChannel(maxsize=3)
+    for i in range(5):
+        assert channel.put_nowait(i)
+    assert len(channel) == 3
+    assert channel.stats()['dropped'] == 2 and channel.high_water == 3
+
+    async def drain():
+        channel.close()
+        return [frame async for frame in _frames(channel)]
+
+    assert asyncio.run(drain()) == [2, 3, 4]
+    assert not channel.put_nowait(5)
+
+
+async def _frames(channel):
+    while True:
+        frame = await channel.get()
+        if frame is None:
+            return
+        yield frame
+
+
+def test_writer_thread_wakes_the_reader_without_polling():
+    channel = AudioChannel()
+
+    def writer():
+        for i in range(3):
+            time.sleep(0.02)
+            channel.put_nowait(i)
+        channel.close()
+
+    async def read():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        started = time.monotonic()
+        frames = [frame async for frame in _frames(channel)]
+        thread.join()
+        return frames, time.monotonic() - started
+
+    frames, elapsed = asyncio.run(read())
+    assert frames == [0, 1, 2]
+    assert elapsed < 1
+    assert channel.stats()['frames_out'] == 3
+
+
+def test_async_put_waits_for_room_before_dropping():
+    async def run():
+        channel = AudioChannel(maxsize=1)
+        await channel.put('a')
+
+        async def reader():
+            await asyncio.sleep(0.01)
+            return await channel.get()
+
+        task = asyncio.create_task(reader())
+        # Full: waits for the reader instead of dropping 'a'
+        await channel.put('b', timeout=1)
+        assert await task == 'a'
+        # Nobody reads: falls back to drop-oldest after the timeout
+        await channel.put('c', timeout=0.01)
+        return channel
+
+    channel = asyncio.run(run())
+    assert channel.backpressure_waits == 2
+    assert channel.dropped == 1
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from utils.audio import (
+    DCBlocker, FrameAssembler, PolyphaseResampler, byteswap16, byteswap16_inplace, mean, rms, samples, to_pcm16,
+)
+
+
+def _tone(freq, rate, seconds=0.5, amplitude=8000, offset=0):
+    t = np.arange(int(rate * seconds)) / rate
+    return to_pcm16(offset + amplitude * np.sin(2 * np.pi * freq * t))
+
+
+def _level(buf, skip=0):
+    """RMS of the steady part (past the filter's start-up)."""
+    x = samples(buf)[skip:].astype(np.float64)
+    return float(np.sqrt(np.mean(x * x)))
+
+
+def test_pcm_helpers():
+    buf = to_pcm16([1000, -1000, 40000, -40000])
+    assert list(samples(buf)) == [1000, -1000, 32767, -32768]
+    assert byteswap16(byteswap16(buf)) == buf
+    assert samples(byteswap16(to_pcm16([1])))[0] == 256
+    assert rms(to_pcm16([300] * 160)) == 300 and rms(b'') == 0
+    assert mean(to_pcm16([100, 300])) == 200
+
+
+def test_resampler_output_length_follows_the_ratio():
+    resampler = PolyphaseResampler(24000, 16000)
+    assert len(resampler.process(bytes(960))) == 640  # 20 ms in, 20 ms out
+    assert len(PolyphaseResampler(8000, 16000).process(bytes(320))) == 640
+
+
+def test_resampler_chunking_does_not_change_the_output():
+    audio = _tone(440, 24000)
+    whole = PolyphaseResampler(24000, 16000).process(audio)
+
+    chunked = PolyphaseResampler(24000, 16000)
+    out, pos = [], 0
+    # Uneven chunks, including odd byte counts that split a sample
+    for size in (7, 960, 333, 2048, 1, 4095):
+        out.append(chunked.process(audio[pos:pos + size]))
+        pos += size
+    out.append(chunked.process(audio[pos:]))
+    assert b''.join(out) == whole
+
+
+def test_resampler_keeps_the_passband_and_rejects_aliases():
+    passband = PolyphaseResampler(24000, 16000).process(_tone(1000, 24000))
+    assert _level(passband, skip=64) == pytest.approx(8000 / np.sqrt(2), rel=0.02)
+    # 10 kHz is above the 8 kHz output Nyquist: it would fold back to 6 kHz (kept 30 dB down)
+    alias = PolyphaseResampler(24000, 16000).process(_tone(10000, 24000))
+    assert _level(alias, skip=64) < 8000 / np.sqrt(2) * 0.03
+
+
+def test_resampler_reset_starts_a_fresh_stream():
+    resampler = PolyphaseResampler(24000, 16000)
+    first = resampler.process(_tone(440, 24000, seconds=0.02))
+    resampler.process(_tone(3000, 24000, seconds=0.013))
+    resampler.reset()
+    assert resampler.process(_tone(440, 24000, seconds=0.02)) == first
+
+
+def test_dc_blocker_removes_the_offset_without_frame_steps():
+    blocker = DCBlocker(rate=16000, tau=0.05)
+    audio = _tone(300, 16000, seconds=1.0, amplitude=4000, offset=2000)
+    frames = [blocker.process(audio[i:i + 640]) for i in range(0, len(audio), 640)]
+    tail = b''.join(frames[-10:])
+    assert abs(mean(tail)) < 50
+    assert _level(tail) == pytest.approx(4000 / np.sqrt(2), rel=0.05)
+    # Ramped between estimates: no jump bigger than the tone's own slope at boundaries
+    joined = samples(b''.join(frames)).astype(np.int32)
+    max_slope = 4000 * 2 * np.pi * 300 / 16000
+    assert np.abs(np.diff(joined[3200:])).max() < max_slope * 1.2
+
+
+def test_dc_blocker_in_place_matches_the_copy():
+    audio = _tone(300, 16000, seconds=0.2, amplitude=4000, offset=-1500)
+    copying, in_place = DCBlocker(), DCBlocker()
+    for i in range(0, len(audio), 640):
+        frame = bytearray(audio[i:i + 640])
+        expected = copying.process(frame)
+        assert in_place.process_inplace(frame) is frame
+        assert bytes(frame) == expected
+    assert copying.offset == pytest.approx(in_place.offset)
+
+
+def test_frame_assembler_cuts_unaligned_writes_into_frames():
+    assembler = FrameAssembler(frame_bytes=8, slots=4)
+    stream = bytes(range(40))
+    frames = []
+    for size in (3, 5, 11, 1, 13, 7):
+        frames += [bytes(frame) for frame in assembler.write(stream[:size])]
+        stream = stream[size:]
+    assert frames == [bytes(range(i, i + 8)) for i in range(0, 40, 8)]
+    assert assembler.frames == 5 and assembler.pending == 0
+
+    assert list(assembler.write(b'abc')) == [] and assembler.pending == 3
+    assembler.reset()
+    assert [bytes(f) for f in assembler.write(b'12345678')] == [b'12345678']
+
+
+def test_frame_assembler_frames_are_writable_ring_slots():
+    assembler = FrameAssembler(frame_bytes=4, slots=2)
+    views = []
+    for frame in assembler.write(to_pcm16([1, 2, 3, 4])):
+        byteswap16_inplace(frame)  # Transformed in place, no copy
+        views.append(frame)
+    assert list(samples(views[0], '>')) == [1, 2]
+    assert list(samples(views[1], '>')) == [3, 4]
+    # Two slots: the third frame reuses the first one
+    third = next(assembler.write(to_pcm16([5, 6])))
+    assert third.obj is views[0].obj
+    assert list(samples(views[0])) == [5, 6]
+
+
+def test_frame_assembler_rejects_partial_samples():
+    with pytest.raises(ValueError):
+        FrameAssembler(frame_bytes=641)
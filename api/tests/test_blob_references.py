@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from services.image_pipeline import referenced_keys_statement, variant_keys
+
+Base = declarative_base()
+
+
+class MenuImage(Base):
+    __tablename__ = 'menu_images'
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64))
+    thumb_hash = Column(String(64))
+    model_hash = Column(String(64))
+
+
+def _referenced(rows, keys):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(rows)
+        session.commit()
+        return set(session.execute(referenced_keys_statement(MenuImage, keys)).scalars())
+
+
+def test_variant_keys_skip_missing_variants():
+    image = MenuImage(content_hash='orig', thumb_hash=None, model_hash='orig')
+    assert variant_keys(image) == {'orig'}
+
+
+def test_every_variant_column_counts_as_a_reference():
+    keys = {'orig', 'thumb', 'model'}
+    assert _referenced([], keys) == set()
+    assert _referenced([MenuImage(content_hash='orig')], keys) == {'orig'}
+    # A different original whose derived variants hash the same still holds them
+    assert _referenced([MenuImage(content_hash='other', thumb_hash='thumb')], keys) == {'thumb'}
+    assert _referenced([MenuImage(content_hash='other', model_hash='model')], keys) == {'model'}
+    # An original re-uploaded as another image's model variant (already small JPEG)
+    assert _referenced([MenuImage(content_hash='x', model_hash='orig')], keys) == {'orig'}
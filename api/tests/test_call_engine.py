@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+from services.call_engine import CallEngine, CallHandle, CallMetrics
+
+
+def test_outbound_frames_are_sent_by_the_websocket_side():
+    handle = CallHandle(None, 'call', CallMetrics('call'), outbound_frames=3)
+    sent = []
+    release = threading.Event()
+
+    def slow_send(frame):
+        release.wait(2)
+        sent.append(frame)
+
+    # The engine side never blocks, even with the socket stuck: extra frames are dropped
+    started = time.monotonic()
+    for i in range(5):
+        handle.send_audio(bytes([i]) * 640)
+    assert time.monotonic() - started < 0.1
+    assert handle.metrics.frames_out_dropped == 2
+
+    writer = threading.Thread(target=handle.drain_outbound, args=(slow_send,))
+    writer.start()
+    release.set()
+    deadline = time.monotonic() + 2
+    while len(sent) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    handle.hangup()
+    writer.join(2)
+    assert [frame[0] for frame in sent] == [0, 1, 2]
+    assert handle.metrics.frames_out == 3
+    assert handle.metrics.first_audio_out_at is not None
+
+
+def test_send_error_stops_the_call():
+    handle = CallHandle(None, 'call', CallMetrics('call'))
+
+    def broken(frame):
+        raise ConnectionError("closed")
+
+    handle.send_audio(bytes(640))
+    handle.drain_outbound(broken)
+    assert handle.stop_event.is_set()
+
+
+def test_reused_call_id_keeps_both_calls_registered():
+    engine = CallEngine(max_calls=5)
+    release = {}
+
+    def run_call(name):
+        async def run(handle):
+            release[name] = asyncio.Event()
+            await release[name].wait()
+        return run
+
+    def wait_for(condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    first = engine.start_call(run_call('first'), call_id='same')
+    wait_for(lambda: 'first' in release)
+    second = engine.start_call(run_call('second'), call_id='same')
+    wait_for(lambda: 'second' in release)
+    assert engine.stats()['active_calls'] == 2
+
+    # The first call ending must not unregister the second
+    engine._loop.call_soon_threadsafe(release['first'].set)
+    first._future.result(2)
+    assert engine.stats()['active_calls'] == 1
+    assert not second.stop_event.is_set()
+
+    engine._loop.call_soon_threadsafe(release['second'].set)
+    second._future.result(2)
+    assert engine.stats()['active_calls'] == 0
@@ -0,0 +1,59 @@
+import types
+
+from services.call_profile import CallProfile, CallProfileCache, invalidate_call_profiles
+
+
+def _cache(**kwargs):
+    builds = []
+
+    def build(company, menu_index=None):
+        builds.append((company.id if company else None, menu_index))
+        return CallProfile('Puck', f"prompt {len(builds)}", {}, ('model', 'Puck', len(builds)))
+
+    return CallProfileCache(build, **kwargs), builds
+
+
+def _company(company_id):
+    return types.SimpleNamespace(id=company_id)
+
+
+def test_profile_is_built_once_per_company():
+    cache, builds = _cache(ttl=60)
+    first = cache.get(_company(1), 'menu')
+    assert cache.get(_company(1), 'menu') is first
+    assert cache.get(_company(2)) is not first
+    assert cache.get(None) is cache.get(None)  # Unknown numbers share one default profile
+    assert builds == [(1, 'menu'), (2, None), (None, None)]
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 3
+
+
+def test_edits_invalidate_the_company_in_every_cache():
+    cache, builds = _cache(ttl=60)
+    other, _ = _cache(ttl=60)
+    first = cache.get(_company(1))
+    kept = cache.get(_company(2))
+    other.get(_company(1))
+
+    invalidate_call_profiles(1)
+    assert cache.get(_company(1)) is not first
+    assert cache.get(_company(2)) is kept
+    assert other.stats()['size'] == 0
+
+    invalidate_call_profiles()
+    assert cache.stats()['size'] == 0
+
+
+def test_ttl_and_size_bound_the_cache():
+    cache, builds = _cache(ttl=0)
+    cache.get(_company(1))
+    cache.get(_company(1))
+    assert len(builds) == 2
+
+    cache, builds = _cache(ttl=60, maxsize=2)
+    for company_id in (1, 2, 1, 3):
+        cache.get(_company(company_id))
+    # 2 was the least recently used
+    assert cache.stats()['size'] == 2
+    cache.get(_company(1))
+    cache.get(_company(2))
+    assert builds == [(1, None), (2, None), (3, None), (2, None)]
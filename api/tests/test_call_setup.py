@@ -0,0 +1,48 @@
+import asyncio
+import uuid
+
+from services.call_setup import CallSetupRegistry, is_vonage_uuid
+
+
+class FakePrepared:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_reserve_refused_past_max_pending():
+    async def run():
+        registry = CallSetupRegistry(timeout=60, max_pending=3)
+        started = []
+
+        async def prepare():
+            started.append(1)
+            return FakePrepared()
+
+        ids = [str(uuid.uuid4()) for _ in range(4)]
+        results = [registry.reserve(call_id, prepare) for call_id in ids]
+        await asyncio.sleep(0)
+        assert results == [True, True, True, False]
+        assert len(started) == 3
+        assert registry.stats()['pending'] == 3
+        assert registry.stats()['refused'] == 1
+        assert registry.claim(ids[3]) is None
+
+        # A claimed setup frees its slot
+        assert registry.claim(ids[0]) is not None
+        assert registry.reserve(ids[3], prepare) is True
+
+        for call_id in ids[1:]:
+            registry.claim(call_id).cancel()
+
+    asyncio.run(run())
+
+
+def test_is_vonage_uuid():
+    assert is_vonage_uuid('63f61863-4a51-4f6b-86e1-46edebcf9356')
+    assert is_vonage_uuid(str(uuid.uuid4()).upper())
+    assert not is_vonage_uuid(uuid.uuid4().hex)
+    assert not is_vonage_uuid('x' * 36)
+    assert not is_vonage_uuid(None)
+    assert not is_vonage_uuid('')
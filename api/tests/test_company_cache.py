@@ -0,0 +1,70 @@
+import time
+import types
+
+from services.company_cache import CompanyCache, CompanySnapshot, company_cache, company_changed
+
+
+def _company(company_id=1, phone='212500000001', **fields):
+    values = dict(id=company_id, name='Dar Tajine', phone_number=phone, system_prompt=None, menu='Harira 15',
+                  agent_on=True, voice='Puck', vad_mode=None, vad_threshold=None)
+    values.update(fields)
+    return types.SimpleNamespace(**values)
+
+
+def test_snapshot_copies_the_model():
+    snapshot = CompanySnapshot.from_model(_company(menu='Tajine 60'))
+    assert snapshot.menu == 'Tajine 60' and snapshot.id == 1
+    # A Company model without the VAD columns means "platform default"
+    legacy = types.SimpleNamespace(**{k: v for k, v in vars(_company()).items() if not k.startswith('vad_')})
+    assert CompanySnapshot.from_model(legacy).vad_mode is None
+
+
+def test_hits_misses_and_negative_entries():
+    cache = CompanyCache(ttl=60, negative_ttl=60)
+    loads = []
+
+    def load(phone):
+        loads.append(phone)
+        return _company(phone=phone) if phone.endswith('1') else None
+
+    assert cache.get_or_load('212500000001', load).name == 'Dar Tajine'
+    assert cache.get_or_load('212500000001', load).name == 'Dar Tajine'
+    assert cache.get_or_load('212500000009', load) is None
+    assert cache.get_or_load('212500000009', load) is None
+    assert loads == ['212500000001', '212500000009']
+    stats = cache.stats()
+    assert (stats['hits'], stats['negative_hits'], stats['misses']) == (1, 1, 2)
+
+
+def test_entries_expire_and_the_lru_is_bounded():
+    cache = CompanyCache(maxsize=2, ttl=60, negative_ttl=0)
+    cache.put('unknown', None)
+    time.sleep(0.001)
+    assert cache.lookup('unknown') == (False, None)
+
+    for phone in ('a', 'b', 'a', 'c'):
+        cache.put(phone, _company(phone=phone))
+    assert cache.lookup('b') == (False, None)
+    assert cache.lookup('a')[0] and cache.lookup('c')[0]
+
+
+def test_invalidation_by_company_and_by_phone():
+    cache = CompanyCache(ttl=60, negative_ttl=60)
+    cache.put('one', _company(1, 'one'))
+    cache.put('alias', _company(1, 'alias'))
+    cache.put('two', _company(2, 'two'))
+    cache.put('new', None)
+
+    cache.invalidate(company_id=1, phones=('new',))
+    assert [cache.lookup(p)[0] for p in ('one', 'alias', 'two', 'new')] == [False, False, True, False]
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
+
+
+def test_company_changed_drops_the_shared_entry():
+    company_cache.put('212500000042', _company(42, '212500000042'))
+    company_cache.put('212500000043', None)
+    # A number just assigned to the company loses its negative entry too
+    company_changed(42, '212500000043')
+    assert company_cache.lookup('212500000042') == (False, None)
+    assert company_cache.lookup('212500000043') == (False, None)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from extensions import db
+from models.models import Company, Demand, Order
+from services.dashboard import (
+    build_dashboard, build_demands, dashboard_statement, decode_cursor, demands_statement, encode_cursor,
+)
+
+NOW = datetime(2026, 10, 1, 12, 0)
+
+
+@pytest.fixture
+def session(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'db.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Company(id=1, name='Dar Tajine', phone_number='212500000001'),
+                            Company(id=2, name='Pizza Atlas', phone_number='212500000002')])
+        db.session.commit()
+        yield db.session
+
+
+def _order(id, status, minutes_ago, company_id=1, phone='212600000001'):
+    return Order(id=id, status=status, order_detail=f"order {id}", customer_phone=phone,
+                 company_id=company_id, created_at=NOW - timedelta(minutes=minutes_ago))
+
+
+def _dashboard(session, company_id=1, cursor=None, page_size=2, active_limit=2):
+    rows = session.execute(dashboard_statement(Order, Company, company_id, cursor, page_size, active_limit)).all()
+    return build_dashboard(rows, cursor, page_size, active_limit)
+
+
+def test_cursor_round_trip_and_validation():
+    assert decode_cursor(encode_cursor(NOW, 42)) == (NOW, 42)
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+
+def test_keyset_pages_cover_every_completed_order_once(session):
+    # Ties on created_at are ordered by id, so no row is skipped or repeated between pages
+    session.add_all([_order(i, 'termine', minutes_ago=i // 2) for i in range(1, 8)])
+    session.add(_order(99, 'termine', minutes_ago=0, company_id=2))
+    session.commit()
+
+    first = _dashboard(session)
+    seen = [o['id'] for o in first['orders_termine']]
+    cursor = first['termine_next_cursor']
+    while cursor:
+        page = _dashboard(session, cursor=cursor)
+        assert set(page) == {'orders_termine', 'termine_next_cursor'}
+        seen += [o['id'] for o in page['orders_termine']]
+        cursor = page['termine_next_cursor']
+    assert seen == [1, 3, 2, 5, 4, 7, 6]
+
+
+def test_active_orders_are_capped_and_flagged(session):
+    session.add_all([_order(i, 'recu', minutes_ago=i) for i in range(1, 4)])
+    session.add_all([_order(i, 'en_cours', minutes_ago=i) for i in range(4, 6)])
+    session.commit()
+
+    dashboard = _dashboard(session)
+    assert [o['id'] for o in dashboard['orders_recu']] == [1, 2]
+    assert dashboard['orders_recu_truncated'] is True
+    assert [o['id'] for o in dashboard['orders_en_cours']] == [4, 5]
+    assert dashboard['orders_en_cours_truncated'] is False
+    assert dashboard['orders_recu'][0]['company_phone'] == '212500000001'
+    assert dashboard['termine_next_cursor'] is None
+
+
+def test_superadmin_view_sees_every_company(session):
+    session.add_all([_order(1, 'recu', 1, company_id=1), _order(2, 'recu', 2, company_id=2)])
+    session.commit()
+    assert [o['id'] for o in _dashboard(session, company_id=None)['orders_recu']] == [1, 2]
+    assert [o['id'] for o in _dashboard(session, company_id=2)['orders_recu']] == [2]
+
+
+def test_demands_count_the_callers_active_orders(session):
+    session.add_all([
+        _order(1, 'recu', 1), _order(2, 'en_cours', 2), _order(3, 'termine', 3),
+        _order(4, 'recu', 4, company_id=2),
+        _order(5, 'recu', 5, phone='212600000009'),
+    ])
+    session.add_all([
+        Demand(id=1, content='Where is my order?', customer_phone='212600000001', company_id=1,
+               status='new', created_at=NOW),
+        Demand(id=2, content='Cancel', customer_phone='212600000002', company_id=1,
+               status='processed', created_at=NOW - timedelta(minutes=1)),
+        Demand(id=3, content='Hello', customer_phone='212600000001', company_id=2,
+               status='new', created_at=NOW - timedelta(minutes=2)),
+    ])
+    session.commit()
+
+    demands = build_demands(session.execute(demands_statement(Demand, Order, company_id=1)).all())
+    assert [(d['id'], d['active_orders_count']) for d in demands['demands_new']] == [(1, 2)]
+    assert [(d['id'], d['active_orders_count']) for d in demands['demands_processed']] == [(2, 0)]
+
+    everyone = build_demands(session.execute(demands_statement(Demand, Order)).all())
+    assert [(d['id'], d['active_orders_count']) for d in everyone['demands_new']] == [(1, 2), (3, 1)]
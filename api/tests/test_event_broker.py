@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.event_broker import AsyncSubscription, EventBroker, format_sse, parse_last_event_id
+
+
+def _drain(sub):
+    events = []
+    while True:
+        event = sub.get(timeout=0)
+        if event is None:
+            return events
+        events.append(event)
+
+
+def test_subscribers_only_see_their_company():
+    broker = EventBroker()
+    mine = broker.subscribe(company_id=1)
+    superadmin = broker.subscribe(all_companies=True)
+    broker.publish('new_order', {'id': 10}, company_id=1)
+    broker.publish('new_order', {'id': 20}, company_id=2)
+    broker.publish('menu_extraction', {}, company_id=None)
+    assert [e['data'] for e in _drain(mine)] == [{'id': 10}]
+    assert len(_drain(superadmin)) == 3
+
+
+def test_ids_increase_across_workers():
+    broker = EventBroker()
+    first = broker.publish('a', {})
+    broker.receive({'id': first['id'] + 10_000, 'type': 'b', 'data': {}, 'company_id': None, 'timestamp': 0})
+    assert broker.publish('c', {})['id'] > first['id'] + 10_000
+
+
+def test_reconnect_replays_missed_events_in_order():
+    broker = EventBroker(buffer_size=10)
+    events = [broker.publish('new_order', {'n': n}, company_id=1) for n in range(4)]
+    broker.publish('new_order', {'n': 'other'}, company_id=2)
+    sub = broker.subscribe(company_id=1, last_event_id=events[1]['id'])
+    assert [e['data']['n'] for e in _drain(sub)] == [2, 3]
+
+
+def test_resume_past_the_buffer_asks_for_a_resync():
+    broker = EventBroker(buffer_size=2)
+    first = broker.publish('new_order', {}, company_id=1)
+    for _ in range(3):
+        broker.publish('new_order', {}, company_id=1)
+    replay = _drain(broker.subscribe(company_id=1, last_event_id=first['id']))
+    assert replay[0]['type'] == 'resync' and replay[0]['id'] is None
+    assert len(replay) == 3
+
+    # A worker that has buffered nothing cannot prove there is no gap either
+    assert _drain(EventBroker().subscribe(company_id=1, last_event_id=1))[0]['type'] == 'resync'
+
+
+def test_resync_when_the_backlog_exceeds_the_client_queue():
+    broker = EventBroker(buffer_size=50, subscriber_queue=4)
+    first = broker.publish('new_order', {'n': 0}, company_id=1)
+    for n in range(1, 10):
+        broker.publish('new_order', {'n': n}, company_id=1)
+    replay = _drain(broker.subscribe(company_id=1, last_event_id=first['id']))
+    # resync, then the newest events that fit
+    assert [e['type'] for e in replay] == ['resync', 'new_order', 'new_order', 'new_order']
+    assert [e['data']['n'] for e in replay[1:]] == [7, 8, 9]
+
+
+def test_slow_subscriber_is_evicted_and_told_so():
+    broker = EventBroker(subscriber_queue=2)
+    slow = broker.subscribe(all_companies=True)
+    for n in range(3):
+        broker.publish('new_order', {'n': n})
+    assert broker.stats()['evicted'] == 1 and broker.stats()['subscribers'] == 0
+    # The close marker makes room for itself: the client sees the end, then reconnects
+    assert slow.get(timeout=0)['data'] == {'n': 1}
+    with pytest.raises(EOFError):
+        slow.get(timeout=0)
+
+
+def test_async_subscription_is_woken_by_other_threads():
+    async def run():
+        broker = EventBroker()
+        sub = broker.subscribe(company_id=1, subscription_cls=AsyncSubscription)
+        assert await sub.get(timeout=0.01) is None
+        threading.Timer(0.01, broker.publish, args=('new_order', {'id': 1}), kwargs={'company_id': 1}).start()
+        event = await sub.get(timeout=2)
+        broker.unsubscribe(sub)
+        with pytest.raises(EOFError):
+            await sub.get(timeout=2)
+        return event
+
+    assert asyncio.run(run())['data'] == {'id': 1}
+
+
+def test_sse_format_and_last_event_id_parsing():
+    assert format_sse({'id': 7, 'type': 'a', 'data': {}, 'timestamp': 1}).startswith('id: 7\ndata: {')
+    assert format_sse({'id': None, 'type': 'resync', 'data': {}, 'timestamp': 1}).startswith('data: {')
+    assert parse_last_event_id('42') == 42
+    assert parse_last_event_id('') is None and parse_last_event_id('abc') is None
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+from services.extraction_cache import extraction_cache_key, lookup_extraction, store_extraction
+
+Base = declarative_base()
+
+
+class MenuExtraction(Base):
+    __tablename__ = 'menu_extractions'
+
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), unique=True, nullable=False)
+    model = Column(String(100))
+    image_count = Column(Integer)
+    menu_text = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+def _engine():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def test_key_ignores_image_order_but_not_prompt_or_model():
+    key = extraction_cache_key(['a', 'b'], 'prompt', 'model')
+    assert key == extraction_cache_key(['b', 'a'], 'prompt', 'model')
+    assert key != extraction_cache_key(['a', 'b'], 'prompt v2', 'model')
+    assert key != extraction_cache_key(['a', 'b'], 'prompt', 'other')
+
+
+def test_concurrent_stores_of_the_same_key_both_commit():
+    engine = _engine()
+    first, second = Session(engine), Session(engine)
+    # Both extractions looked the key up before either stored it
+    assert lookup_extraction(first, MenuExtraction, 'k') is None
+    assert lookup_extraction(second, MenuExtraction, 'k') is None
+    store_extraction(first, MenuExtraction, 'k', 'Harira 15', 'model', 1)
+    first.commit()
+    store_extraction(second, MenuExtraction, 'k', 'Harira 16', 'model', 1)
+    second.commit()
+
+    with Session(engine) as session:
+        rows = session.execute(select(MenuExtraction)).scalars().all()
+        assert [(r.cache_key, r.menu_text) for r in rows] == [('k', 'Harira 16')]
+        assert lookup_extraction(session, MenuExtraction, 'k') == 'Harira 16'
+        session.commit()
+        assert session.execute(select(MenuExtraction.hits)).scalar() == 1
+
+
+def test_store_drops_expired_entries():
+    engine = _engine()
+    with Session(engine) as session:
+        session.add(MenuExtraction(cache_key='old', menu_text='x', hits=0,
+                                   created_at=datetime.utcnow() - timedelta(days=2)))
+        session.commit()
+        assert lookup_extraction(session, MenuExtraction, 'old', ttl=3600) is None
+        store_extraction(session, MenuExtraction, 'new', 'Tajine 60', 'model', 2, ttl=3600)
+        session.commit()
+        assert session.execute(select(MenuExtraction.cache_key)).scalars().all() == ['new']
@@ -0,0 +1,144 @@
+import io
+import threading
+import time
+
+import pytest
+from flask import Flask
+from flask_login import LoginManager
+
+import routes.admin as admin_routes
+from extensions import db
+from models.models import Company, User
+from services.extraction_jobs import ExtractionJobs, JobQueueFull, job_key
+
+
+def _wait(job, timeout=2):
+    deadline = time.monotonic() + timeout
+    while job.status in ('queued', 'running') and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_same_image_set_coalesces_into_one_job():
+    jobs = ExtractionJobs(workers=1, max_pending=5)
+    release = threading.Event()
+    calls = []
+
+    def run(job):
+        calls.append(job.id)
+        release.wait(2)
+        return 'Harira 15'
+
+    key = job_key(1, ['b', 'a'])
+    first, coalesced = jobs.submit(key, 1, 2, run)
+    assert not coalesced
+    again, coalesced = jobs.submit(job_key(1, ['a', 'b']), 1, 2, run)
+    assert coalesced and again is first
+    other, coalesced = jobs.submit(job_key(2, ['a', 'b']), 2, 2, run)
+    assert not coalesced and other is not first
+
+    release.set()
+    assert _wait(first) == 'done' and _wait(other) == 'done'
+    assert first.to_dict()['menu_text'] == 'Harira 15'
+    assert len(calls) == 2
+    # Finished jobs no longer coalesce: the same images run again
+    assert jobs.submit(key, 1, 2, run)[1] is False
+    assert jobs.stats()['coalesced'] == 1
+
+
+def test_full_queue_refuses_new_jobs():
+    jobs = ExtractionJobs(workers=1, max_pending=1)
+    release = threading.Event()
+    run = lambda job: release.wait(2) and 'menu'
+
+    running, _ = jobs.submit('running', 1, 1, run)
+    deadline = time.monotonic() + 2
+    while running.status != 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    jobs.submit('waiting', 1, 1, run)
+    with pytest.raises(JobQueueFull):
+        jobs.submit('refused', 1, 1, run)
+    # A refused image set can still join a job that is already active
+    assert jobs.submit('waiting', 1, 1, run)[1] is True
+    assert jobs.stats()['rejected'] == 1
+    release.set()
+
+
+def test_failed_job_reports_its_error():
+    jobs = ExtractionJobs(workers=1)
+
+    def run(job):
+        raise RuntimeError('quota exceeded')
+
+    job, _ = jobs.submit('key', 1, 1, run)
+    assert _wait(job) == 'failed'
+    assert job.to_dict()['error'] == 'quota exceeded'
+    assert jobs.get(job.id) is job
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'db.sqlite'}")
+    db.init_app(app)
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+    app.register_blueprint(admin_routes.admin_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Company(id=1, name='Dar Tajine', phone_number='212500000001'))
+        db.session.add(User(id=1, username='admin', company_id=1, is_superadmin=True))
+        db.session.commit()
+
+    release = threading.Event()
+    monkeypatch.setattr(admin_routes, 'extraction_jobs', ExtractionJobs(workers=1, max_pending=1))
+    monkeypatch.setattr(admin_routes, 'model_variant_bytes', lambda data: (data, 'image/jpeg'))
+    monkeypatch.setattr(admin_routes, 'extract_menu_text', lambda images: release.wait(2) and 'Harira 15')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    client.release = release
+    yield client
+    release.set()
+
+
+def _extract(client, image):
+    return client.post('/api/admin/menu/extract', data={
+        'user_id': '1', 'menu_images': (io.BytesIO(image), 'menu.jpg'),
+    }, content_type='multipart/form-data')
+
+
+def test_extract_endpoint_queues_coalesces_and_refuses(client):
+    first = _extract(client, b'page one')
+    assert first.status_code == 202
+    body = first.get_json()
+    assert 'success' not in body and 'menu_text' not in body
+    assert body['status'] in ('queued', 'running') and body['coalesced'] is False
+    assert body['status_url'] == f"/api/admin/menu/extract/{body['job_id']}"
+
+    again = _extract(client, b'page one').get_json()
+    assert again['job_id'] == body['job_id'] and again['coalesced'] is True
+
+    # One job running, one waiting: a third image set is refused
+    deadline = time.monotonic() + 2
+    while client.get(body['status_url']).get_json()['status'] != 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _extract(client, b'page two').status_code == 202
+    refused = _extract(client, b'page three')
+    assert refused.status_code == 503 and 'error' in refused.get_json()
+
+
+def test_extract_job_status_endpoint(client):
+    job_id = _extract(client, b'page one').get_json()['job_id']
+    status = client.get(f'/api/admin/menu/extract/{job_id}')
+    assert status.status_code == 200
+    assert status.get_json()['status'] in ('queued', 'running')
+
+    client.release.set()
+    deadline = time.monotonic() + 2
+    while status.get_json()['status'] != 'done' and time.monotonic() < deadline:
+        time.sleep(0.02)
+        status = client.get(f'/api/admin/menu/extract/{job_id}')
+    assert status.get_json()['menu_text'] == 'Harira 15'
+    assert client.get('/api/admin/menu/extract/unknown').status_code == 404
@@ -0,0 +1,90 @@
+import asyncio
+import types
+
+from services.gemini_pool import GeminiPool, session_key
+
+
+class FakeLive:
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+
+    def connect(self, model, config):
+        live = self
+
+        class Connection:
+            async def __aenter__(self):
+                live.opened += 1
+                return f"session-{live.opened}"
+
+            async def __aexit__(self, *exc):
+                live.closed += 1
+
+        return Connection()
+
+
+def _pool(**kwargs):
+    pool = GeminiPool(refill_interval=3600, **kwargs)
+    live = FakeLive()
+    pool._new_client = lambda: types.SimpleNamespace(aio=types.SimpleNamespace(live=live))
+    return pool, live
+
+
+def test_session_key_hashes_the_instruction():
+    key = session_key('model', 'Puck', 'You take orders')
+    assert key == session_key('model', 'Puck', 'You take orders')
+    assert key != session_key('model', 'Puck', 'You take orders.')
+    assert key != session_key('model', 'Kore', 'You take orders')
+
+
+def test_clients_are_created_once_and_rotated():
+    pool, _ = _pool(client_count=2)
+    clients = [pool.get_client() for _ in range(4)]
+    assert clients[0] is clients[2] and clients[1] is clients[3]
+    assert clients[0] is not clients[1]
+    assert pool.stats()['clients'] == 2
+
+
+def test_without_warm_sessions_each_call_connects():
+    pool, live = _pool(warm_sessions=0)
+
+    async def call():
+        async with pool.session('model', {}, ('model', 'Puck', 'x')) as session:
+            return session
+
+    assert asyncio.run(call()) == 'session-1'
+    assert (live.opened, live.closed) == (1, 1)
+    assert pool.stats()['misses'] == 1 and pool.stats()['hits'] == 0
+
+
+def test_warm_session_is_reused_by_the_next_call():
+    pool, live = _pool(warm_sessions=1, session_ttl=60)
+    key = ('model', 'Puck', 'x')
+
+    async def calls():
+        async with pool.session('model', {}, key) as first:
+            await asyncio.sleep(0)  # Let the refill connect a spare
+        async with pool.session('model', {}, key) as second:
+            pass
+        await asyncio.sleep(0)
+        return first, second
+
+    first, second = asyncio.run(calls())
+    assert first == 'session-1' and second == 'session-2'
+    assert pool.hits == 1 and pool.misses == 1
+    assert live.closed == 2  # Both used sessions; the spare refilled after the second stays open
+
+
+def test_expired_warm_session_is_closed_not_used():
+    pool, _ = _pool(warm_sessions=1, session_ttl=0)
+    key = ('model', 'Puck', 'x')
+
+    async def calls():
+        async with pool.session('model', {}, key):
+            await asyncio.sleep(0)
+        async with pool.session('model', {}, key) as session:
+            await asyncio.sleep(0)
+            return session
+
+    assert asyncio.run(calls()) == 'session-3'
+    assert pool.expired >= 1 and pool.hits == 0
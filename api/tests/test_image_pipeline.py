@@ -0,0 +1,70 @@
+import io
+import types
+
+import pytest
+
+import services.image_pipeline as image_pipeline
+from services.blob_store import LocalBlobStore
+from services.image_pipeline import model_variant_bytes, process_image, sniff_mime, variant_key
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def _image(size, fmt='JPEG'):
+    out = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(out, format=fmt)
+    return out.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalBlobStore(str(tmp_path))
+    monkeypatch.setattr(image_pipeline, 'blob_store', store)
+    monkeypatch.setattr(image_pipeline.Config, 'IMAGE_THUMB_SIZE', 64)
+    monkeypatch.setattr(image_pipeline.Config, 'IMAGE_MODEL_MAX_SIDE', 200)
+    return store
+
+
+@pytest.mark.parametrize('data, expected', [
+    (_image((4, 4)), 'image/jpeg'),
+    (_image((4, 4), 'PNG'), 'image/png'),
+    (b'RIFF\0\0\0\0WEBPVP8 ', 'image/webp'),
+    (b'\0\0\0\x18ftypheic', 'image/heic'),
+    (b'%PDF-1.7', 'application/octet-stream'),
+])
+def test_sniff_mime(data, expected):
+    assert sniff_mime(data) == expected
+
+
+def test_large_upload_gets_thumb_and_model_variants(store):
+    data = _image((800, 400), 'PNG')
+    processed = process_image(data)
+    assert (processed.content_type, processed.width, processed.height) == ('image/png', 800, 400)
+    assert store.read(processed.content_hash) == data
+    with Image.open(io.BytesIO(store.read(processed.thumb_hash))) as thumb:
+        assert thumb.format == 'JPEG' and max(thumb.size) == 64
+    with Image.open(io.BytesIO(store.read(processed.model_hash))) as model:
+        assert model.format == 'JPEG' and model.size == (200, 100)
+
+
+def test_small_jpeg_is_its_own_model_variant(store):
+    processed = process_image(_image((150, 100)))
+    assert processed.model_hash == processed.content_hash
+    assert processed.thumb_hash not in (None, processed.content_hash)
+    assert model_variant_bytes(_image((150, 100))) == (_image((150, 100)), 'image/jpeg')
+
+
+def test_unreadable_upload_keeps_only_the_original(store):
+    processed = process_image(b'not an image')
+    assert store.exists(processed.content_hash)
+    assert processed.thumb_hash is None and processed.model_hash is None
+    assert model_variant_bytes(b'not an image') == (b'not an image', 'image/jpeg')
+
+
+def test_variant_key_falls_back_to_the_original():
+    image = types.SimpleNamespace(content_hash='orig', content_type='image/png', thumb_hash=None, model_hash='orig')
+    assert variant_key(image, 'thumb') == ('orig', 'image/png')
+    assert variant_key(image, 'model') == ('orig', 'image/png')
+    image.thumb_hash = 'thumb'
+    assert variant_key(image, 'thumb') == ('thumb', 'image/jpeg')
+    assert variant_key(image, 'original') == ('orig', 'image/png')
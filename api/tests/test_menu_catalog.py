@@ -0,0 +1,69 @@
+import pytest
+
+from services.menu_catalog import MenuEntry, MenuIndex, parse_menu_text, serialize_menu
+
+LONG_LINE = "Menu enfant: nuggets, frites ou salade et boisson, servi avec une surprise"
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Priced lines, with and without currency, bullets and price ranges
+    ("Harira: 15 DH", [(None, 'Harira', 15.0, '15 DH', [])]),
+    ("- Tajine poulet 60", [(None, 'Tajine poulet', 60.0, '60', [])]),
+    ("Pizza 40/60 DH", [(None, 'Pizza', 40.0, '40/60 DH', [])]),
+    ("Jus d'orange ... 12,5 dhs", [(None, "Jus d'orange", 12.5, '12,5 dhs', [])]),
+    # Alternative names become aliases, qualifiers stay in the name
+    ("Pastilla / Bastilla: 80", [(None, 'Pastilla', 80.0, '80', ['Bastilla'])]),
+    ("Nuggets (6 pièces): 30", [(None, 'Nuggets (6 pièces)', 30.0, '30', [])]),
+    ("Pizza (taille M ou L) 50", [(None, 'Pizza (taille M ou L)', 50.0, '50', [])]),
+    # Headers set the category of the items below them
+    ("# Entrées\nHarira 15", [('Entrées', 'Harira', 15.0, '15', [])]),
+    ("**Boissons**\nThé 8", [('Boissons', 'Thé', 8.0, '8', [])]),
+    ("Desserts:\nCrêpe 20", [('Desserts', 'Crêpe', 20.0, '20', [])]),
+    ("PLATS\nCouscous 60", [('PLATS', 'Couscous', 60.0, '60', [])]),
+    # Unpriced lines under a section are items, not headings
+    ("# Entrées\nSalade marocaine\nHarira 15",
+     [('Entrées', 'Salade marocaine', None, None, []), ('Entrées', 'Harira', 15.0, '15', [])]),
+    ("Plats\nCouscous 60\nTajine du jour",
+     [('Plats', 'Couscous', 60.0, '60', []), ('Plats', 'Tajine du jour', None, None, [])]),
+    # Long bare lines are kept whole, whatever comes before them
+    (LONG_LINE, [(None, LONG_LINE, None, None, [])]),
+    ("# Enfants\n" + LONG_LINE, [('Enfants', LONG_LINE, None, None, [])]),
+    # Noise
+    ("```\n\n  \n---\n```", []),
+])
+def test_parse_menu_text(text, expected):
+    items = parse_menu_text(text)
+    assert [(i['category'], i['name'], i['price'], i['price_label'], i['aliases']) for i in items] == expected
+    assert [i['position'] for i in items] == list(range(len(items)))
+
+
+def _index(text):
+    return MenuIndex(
+        MenuEntry(i, item['category'], item['name'], item['price'], item['price_label'], tuple(item['aliases']))
+        for i, item in enumerate(parse_menu_text(text))
+    )
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Harira 15\nTajine 60", "Menu: Harira 15, Tajine 60"),
+    ("# Entrées\nHarira 15 DH\n# Plats\nCouscous 60",
+     "Entrées: Harira 15 DH\nPlats: Couscous 60"),
+    ("# Plats\nCouscous 60\nTajine du jour", "Plats: Couscous 60, Tajine du jour"),
+    ("Nuggets (6 pièces): 30", "Menu: Nuggets (6 pièces) 30"),
+    ("# Enfants\n" + LONG_LINE, f"Enfants: {LONG_LINE}"),
+])
+def test_serialize_menu_keeps_every_line(text, expected):
+    assert serialize_menu(_index(text), max_items=60) == expected
+
+
+def test_serialize_large_menu_lists_categories():
+    text = "# Entrées\nHarira 15\nSalade 20\n# Plats\nCouscous 60"
+    summary = serialize_menu(_index(text), max_items=2)
+    assert summary.startswith("3 items in these categories: Entrées (2), Plats (1).")
+    assert 'lookup_menu_item' in summary
+
+
+def test_qualifier_is_searchable_through_the_name():
+    index = _index("Nuggets (6 pièces): 30\nPizza (taille M ou L) 50")
+    assert [e.name for e in index.search('nuggets')] == ['Nuggets (6 pièces)']
+    assert index.search('pizza')[0].name == 'Pizza (taille M ou L)'
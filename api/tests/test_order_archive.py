@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import func, select
+
+from extensions import db
+from models.models import Company, Demand, Order
+from services.order_archive import (
+    archive_orders, customer_history_statement, eligible_count, history_row_to_dict, orders_archive,
+)
+
+OLD = datetime.utcnow() - timedelta(days=200)
+RECENT = datetime.utcnow() - timedelta(days=1)
+PHONE = '212600000001'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'db.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        orders_archive.create(db.engine, checkfirst=True)
+        db.session.add(Company(id=1, name='Dar Tajine', phone_number='212500000001'))
+        # 1-5: old and completed; 6: old but still open; 7: recent; 8: old, a demand points at it
+        for i in range(1, 6):
+            db.session.add(_order(i, 'termine', OLD + timedelta(minutes=i)))
+        db.session.add_all([_order(6, 'en_cours', OLD), _order(7, 'termine', RECENT), _order(8, 'termine', OLD)])
+        db.session.add(Demand(id=1, content='Refund', order_id=8, customer_phone=PHONE, company_id=1))
+        db.session.commit()
+        yield app
+
+
+def _order(id, status, created_at):
+    return Order(id=id, status=status, order_detail=f"order {id}", customer_phone=PHONE,
+                 company_id=1, created_at=created_at)
+
+
+def _ids(table_column):
+    return sorted(db.session.execute(select(table_column)).scalars())
+
+
+def test_only_eligible_orders_move_in_batches(app):
+    with db.engine.connect() as conn:
+        assert eligible_count(conn, horizon_days=90) == 5
+
+    # Batches of 2, stopped after 2 batches: the oldest ids move first
+    assert archive_orders(db.engine, horizon_days=90, batch_size=2, max_batches=2) == 4
+    assert _ids(orders_archive.c.id) == [1, 2, 3, 4]
+    assert archive_orders(db.engine, horizon_days=90, batch_size=2) == 1
+    assert archive_orders(db.engine, horizon_days=90, batch_size=2) == 0
+
+    assert _ids(Order.id) == [6, 7, 8]
+    assert _ids(orders_archive.c.id) == [1, 2, 3, 4, 5]
+    archived = db.session.execute(select(orders_archive).where(orders_archive.c.id == 1)).one()
+    assert archived.order_detail == 'order 1' and archived.archived_at is not None
+
+
+def test_history_merges_live_and_archived_orders(app):
+    archive_orders(db.engine, horizon_days=90, batch_size=10)
+    db.session.add(Order(id=9, status='recu', order_detail='other caller', customer_phone='212600000009',
+                         company_id=1, created_at=RECENT))
+    db.session.commit()
+
+    rows = db.session.execute(customer_history_statement(Order, Company, PHONE, limit=20)).all()
+    history = [history_row_to_dict(row) for row in rows]
+    assert [(h['id'], h['archived']) for h in history] == [
+        (7, False), (5, True), (4, True), (3, True), (2, True), (1, True), (8, False), (6, False),
+    ]
+    assert history[1]['company_phone'] == '212500000001'
+
+    limited = db.session.execute(customer_history_statement(Order, Company, PHONE, limit=3)).all()
+    assert [row.id for row in limited] == [7, 5, 4]
+    assert db.session.execute(select(func.count()).select_from(orders_archive)).scalar() == 5
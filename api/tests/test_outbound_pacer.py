@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from services.outbound_pacer import OutboundPacer
+
+
+def _pacer(sent, **kwargs):
+    def send(frame):
+        sent.append((time.monotonic(), frame))
+    kwargs.setdefault('min_ms', 60)
+    kwargs.setdefault('max_ms', 200)
+    kwargs.setdefault('capacity_ms', 1000)
+    return OutboundPacer(send, **kwargs)
+
+
+def test_chunks_are_recut_into_frames_and_the_turn_is_padded():
+    pacer = _pacer([])
+    pacer.write(bytes(1000))
+    assert len(pacer) == 1 and len(pacer._partial) == 360
+    pacer.write(bytes(300))
+    assert len(pacer) == 2
+    pacer.end_turn()
+    assert len(pacer) == 3 and not pacer._partial
+    assert all(len(frame) == 640 for frame in pacer._frames)
+
+
+def test_full_buffer_drops_the_oldest_frames():
+    pacer = _pacer([], capacity_ms=200)
+    for i in range(12):
+        pacer.write(bytes([i]) * 640)
+    assert len(pacer) == 10 and pacer.overruns == 2
+    assert pacer._frames[0][0] == 2
+
+
+def test_frames_go_out_in_real_time():
+    sent = []
+
+    async def run():
+        pacer = _pacer(sent)
+        task = asyncio.create_task(pacer.run())
+        started = time.monotonic()
+        pacer.write(bytes(640 * 10))  # 200 ms in one burst
+        pacer.end_turn()
+        while len(sent) < 10:
+            await asyncio.sleep(0.005)
+        pacer.close()
+        await task
+        return started, pacer
+
+    started, pacer = asyncio.run(run())
+    times = [t for t, _ in sent]
+    # Not a burst: ~20 ms apart, ~180 ms from the first frame to the last
+    assert 0.15 < times[-1] - times[0] < 0.35
+    assert min(b - a for a, b in zip(times, times[1:])) > 0.01
+    assert pacer.frames_out == 10 and pacer.underruns == 0
+
+
+def test_playout_waits_for_the_jitter_buffer():
+    sent = []
+
+    async def run():
+        pacer = _pacer(sent, min_ms=60)
+        task = asyncio.create_task(pacer.run())
+        pacer.write(bytes(640))
+        await asyncio.sleep(0.01)
+        early = len(sent)  # One frame of a three-frame target: still buffering
+        pacer.write(bytes(640 * 2))
+        await asyncio.sleep(0.01)
+        pacer.close()
+        await task
+        return early
+
+    assert asyncio.run(run()) == 0
+    assert len(sent) >= 1
+
+
+def test_underrun_grows_the_jitter_buffer():
+    sent = []
+
+    async def run():
+        pacer = _pacer(sent, min_ms=40, max_ms=60)
+        task = asyncio.create_task(pacer.run())
+        for _ in range(3):
+            # Gemini falls behind mid-turn: the buffer runs dry without end_turn()
+            pacer.write(bytes(640 * 2))
+            while len(pacer):
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.05)
+        pacer.close()
+        await task
+        return pacer
+
+    pacer = asyncio.run(run())
+    assert pacer.underruns >= 2
+    assert pacer.target == pacer.max_frames == 3
+
+
+def test_flush_drops_queued_audio_on_barge_in():
+    sent = []
+
+    async def run():
+        pacer = _pacer(sent)
+        task = asyncio.create_task(pacer.run())
+        pacer.write(bytes(640 * 50 + 100))  # 1 s of reply and a partial frame
+        while not sent:
+            await asyncio.sleep(0.005)
+        played = pacer.frames_out
+        dropped_ms = pacer.flush()
+        await asyncio.sleep(0.06)
+        out_after_flush = pacer.frames_out
+        # The next turn plays normally
+        pacer.write(bytes(640 * 3))
+        pacer.end_turn()
+        while pacer.frames_out < out_after_flush + 3:
+            await asyncio.sleep(0.005)
+        pacer.close()
+        await task
+        return pacer, played, dropped_ms, out_after_flush
+
+    pacer, played, dropped_ms, out_after_flush = asyncio.run(run())
+    # Every queued frame and the partial one are dropped; nothing more is played
+    assert dropped_ms == (50 - played + 1) * 20
+    assert out_after_flush == played
+    stats = pacer.stats()
+    assert stats['flushes'] == 1 and stats['flushed_ms'] == dropped_ms
+    assert pacer.underruns == 0  # A flush is not an underrun
+
+
+def test_flush_on_an_idle_pacer_drops_nothing():
+    pacer = _pacer([])
+    assert pacer.flush() == 0
+    assert pacer.stats()['flushes'] == 1
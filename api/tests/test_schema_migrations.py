@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from scripts.schema_migrations import applied_versions, run_migrations
+
+MIGRATIONS = [
+    ('001_orders', 'Orders table', [
+        "CREATE TABLE IF NOT EXISTS orders (id INTEGER PRIMARY KEY, company_id INTEGER, status VARCHAR(20), "
+        "customer_phone VARCHAR(20), created_at TIMESTAMP)",
+    ]),
+    ('002_indexes', 'Partial index', [
+        """CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_active_company_phone
+           ON orders (company_id, customer_phone, created_at DESC)
+           WHERE status IN ('recu', 'en_cours')""",
+    ]),
+]
+
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+
+def test_pending_migrations_apply_once(tmp_path, capsys):
+    engine = _engine(tmp_path)
+    assert run_migrations(engine, MIGRATIONS) == ['001_orders', '002_indexes']
+    # CONCURRENTLY is Postgres-only: dropped elsewhere
+    assert 'ix_orders_active_company_phone' in {ix['name'] for ix in inspect(engine).get_indexes('orders')}
+
+    assert run_migrations(engine, MIGRATIONS) == []
+    assert '002_indexes already applied' in capsys.readouterr().out
+    with engine.connect() as conn:
+        assert applied_versions(conn) == {'001_orders', '002_indexes'}
+
+
+def test_dry_run_changes_nothing(tmp_path, capsys):
+    engine = _engine(tmp_path)
+    assert run_migrations(engine, MIGRATIONS, dry_run=True) == []
+    assert 'CREATE INDEX IF NOT EXISTS ix_orders_active_company_phone' in capsys.readouterr().out
+    assert not inspect(engine).has_table('orders')
+    with engine.connect() as conn:
+        assert applied_versions(conn) == set()
+
+
+def test_callable_steps_get_the_connection(tmp_path):
+    engine = _engine(tmp_path)
+
+    def add_column(conn):
+        """Add orders.address"""
+        conn.execute(text("ALTER TABLE orders ADD COLUMN address VARCHAR(255)"))
+
+    run_migrations(engine, MIGRATIONS + [('003_address', 'Address column', [add_column])])
+    assert 'address' in {col['name'] for col in inspect(engine).get_columns('orders')}
+
+
+def test_failed_migration_is_not_recorded(tmp_path):
+    engine = _engine(tmp_path)
+    broken = [MIGRATIONS[0], ('002_broken', 'Broken', ["CREATE INDEX ix_missing ON missing_table (id)"])]
+    with pytest.raises(Exception):
+        run_migrations(engine, broken)
+    with engine.connect() as conn:
+        assert applied_versions(conn) == {'001_orders'}
+    # Fixed and re-run: picks up where it stopped
+    assert run_migrations(engine, MIGRATIONS) == ['002_indexes']
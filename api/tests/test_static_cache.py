@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from utils.static_cache import (
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, StaticFileCache, etag_matches,
+)
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, False),
+    ('', False),
+    ('*', True),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('abc', True),
+    ('"xyz", W/"abc"', True),
+    ('"xyz"', False),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, 'abc') is expected
+
+
+@pytest.fixture
+def root(tmp_path):
+    dist = tmp_path / 'dist'
+    (dist / 'assets').mkdir(parents=True)
+    (dist / 'assets' / 'index-3f2a.js').write_text('console.log(1)')
+    (dist / 'index.html').write_text('<html></html>')
+    (tmp_path / 'secret.txt').write_text('nope')
+    return dist
+
+
+def test_hashed_assets_are_immutable_and_pages_revalidate(root):
+    cache = StaticFileCache(str(root))
+    asset = cache.lookup('assets/index-3f2a.js')
+    assert asset.cache_control == IMMUTABLE_CACHE_CONTROL and asset.size == len('console.log(1)')
+    assert cache.lookup('index.html').cache_control == REVALIDATE_CACHE_CONTROL
+
+
+def test_missing_paths_and_escapes_are_none(root):
+    cache = StaticFileCache(str(root))
+    assert cache.lookup('') is None
+    assert cache.lookup('orders/42') is None  # SPA route: the caller serves index.html
+    assert cache.lookup('assets') is None  # Directories are not files
+    assert cache.lookup('../secret.txt') is None
+    assert cache.lookup('assets/../../secret.txt') is None
+
+
+def test_entries_are_cached_until_the_ttl(root):
+    cache = StaticFileCache(str(root), ttl=3600)
+    first = cache.lookup('index.html')
+    (root / 'index.html').write_text('<html>rebuilt</html>')
+    os.utime(root / 'index.html', ns=(first.stat.st_mtime_ns + 10**9,) * 2)
+    # Within the TTL: no filesystem call, the old entry is served
+    assert cache.lookup('index.html') is first
+    assert cache.lookup('new.js') is None
+    (root / 'new.js').write_text('x')
+    assert cache.lookup('new.js') is None  # Misses are cached too
+
+    fresh = StaticFileCache(str(root), ttl=0)
+    rebuilt = fresh.lookup('index.html')
+    assert rebuilt.etag != first.etag
+    assert fresh.lookup('new.js') is not None
+
+
+def test_cache_is_bounded(root):
+    cache = StaticFileCache(str(root), maxsize=2)
+    for path in ('a', 'b', 'c'):
+        cache.lookup(path)
+    assert len(cache._entries) <= 2
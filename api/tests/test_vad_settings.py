@@ -0,0 +1,27 @@
+import pytest
+
+from utils.audio import SilenceGate, vad_settings
+
+
+def test_valid_settings():
+    assert vad_settings({}) == {}
+    assert vad_settings({'vad_mode': 'gate', 'vad_threshold': 450}) == {'vad_mode': 'gate', 'vad_threshold': 450}
+    assert vad_settings({'vad_threshold': '450'}) == {'vad_threshold': 450}
+    # null (or an empty mode) resets to the platform default
+    assert vad_settings({'vad_mode': '', 'vad_threshold': None}) == {'vad_mode': None, 'vad_threshold': None}
+    for mode in SilenceGate.MODES:
+        assert vad_settings({'vad_mode': mode}) == {'vad_mode': mode}
+
+
+@pytest.mark.parametrize('data', [
+    {'vad_mode': 'gaet'},
+    {'vad_mode': 5},
+    {'vad_threshold': 'loud'},
+    {'vad_threshold': 1.5},
+    {'vad_threshold': True},
+    {'vad_threshold': 0},
+    {'vad_threshold': 99999},
+])
+def test_invalid_settings(data):
+    with pytest.raises(ValueError):
+        vad_settings(data)
@@ -0,0 +1,365 @@
+"""
+Vectorized 16-bit PCM helpers for the voice pipelines (replaces audioop,
+which is gone in Python 3.13). Functions take bytes, bytearray or
+memoryview and read them through zero-copy `np.frombuffer` views; the
+`*_inplace` variants write back into a writable buffer.
+"""
+import math
+
+import numpy as np
+
+SAMPLE_WIDTH = 2
+INT16_MIN = -32768
+INT16_MAX = 32767
+
+
+def samples(buf, byteorder='<'):
+    """Zero-copy int16 view of a PCM buffer (writable if `buf` is)."""
+    return np.frombuffer(buf, dtype=f'{byteorder}i2')
+
+
+def to_pcm16(values):
+    """Float or int samples -> little-endian int16 bytes, rounded and clipped."""
+    return np.clip(np.rint(values), INT16_MIN, INT16_MAX).astype('<i2').tobytes()
+
+
+def byteswap16(buf):
+    """Big <-> little endian copy (audioop.byteswap(buf, 2))."""
+    return samples(buf).byteswap().tobytes()
+
+
+def byteswap16_inplace(buf):
+    """Swap the byte order of a writable buffer in place."""
+    samples(buf).byteswap(inplace=True)
+    return buf
+
+
+def rms(buf):
+    """Root mean square level, as audioop.rms(buf, 2)."""
+    x = samples(buf)
+    if not len(x):
+        return 0
+    x = x.astype(np.float32)
+    return int(math.sqrt(float(np.dot(x, x)) / len(x)))
+
+
+def mean(buf):
+    x = samples(buf)
+    return int(x.mean()) if len(x) else 0
+
+
+class DCBlocker:
+    """
+    Streaming DC offset removal. Tracks the signal mean with a time
+    constant of `tau` seconds and subtracts it, ramping between block
+    estimates so there is no step at frame boundaries (unlike subtracting
+    each frame's own mean). Work buffers are reused across frames.
+    """
+
+    def __init__(self, rate=16000, tau=0.25):
+        self.rate = rate
+        self.tau = tau
+        self.offset = None
+        self._n = 0
+
+    def reset(self):
+        self.offset = None
+
+    def _apply(self, x):
+        """DC-free float32 samples of `x` (in a reused buffer)."""
+        n = len(x)
+        if n != self._n:
+            self._n = n
+            self._work = np.empty(n, dtype=np.float32)
+            self._step = np.empty(n, dtype=np.float32)
+            self._ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+        work = self._work
+        np.copyto(work, x, casting='unsafe')
+        block_mean = float(work.mean())
+        if self.offset is None:
+            self.offset = block_mean
+            work -= block_mean
+            return work
+        start = self.offset
+        self.offset += (1.0 - math.exp(-n / (self.tau * self.rate))) * (block_mean - start)
+        np.multiply(self._ramp, self.offset - start, out=self._step)
+        work -= start
+        work -= self._step
+        return work
+
+    def process(self, buf):
+        """DC-free copy of `buf` as bytes."""
+        x = samples(buf)
+        if not len(x):
+            return b''
+        return to_pcm16(self._apply(x))
+
+    def process_inplace(self, buf):
+        """Remove the DC offset from a writable little-endian buffer in place."""
+        x = samples(buf)
+        if len(x):
+            work = self._apply(x)
+            np.rint(work, out=work)
+            np.clip(work, INT16_MIN, INT16_MAX, out=work)
+            np.copyto(x, work, casting='unsafe')
+        return buf
+
+
+def _lowpass(taps, cutoff, beta):
+    """Kaiser-windowed sinc, `cutoff` in cycles per sample."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(taps, beta)
+    return h / h.sum()
+
+
+class PolyphaseResampler:
+    """
+    Stateful rational resampler (audioop.ratecv replacement), e.g. Gemini's
+    24 kHz output to Vonage's 16 kHz. The anti-aliasing filter is designed
+    once and split into `up` polyphase branches; each chunk is one gather
+    and one multiply-add over (outputs x taps). History and output phase
+    carry across calls, so arbitrary chunk sizes join seamlessly; `reset()`
+    starts a fresh stream (e.g. after a barge-in).
+    """
+
+    def __init__(self, in_rate=24000, out_rate=16000, taps_per_phase=16, beta=8.0, rolloff=0.9):
+        g = math.gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.taps = taps_per_phase
+        h = _lowpass(self.up * taps_per_phase, rolloff * 0.5 / max(self.up, self.down), beta) * self.up
+        # phases[p, k] = h[p + k * up]
+        self._phases = h.reshape(taps_per_phase, self.up).T.astype(np.float32).copy()
+        self._plans = {}
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._t0 = 0          # Next output position, in 1/up input samples from the chunk start
+        self._odd = b''       # Trailing byte of an odd-length chunk
+
+    def _plan(self, n, t0):
+        """(gather indexes, phase rows) for an n-sample chunk starting at output position t0 (cached)."""
+        key = (n, t0)
+        plan = self._plans.get(key)
+        if plan is None:
+            count = max(0, -(-(n * self.up - t0) // self.down))
+            t = t0 + self.down * np.arange(count)
+            base = t // self.up + (self.taps - 1)
+            index = base[:, None] - np.arange(self.taps)[None, :]
+            plan = (index, self._phases[t % self.up], count)
+            if len(self._plans) > 64:
+                self._plans.clear()
+            self._plans[key] = plan
+        return plan
+
+    def process_array(self, x):
+        """Resample int16/float samples; returns float32 samples."""
+        n = len(x)
+        if not n:
+            return np.zeros(0, dtype=np.float32)
+        ext = np.concatenate((self._history, x.astype(np.float32, copy=False)))
+        index, phases, count = self._plan(n, self._t0)
+        out = np.einsum('ij,ij->i', ext[index], phases) if count else np.zeros(0, dtype=np.float32)
+        self._t0 = self._t0 + count * self.down - n * self.up
+        self._history = ext[-(self.taps - 1):].copy() if self.taps > 1 else self._history
+        return out
+
+    def process(self, buf):
+        """Resample little-endian 16-bit PCM bytes; returns PCM bytes."""
+        if self._odd:
+            buf = self._odd + bytes(buf)
+            self._odd = b''
+        if len(buf) % 2:
+            self._odd = bytes(buf[-1:])
+            buf = buf[:-1]
+        return to_pcm16(self.process_array(samples(buf)))
+
+
+class FrameAssembler:
+    """
+    Cuts a byte stream (Vonage sends 20 ms messages, not always aligned)
+    into fixed-size frames inside one preallocated ring. `write()` yields
+    each completed frame as a writable memoryview of its ring slot, so
+    the `*_inplace` transforms run without allocating. A view stays valid
+    until `slots - 1` further frames have been completed: copy it (or
+    finish with it) before then.
+    """
+
+    def __init__(self, frame_bytes=1280, slots=4):
+        if frame_bytes % SAMPLE_WIDTH:
+            raise ValueError("frame_bytes must be a whole number of samples")
+        self.frame_bytes = frame_bytes
+        self.slots = max(2, slots)
+        self._ring = bytearray(frame_bytes * self.slots)
+        self._view = memoryview(self._ring)
+        self._start = 0       # Offset of the slot being filled
+        self._fill = 0        # Bytes already in that slot
+        self.frames = 0
+
+    @property
+    def pending(self):
+        """Bytes waiting for the rest of their frame."""
+        return self._fill
+
+    def reset(self):
+        self._fill = 0
+
+    def write(self, data):
+        """Copy `data` into the ring and yield every frame it completes."""
+        src = memoryview(data).cast('B')
+        pos, size = 0, len(src)
+        while pos < size:
+            n = min(self.frame_bytes - self._fill, size - pos)
+            at = self._start + self._fill
+            self._view[at:at + n] = src[pos:pos + n]
+            self._fill += n
+            pos += n
+            if self._fill == self.frame_bytes:
+                frame = self._view[self._start:self._start + self.frame_bytes]
+                self._start = (self._start + self.frame_bytes) % len(self._ring)
+                self._fill = 0
+                self.frames += 1
+                yield frame
+
+
+def zero_crossing_rate(buf):
+    """Fraction of adjacent samples that change sign (high for fricatives and hiss)."""
+    x = samples(buf)
+    if len(x) < 2:
+        return 0.0
+    return float(np.count_nonzero(np.signbit(x[1:]) != np.signbit(x[:-1]))) / (len(x) - 1)
+
+
+VAD_THRESHOLD_RANGE = (10, 10000)
+
+
+def vad_settings(data):
+    """
+    The vad_mode / vad_threshold fields present in `data` (a settings
+    payload), validated; None resets a field to the platform default.
+    Raises ValueError with a message fit for a 400 response.
+    """
+    settings = {}
+    if 'vad_mode' in data:
+        mode = data['vad_mode'] or None
+        if mode is not None and mode not in SilenceGate.MODES:
+            raise ValueError(f"vad_mode must be one of {', '.join(SilenceGate.MODES)} (or null)")
+        settings['vad_mode'] = mode
+    if 'vad_threshold' in data:
+        threshold = data['vad_threshold']
+        if threshold is not None:
+            low, high = VAD_THRESHOLD_RANGE
+            if isinstance(threshold, bool) or not isinstance(threshold, (int, str)):
+                raise ValueError("vad_threshold must be an integer")
+            try:
+                threshold = int(threshold)
+            except ValueError:
+                raise ValueError("vad_threshold must be an integer")
+            if not low <= threshold <= high:
+                raise ValueError(f"vad_threshold must be between {low} and {high} (RMS)")
+        settings['vad_threshold'] = threshold
+    return settings
+
+
+class SilenceGate:
+    """
+    Energy / zero-crossing voice activity detector in front of the Gemini
+    uplink. A frame is speech when its RMS clears the threshold (raised to
+    3x the tracked noise floor on noisy lines), or half of it with a
+    fricative-like zero-crossing rate. Speech keeps the gate open for
+    `hangover_ms`, so word endings and the pause Gemini needs to detect the
+    end of a turn still go through, and the last `preroll_ms` of silence is
+    replayed at onset so the first syllable is not clipped.
+
+    Past the hangover, 'gate' drops silent frames, 'decimate' forwards one
+    in `keep_every` (the stream stays alive at a fraction of the cost) and
+    'off' forwards everything (detection and counters only).
+    """
+
+    MODES = ('off', 'gate', 'decimate')
+
+    def __init__(self, mode='decimate', threshold=300, hangover_ms=800, preroll_ms=80,
+                 keep_every=5, rate=16000, zcr_min=0.3):
+        self.mode = mode if mode in self.MODES else 'off'
+        self.threshold = threshold
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.keep_every = max(1, keep_every)
+        self.rate = rate
+        self.zcr_min = zcr_min
+        self.noise_floor = None
+        self.level = 0          # RMS of the last frame
+        self.speaking = False   # Inside speech or its hangover
+        self._quiet_ms = hangover_ms
+        self._preroll = []
+        self._preroll_ms = 0
+        self._skipped = 0
+
+        # Counters
+        self.frames = 0
+        self.speech_frames = 0
+        self.suppressed_frames = 0
+        self.suppressed_ms = 0.0
+
+    def is_speech(self, buf):
+        level = self.level = rms(buf)
+        floor = self.noise_floor
+        threshold = self.threshold if floor is None else min(max(self.threshold, 3 * floor), 4 * self.threshold)
+        speech = level >= threshold or (level >= threshold / 2 and zero_crossing_rate(buf) >= self.zcr_min)
+        if not speech:
+            # Falls at once, rises slowly (speech never feeds it)
+            floor = level if floor is None or level < floor else floor + 0.05 * (level - floor)
+            self.noise_floor = floor
+        return speech
+
+    def _clear_preroll(self):
+        self._preroll, self._preroll_ms = [], 0
+
+    def process(self, frame):
+        """Frames to forward for one inbound frame: [], [frame], or preroll + [frame] at onset."""
+        frame_ms = len(frame) / (SAMPLE_WIDTH * self.rate) * 1000
+        self.frames += 1
+        if self.is_speech(frame):
+            self.speech_frames += 1
+            self._quiet_ms = 0
+        else:
+            self._quiet_ms += frame_ms
+        was_speaking, self.speaking = self.speaking, self._quiet_ms < self.hangover_ms
+
+        if self.speaking or self.mode == 'off':
+            out = [bytes(frame)]
+            if self.speaking and not was_speaking and self._preroll:
+                out = self._preroll + out
+                self.suppressed_frames -= len(self._preroll)
+                self.suppressed_ms -= self._preroll_ms
+            self._clear_preroll()
+            self._skipped = 0
+            return out
+
+        if self.mode == 'decimate' and self._skipped + 1 >= self.keep_every:
+            self._clear_preroll()
+            self._skipped = 0
+            return [bytes(frame)]
+        self._skipped += 1
+        self.suppressed_frames += 1
+        self.suppressed_ms += frame_ms
+        if self.preroll_ms:
+            self._preroll.append(bytes(frame))
+            self._preroll_ms += frame_ms
+            while self._preroll_ms > self.preroll_ms:
+                self._preroll.pop(0)
+                self._preroll_ms -= frame_ms
+        return []
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'frames': self.frames,
+            'speech_frames': self.speech_frames,
+            'suppressed_frames': self.suppressed_frames,
+            'suppressed_s': round(self.suppressed_ms / 1000, 1),
+            'noise_floor': None if self.noise_floor is None else round(self.noise_floor),
+        }
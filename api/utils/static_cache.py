@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+# Vite emits content-hashed file names under assets/, so they never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html, sw.js, manifest...: always revalidate (cheap with ETag/304)
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Menu images: a given image ID never changes content (edits create a new row)
+MENU_IMAGE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+StaticEntry = namedtuple('StaticEntry', ['path', 'stat', 'size', 'mtime', 'etag', 'cache_control'])
+
+
+def cache_control_for(rel_path):
+    return IMMUTABLE_CACHE_CONTROL if rel_path.startswith('assets/') else REVALIDATE_CACHE_CONTROL
+
+
+def etag_matches(if_none_match, etag):
+    """True when an If-None-Match header value matches `etag` (unquoted), i.e. a 304 is due."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+class StaticFileCache:
+    """
+    Remembers the stat() of files under a static root (the SPA build) so
+    serving a request costs a dict lookup instead of filesystem calls.
+    Misses are cached too, so unknown SPA routes fall back to index.html
+    cheaply. Entries are re-checked after `ttl` seconds, which picks up a
+    rebuilt dist folder without a restart.
+    """
+
+    def __init__(self, root, ttl=60, maxsize=4096):
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}  # rel_path -> (StaticEntry or None, checked_at)
+        self._lock = threading.Lock()
+
+    def _stat(self, rel_path):
+        path = os.path.normpath(os.path.join(self.root, rel_path))
+        # Refuse anything resolving outside the static root (../ tricks)
+        if not path.startswith(self.root + os.sep):
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        etag = f"{int(st.st_mtime_ns):x}-{st.st_size:x}"
+        return StaticEntry(path, st, st.st_size, st.st_mtime, etag, cache_control_for(rel_path))
+
+    def lookup(self, rel_path):
+        """StaticEntry for `rel_path` (relative to the root), or None if there is no such file."""
+        if not rel_path:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(rel_path)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+
+        entry = self._stat(rel_path)
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                self._entries.clear()
+            self._entries[rel_path] = (entry, now)
+        return entry